@@ -0,0 +1,109 @@
+"""Throughput benchmark for batch mode against the line-by-line piped loop
+
+Each corpus is written to a temporary file and run through both `calc < FILE` (main()
+reading stdin) and `calc --batch FILE`, with caches cleared before every run, alternating
+for ROUNDS rounds and keeping the best time of each mode. The outputs must be identical.
+Large files typically repeat a limited set of expressions, which is where batch mode's
+memoized fast path pays off. When every line is new, lexing, parsing and formatting each
+line dominate both modes, so the "distinct" corpus runs at about the same speed (about
+1.0x); only --workers speeds it up. Exits with status 1 when the outputs differ, the
+"repeated" corpus gains less than MIN_SPEEDUP or the "distinct" corpus runs slower than
+MIN_DISTINCT_SPEEDUP times the piped loop.
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+
+import calc.__main__ as cli
+import calc.core as core
+
+LINES = 200_000
+DISTINCT_EXPRESSIONS = 1_000
+ROUNDS = 3
+MIN_SPEEDUP = 10.0
+# Batch mode must not be slower on new lines; the margin absorbs timing noise
+MIN_DISTINCT_SPEEDUP = 0.9
+
+
+def _expression(rng: random.Random) -> str:
+    a, b = rng.randint(1, 10**6), rng.randint(1, 999)
+    return rng.choice(
+        [
+            f"{a:,} {rng.choice('+-*/')} {b}",
+            f"{a % 100}h{b % 60}m + {b}s",
+            f"{a}円 x 1.08",
+            f"max({a}, {b}) # budget",
+            f"sqrt({a})",
+            f"{b}min as hour",
+        ]
+    )
+
+
+def _repeated(rng: random.Random) -> list[str]:
+    pool = [_expression(rng) for _ in range(DISTINCT_EXPRESSIONS)]
+    return [rng.choice(pool) for _ in range(LINES)]
+
+
+def _distinct(rng: random.Random) -> list[str]:
+    return [_expression(rng) for _ in range(LINES // 4)]
+
+
+CORPORA: dict[str, tuple[Callable[[random.Random], list[str]], float]] = {
+    "repeated": (_repeated, MIN_SPEEDUP),
+    "distinct": (_distinct, MIN_DISTINCT_SPEEDUP),
+}
+
+
+def _run(argv: list[str], stdin_path: str) -> tuple[float, str]:
+    """Run main() with argv and stdin redirected; return elapsed seconds and output"""
+    core.expression_cache.clear()
+    cli._memoized_line.cache_clear()
+    saved = (sys.argv, sys.stdin, sys.stdout)
+    output = io.StringIO()
+    with open(stdin_path, encoding="utf-8") as stdin:
+        sys.argv, sys.stdin, sys.stdout = argv, stdin, output
+        start = time.perf_counter()
+        with contextlib.suppress(SystemExit):
+            cli.main()
+        elapsed = time.perf_counter() - start
+        sys.argv, sys.stdin, sys.stdout = saved
+    return elapsed, output.getvalue()
+
+
+def main() -> None:
+    failed = False
+    print(f"{'corpus':<12}{'lines':>10}{'piped lines/s':>16}{'batch lines/s':>16}{'speedup':>10}")
+    for name, (build, min_speedup) in CORPORA.items():
+        lines = build(random.Random(0))  # noqa: S311 (reproducible corpus)
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            runs = [
+                (_run(["calc"], path), _run(["calc", "--batch", path], path)) for _ in range(ROUNDS)
+            ]
+            piped_seconds = min(piped[0] for piped, _ in runs)
+            batch_seconds = min(batch[0] for _, batch in runs)
+            outputs = {output for run in runs for _, output in run}
+        finally:
+            os.remove(path)
+        if len(outputs) != 1:
+            print(f"{name}: batch output differs from piped output")
+            failed = True
+        speedup = piped_seconds / batch_seconds
+        failed = failed or speedup < min_speedup
+        print(
+            f"{name:<12}{len(lines):>10,}{len(lines) / piped_seconds:>16,.0f}"
+            f"{len(lines) / batch_seconds:>16,.0f}{speedup:>9.1f}x"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
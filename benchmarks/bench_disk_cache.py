@@ -0,0 +1,64 @@
+"""Cold `calc EXPRESSION` runs reading the result cache against runs calculating anew
+
+Each case is run as its own process, as a cron job or a shell script would: without a
+cache, then against a cache directory that already holds the result. The hit pays for
+importing sqlite3, fingerprinting the installed modules and one lookup, so it only wins when
+calculating costs more than that; a cheap expression is listed to show the overhead. Exits
+with status 1 when a hit prints another result, or when reading the cached result of the
+expensive case is not faster than calculating it.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RUNS = 7
+
+CASES: dict[str, list[str]] = {
+    "cheap": ["sqrt(2) * 3"],
+    "expensive": ["--precision", "3000", "exp(pi)"],
+}
+
+
+def _run(args: list[str], environment: dict[str, str]) -> tuple[float, str]:
+    """Run calc in a fresh process; return elapsed seconds and its output"""
+    start = time.perf_counter()
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-m", "calc", *args],
+        capture_output=True,
+        check=True,
+        env=environment,
+        text=True,
+    ).stdout
+    return (time.perf_counter() - start, output)
+
+
+def main() -> None:
+    failed = False
+    uncached = {name: value for name, value in os.environ.items() if name != "CALC_CACHE_DIR"}
+    print(f"{'case':<12}{'calculated ms':>15}{'cache hit ms':>14}{'speedup':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        cached = {**uncached, "CALC_CACHE_DIR": directory}
+        for name, args in CASES.items():
+            # Store the result, then alternate runs so that both share any noise
+            _run(args, cached)
+            runs = [(_run(args, uncached), _run(args, cached)) for _ in range(RUNS)]
+            if any(calculated[1] != hit[1] for calculated, hit in runs):
+                print(f"{name}: a cache hit printed another result than calculating it")
+                failed = True
+            calculated_seconds = min(calculated[0] for calculated, _ in runs)
+            hit_seconds = min(hit[0] for _, hit in runs)
+            speedup = calculated_seconds / hit_seconds
+            print(
+                f"{name:<12}{calculated_seconds * 1000:>15.1f}{hit_seconds * 1000:>14.1f}"
+                f"{speedup:>9.2f}x"
+            )
+            if name == "expensive" and speedup <= 1:
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Throughput and exactness of duration arithmetic in the Decimal evaluator
+
+Each corpus is compiled once and evaluated repeatedly, so the numbers isolate duration
+arithmetic: long sum() and avg() calls, scaling by decimal factors and rounding. The
+aggregates use microsecond counts that float seconds cannot represent exactly, and
+their results are checked against integer arithmetic. Exits with status 1 when any
+result is not exact.
+"""
+
+import random
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from calc.evaluator import compile_expression, evaluate
+from calc.lexer import normalize_expression
+
+ARGUMENTS = 10_000
+MIN_SECONDS = 0.3
+
+
+def _durations(rng: random.Random) -> list[int]:
+    """Microsecond counts of up to a thousand days, with all six fraction digits"""
+    return [rng.randint(0, 1000 * 86_400 * 10**6) for _ in range(ARGUMENTS)]
+
+
+def _literal(microseconds: int) -> str:
+    seconds, fraction = divmod(microseconds, 10**6)
+    return f"{seconds}.{fraction:06d}s"
+
+
+def _measure(expression: str) -> tuple[float, Decimal | timedelta]:
+    """Return evaluations per second and the result, repeating until MIN_SECONDS"""
+    compiled = compile_expression(normalize_expression(expression))
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        result = evaluate(compiled)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return calls / elapsed, result
+
+
+def main() -> None:
+    durations = _durations(random.Random(0))  # noqa: S311 (reproducible corpus)
+    arguments = ", ".join(_literal(d) for d in durations)
+    total = sum(durations)
+    # Ties round to even, like timedelta
+    quotient, remainder = divmod(total, len(durations))
+    average = quotient + (2 * remainder > len(durations))
+    corpora = {
+        f"sum of {ARGUMENTS:,}": (f"sum({arguments})", timedelta(microseconds=total)),
+        f"avg of {ARGUMENTS:,}": (f"avg({arguments})", timedelta(microseconds=average)),
+        "scale": ("1d 2h 3m 4.567891s * 1.1 / 3 * 7.25", timedelta(microseconds=249_310_642_974)),
+        "round": ("round(1h 20m 30.5s) + floor(2.5s) + roundeven(90.5s, -1)", timedelta(0, 4923)),
+    }
+
+    failed = False
+    print(f"{'corpus':<16}{'evals/s':>12}  exact")
+    for name, (expression, expected) in corpora.items():
+        rate, result = _measure(expression)
+        exact = result == expected
+        failed = failed or not exact
+        print(f"{name:<16}{rate:>12,.1f}  {'yes' if exact else f'no: {result} != {expected}'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Time and peak memory of giant generated expressions from 1k to 10M terms
+
+Each shape is calculated end to end (lexer, cache key, parse and evaluation) at sizes
+growing tenfold up to `--max-terms`. Every size runs in a fresh interpreter, so the peak
+resident memory it reports belongs to that size alone (it includes the input string).
+Exits with status 1 when a result is wrong, or when the time per term at the largest size
+is more than LINEARITY times the time per term at REFERENCE_TERMS, which would mean the
+path is no longer linear. The largest sizes take minutes.
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+
+from calc.core import calculate
+
+SIZES = [10**exponent for exponent in range(3, 8)]
+REFERENCE_TERMS = 10_000
+LINEARITY = 3.0
+
+SHAPES: dict[str, Callable[[int], str]] = {
+    "chain": lambda terms: " + ".join(str(n) for n in range(1, terms + 1)),
+    "sum": lambda terms: "sum(" + ", ".join(str(n) for n in range(1, terms + 1)) + ")",
+}
+
+
+def _measure(shape: str, terms: int) -> dict[str, float]:
+    """Calculate one expression in this process and describe the run"""
+    expression = SHAPES[shape](terms)
+    start = time.perf_counter()
+    success, value, _ = calculate(expression, "0")
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    exact = success and value == f"{terms * (terms + 1) // 2:,}"
+    return {"seconds": seconds, "peak": peak, "length": len(expression), "exact": exact}
+
+
+def _run(shape: str, terms: int) -> dict[str, float]:
+    """Measure one size in a fresh interpreter"""
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, __file__, "--measure", shape, str(terms)],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    row: dict[str, float] = json.loads(output)
+    return row
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--max-terms",
+        type=int,
+        default=SIZES[-1],
+        help=f"largest expression size (default: {SIZES[-1]:,})",
+    )
+    parser.add_argument("--measure", nargs=2, metavar=("SHAPE", "TERMS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        shape, terms = args.measure
+        print(json.dumps(_measure(shape, int(terms))))
+        return
+
+    failures: list[str] = []
+    print(f"{'shape':<8}{'terms':>12}{'input MB':>10}{'seconds':>10}{'us/term':>9}{'peak MB':>9}")
+    for shape in SHAPES:
+        per_term: dict[int, float] = {}
+        for terms in [size for size in SIZES if size <= args.max_terms]:
+            row = _run(shape, terms)
+            per_term[terms] = row["seconds"] / terms * 1e6
+            print(
+                f"{shape:<8}{terms:>12,}{row['length'] / 1e6:>10.1f}{row['seconds']:>10.2f}"
+                f"{per_term[terms]:>9.2f}{row['peak'] / 1e6:>9.0f}",
+                flush=True,
+            )
+            if not row["exact"]:
+                failures.append(f"{shape} of {terms:,} terms: wrong result")
+        largest = max(per_term)
+        if largest > REFERENCE_TERMS and REFERENCE_TERMS in per_term:
+            growth = per_term[largest] / per_term[REFERENCE_TERMS]
+            if growth > LINEARITY:
+                failures.append(f"{shape}: time per term grew {growth:.1f}x up to {largest:,}")
+    for failure in failures:
+        print(f"Failure: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
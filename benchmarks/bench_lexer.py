@@ -0,0 +1,60 @@
+"""Worst-case scaling benchmark for the single-pass expression lexer
+
+Each corpus is grown from 1k to 1M characters. A linear-time lexer keeps the cost per
+character roughly flat; regex backtracking shows up as cost per character growing with
+the input length. Exits with status 1 when any corpus grows by more than MAX_GROWTH.
+"""
+
+import sys
+import time
+from collections.abc import Callable
+
+from calc.lexer import normalize_expression
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+MAX_GROWTH = 4.0
+MIN_SECONDS = 0.2
+
+
+def _repeat(unit: str) -> Callable[[int], str]:
+    return lambda size: (unit * (size // len(unit) + 1))[:size]
+
+
+CORPORA: dict[str, Callable[[int], str]] = {
+    "arithmetic": _repeat("1,234 x 5 + 6.5 ÷ 2 - "),
+    "durations": _repeat("1 day and 2 hours 30 min + 45秒 + 01:30:00 + "),
+    "units": _repeat("100円 + 20個 + 3 GB + "),
+    "digit run": lambda size: "1" * size,
+    "whitespace run": lambda size: "1" + " " * (size - 2) + "x",
+    "comma run": _repeat("1,"),
+    "almost a duration": _repeat("1 day and 2 hours and "),
+}
+
+
+def _measure(expression: str) -> float:
+    """Return seconds per call, repeating until MIN_SECONDS have elapsed"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        normalize_expression(expression)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return elapsed / calls
+
+
+def main() -> None:
+    failed = False
+    print(f"{'corpus':<20}" + "".join(f"{size:>14,}" for size in SIZES) + "    growth")
+    for name, build in CORPORA.items():
+        per_char = [_measure(build(size)) / size * 1e9 for size in SIZES]
+        growth = per_char[-1] / per_char[0]
+        failed = failed or growth > MAX_GROWTH
+        cells = "".join(f"{ns:>11.1f} ns" for ns in per_char)
+        print(f"{name:<20}{cells}{growth:>9.2f}x")
+    print("(cost per input character)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
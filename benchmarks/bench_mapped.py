@@ -0,0 +1,104 @@
+"""Peak memory and throughput of batch mode on a mapped file against reading a stream
+
+Each corpus is written to a temporary file and run in a fresh process through
+`calc < FILE` (piped), `calc --batch - < FILE` (stream) and `calc --batch FILE`
+(mapped), so the peak resident set size of each run, read from /proc (Linux only), is its
+own. The outputs must be identical. The large corpus is LARGE_FACTOR times the small one:
+a mapped run releases the pages it has split, so its peak should not grow with the file.
+Exits with status 1 when the outputs differ or the mapped peak grows by more than
+MAX_GROWTH_KB.
+"""
+
+import hashlib
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+LINES = 100_000
+LARGE_FACTOR = 8
+DISTINCT_EXPRESSIONS = 1_000
+MAX_GROWTH_KB = 4 * 1024
+
+MODES: dict[str, list[str]] = {
+    "piped": [],
+    "stream": ["--batch", "-"],
+    "mapped": ["--batch", "{path}"],
+}
+
+
+def _expression(rng: random.Random) -> str:
+    a, b = rng.randint(1, 10**6), rng.randint(1, 999)
+    return rng.choice(
+        [
+            f"{a:,} {rng.choice('+-*/')} {b}",
+            f"{a % 100}h{b % 60}m + {b}s",
+            f"{a}円 x 1.08",
+            f"max({a}, {b}) # budget",
+            f"{b}min as hour",
+        ]
+    )
+
+
+def _write_corpus(path: str, lines: int) -> None:
+    rng = random.Random(0)  # noqa: S311 (reproducible corpus)
+    pool = [_expression(rng) for _ in range(DISTINCT_EXPRESSIONS)]
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(lines):
+            f.write(rng.choice(pool) + "\n")
+
+
+# Run in the new process: calc, then a report of its peak RSS. ru_maxrss would include the
+# peak of this process from before the new one started, so VmHWM is read instead.
+_MEASURED = """
+import atexit, runpy, sys
+def report():
+    with open("/proc/self/status") as status:
+        print(*(line for line in status if line.startswith("VmHWM")), file=sys.stderr)
+atexit.register(report)
+sys.argv = ["calc", *sys.argv[1:]]
+runpy.run_module("calc", run_name="__main__")
+"""
+
+
+def _run(argv: list[str], path: str) -> tuple[float, int, str]:
+    """Run calc in a new process; return elapsed seconds, peak RSS in KiB and output digest"""
+    command = [sys.executable, "-c", _MEASURED, *(arg.format(path=path) for arg in argv)]
+    with open(path, "rb") as stdin:
+        start = time.perf_counter()
+        process = subprocess.run(command, stdin=stdin, capture_output=True, check=False)  # noqa: S603
+        elapsed = time.perf_counter() - start
+    peak = int(process.stderr.split(b"VmHWM:")[-1].split()[0])
+    return elapsed, peak, hashlib.sha256(process.stdout).hexdigest()
+
+
+def main() -> None:
+    failed = False
+    print(f"{'lines':>10}{'mode':>8}{'lines/s':>12}{'peak RSS':>14}")
+    peaks: dict[int, int] = {}
+    for lines in (LINES, LINES * LARGE_FACTOR):
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        os.close(fd)
+        try:
+            _write_corpus(path, lines)
+            digests = set()
+            for mode, argv in MODES.items():
+                seconds, peak, digest = _run(argv, path)
+                digests.add(digest)
+                if mode == "mapped":
+                    peaks[lines] = peak
+                print(f"{lines:>10,}{mode:>8}{lines / seconds:>12,.0f}{peak:>11,} KiB")
+        finally:
+            os.remove(path)
+        if len(digests) != 1:
+            print(f"{lines:,} lines: outputs differ between modes")
+            failed = True
+    growth = peaks[LINES * LARGE_FACTOR] - peaks[LINES]
+    print(f"mapped peak RSS growth: {growth:,} KiB")
+    sys.exit(1 if failed or growth > MAX_GROWTH_KB else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Cost of the Decimal math functions against precision, next to the old float path
+
+Every function is evaluated over a fixed set of arguments at each precision, after a
+first call that computes the constants, tables and series coefficients it caches for that
+precision (reported as setup). The float column is the path the functions replaced,
+converting to float and back with Decimal(str(...)). Exits with status 1 when a result is
+not correctly rounded (checked against the same function at a much higher precision), or
+when a function at the default precision is more than MAX_SLOWDOWN times slower than the
+float path.
+"""
+
+import argparse
+import functools
+import math
+import random
+import sys
+import time
+from collections.abc import Callable
+from decimal import Decimal, localcontext
+
+from calc import decimal_math
+
+PRECISIONS = [16, 28, 50, 100, 200, 500, 1000]
+DEFAULT_PRECISION = 28
+MAX_SLOWDOWN = 15.0
+ARGUMENTS = 50
+MIN_SECONDS = 0.2
+# The reference for the correctness check carries this many more digits
+REFERENCE_DIGITS = 20
+
+RANGES = {
+    "exp": (-50.0, 50.0),
+    "sin": (-100.0, 100.0),
+    "cos": (-100.0, 100.0),
+    "tan": (-100.0, 100.0),
+}
+FUNCTIONS: dict[str, tuple[Callable[[Decimal], Decimal], Callable[[float], float]]] = {
+    "sqrt": (decimal_math.sqrt, math.sqrt),
+    "exp": (decimal_math.exp, math.exp),
+    "log": (decimal_math.log, math.log),
+    "sin": (decimal_math.sin, math.sin),
+    "cos": (decimal_math.cos, math.cos),
+    "tan": (decimal_math.tan, math.tan),
+}
+
+
+def _arguments(name: str, rng: random.Random) -> list[Decimal]:
+    """Arguments with a dozen significant digits in the range users pass to name"""
+    low, high = RANGES.get(name, (0.001, 1e6))
+    return [Decimal(f"{rng.uniform(low, high):.12g}") for _ in range(ARGUMENTS)]
+
+
+def _float_path(function: Callable[[float], float], x: Decimal) -> Decimal:
+    return Decimal(str(function(float(x))))
+
+
+def _rate(call: Callable[[Decimal], Decimal], arguments: list[Decimal]) -> float:
+    """Return seconds per call, repeating the arguments until MIN_SECONDS"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for x in arguments:
+            call(x)
+        calls += len(arguments)
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return elapsed / calls
+
+
+def _clear_caches() -> None:
+    for cached in (
+        decimal_math._pi,
+        decimal_math._half_pi,
+        decimal_math._ln10,
+        decimal_math._exp_table,
+        decimal_math._reciprocal_factorials,
+        decimal_math._trig_coefficients,
+        decimal_math._atanh_coefficients,
+    ):
+        cached.cache_clear()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--max-precision",
+        type=int,
+        default=PRECISIONS[-1],
+        help=f"largest precision to measure (default: {PRECISIONS[-1]:,})",
+    )
+    args = parser.parse_args()
+    precisions = [digits for digits in PRECISIONS if digits <= args.max_precision]
+    rng = random.Random(0)  # noqa: S311 (reproducible arguments)
+
+    failures: list[str] = []
+    print(f"{'function':<10}{'float us':>10}" + "".join(f"{digits:>10}" for digits in precisions))
+    for name, (function, float_function) in FUNCTIONS.items():
+        arguments = _arguments(name, rng)
+        float_seconds = _rate(functools.partial(_float_path, float_function), arguments)
+        costs: list[str] = []
+        setups: list[str] = []
+        for digits in precisions:
+            _clear_caches()
+            with localcontext() as context:
+                context.prec = digits
+                start = time.perf_counter()
+                function(arguments[0])
+                setups.append(f"{(time.perf_counter() - start) * 1e3:>9.1f}m")
+                seconds = _rate(function, arguments)
+                results = [function(x) for x in arguments]
+                context.prec = digits + REFERENCE_DIGITS
+                references = [function(x) for x in arguments]
+                context.prec = digits
+                pairs = zip(results, references, strict=True)
+                if any(result != +reference for result, reference in pairs):
+                    failures.append(f"{name} at {digits} digits: not correctly rounded")
+            costs.append(f"{seconds * 1e6:>10.1f}")
+            slowdown = seconds / float_seconds
+            if digits == DEFAULT_PRECISION and slowdown > MAX_SLOWDOWN:
+                failures.append(f"{name}: {slowdown:.1f}x the float path at {digits} digits")
+        print(f"{name:<10}{float_seconds * 1e6:>10.1f}" + "".join(costs), flush=True)
+        print(f"{'  setup':<20}" + "".join(setups), flush=True)
+    for failure in failures:
+        print(f"Failure: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Decimal versus float backend benchmark
+
+Each corpus is preprocessed and compiled once, then evaluated repeatedly with both
+backends, so the numbers isolate the evaluator. The end-to-end row runs calculate() on
+distinct expressions with the expression cache disabled, where lexing and parsing are
+included. Exits with status 1 when the float backend is not faster at evaluating any
+corpus.
+"""
+
+import sys
+import time
+from collections.abc import Callable
+from datetime import timedelta
+from decimal import Decimal
+
+import calc.core as core
+from calc.cache import ExpressionCache
+from calc.evaluator import CompiledExpression, compile_expression, evaluate
+from calc.float_evaluator import evaluate_float
+from calc.lexer import normalize_expression
+
+MIN_SECONDS = 0.3
+
+CORPORA: dict[str, list[str]] = {
+    "arithmetic": ["1,234.5 x 3 + 17 / 4 - 2^10", "(1 + 2) * (3 + 4) * (5 + 6) % 7"],
+    "functions": ["sqrt(2) * sin(pi / 4) + log(10)", "round(avg(1.5, 2.5, 3.25), 1) + max(1, 7)"],
+    "durations": ["1h 30m * 1.5 + 45s", "avg(1h, 2h 30m, 15min) + 01:30:00 / 3"],
+    "long sum": [" + ".join(f"{n}.25" for n in range(200))],
+}
+
+
+def _measure(run: Callable[[], object]) -> float:
+    """Return calls per second, repeating until MIN_SECONDS have elapsed"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        run()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return calls / elapsed
+
+
+def _evaluate_all(
+    evaluator: Callable[[CompiledExpression], Decimal | timedelta],
+    compiled: list[CompiledExpression],
+) -> Callable[[], None]:
+    def run() -> None:
+        for expression in compiled:
+            evaluator(expression)
+
+    return run
+
+
+def _calculate_distinct(numeric: str) -> Callable[[], None]:
+    counter = iter(range(sys.maxsize))
+
+    def run() -> None:
+        n = next(counter)
+        core.calculate(f"{n} x 1.08 + sqrt({n}) + 1h 30m / 2 as min", "0", numeric=numeric)
+
+    return run
+
+
+def _report(name: str, decimal_rate: float, float_rate: float) -> None:
+    speedup = float_rate / decimal_rate
+    print(f"{name:<14}{decimal_rate:>16,.0f}{float_rate:>16,.0f}{speedup:>9.2f}x")
+
+
+def main() -> None:
+    failed = False
+    print(f"{'corpus':<14}{'decimal ops/s':>16}{'float ops/s':>16}{'speedup':>10}")
+    for name, expressions in CORPORA.items():
+        compiled = [compile_expression(normalize_expression(e)) for e in expressions]
+        decimal_rate = _measure(_evaluate_all(evaluate, compiled)) * len(compiled)
+        float_rate = _measure(_evaluate_all(evaluate_float, compiled)) * len(compiled)
+        failed = failed or float_rate <= decimal_rate
+        _report(name, decimal_rate, float_rate)
+
+    core.expression_cache = ExpressionCache(maxsize=0)
+    decimal_rate = _measure(_calculate_distinct("decimal"))
+    float_rate = _measure(_calculate_distinct("float"))
+    _report("end to end", decimal_rate, float_rate)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Scaling benchmark for parallel batch mode
+
+A corpus of distinct expressions, with short `?` chains and `format` commands mixed in, is
+run through the serial piped loop once and through `calc --batch FILE --workers N` for
+N = 1, 2, 4, ... up to the CPU count. Every run must reproduce the piped output byte for
+byte. Exits with status 1 on any difference, or when the largest worker count reaches less
+than MIN_EFFICIENCY of linear scaling over one worker.
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+import calc.__main__ as cli
+import calc.core as core
+
+LINES = 100_000
+MIN_EFFICIENCY = 0.6
+
+
+def _corpus(rng: random.Random) -> list[str]:
+    lines = []
+    for _ in range(LINES):
+        a, b = rng.randint(1, 10**6), rng.randint(1, 999)
+        roll = rng.random()
+        if roll < 0.2:
+            lines.append(f"? {rng.choice('+-*')} {b}")
+        elif roll < 0.21:
+            lines.append(f"format {rng.choice(['default', 'min', 'japanese'])}")
+        elif roll < 0.22:
+            lines.append(f"{a} / 0")
+        elif roll < 0.6:
+            lines.append(f"{a:,} {rng.choice('+-*/')} {b}")
+        else:
+            lines.append(f"{a % 100}h{b % 60}m + {b}s")
+    return lines
+
+
+def _run(argv: list[str], stdin_path: str) -> tuple[float, str]:
+    """Run main() with argv and stdin redirected; return elapsed seconds and output"""
+    core.expression_cache.clear()
+    cli._memoized_line.cache_clear()
+    saved = (sys.argv, sys.stdin, sys.stdout)
+    output = io.StringIO()
+    with open(stdin_path, encoding="utf-8") as stdin:
+        sys.argv, sys.stdin, sys.stdout = argv, stdin, output
+        start = time.perf_counter()
+        with contextlib.suppress(SystemExit):
+            cli.main()
+        elapsed = time.perf_counter() - start
+        sys.argv, sys.stdin, sys.stdout = saved
+    return elapsed, output.getvalue()
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= cpus:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != cpus:
+        worker_counts.append(cpus)
+
+    lines = _corpus(random.Random(0))  # noqa: S311 (reproducible corpus)
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    failed = False
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        serial_seconds, serial_output = _run(["calc"], path)
+        print(f"{'mode':<12}{'lines/s':>12}{'speedup':>10}{'efficiency':>12}")
+        print(f"{'piped':<12}{len(lines) / serial_seconds:>12,.0f}")
+        one_worker = 0.0
+        for workers in worker_counts:
+            seconds, output = _run(["calc", "--batch", path, "--workers", str(workers)], path)
+            if output != serial_output:
+                print(f"{workers} workers: output differs from piped output")
+                failed = True
+            one_worker = one_worker or seconds
+            speedup = one_worker / seconds
+            efficiency = speedup / workers
+            print(
+                f"{f'{workers} workers':<12}{len(lines) / seconds:>12,.0f}"
+                f"{speedup:>9.2f}x{efficiency:>12.0%}"
+            )
+        failed = failed or (len(worker_counts) > 1 and efficiency < MIN_EFFICIENCY)
+    finally:
+        os.remove(path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Per-stage benchmark of the calculation pipeline with stored baselines
+
+Every stage runs over representative corpora: calculate end to end (with the expression
+cache disabled), the lexer, convert_time_expressions, safe_eval, _format_decimal and the
+three time formatters, each fed with what the earlier stages produce for the corpus.
+Each row reports ops/sec, p50/p95/p99 latency and the mean peak bytes a call allocates,
+traced by tracemalloc in a separate pass so tracing does not slow the timed one.
+
+`--save` stores the results as the baseline (BASELINE_PATH by default). Later runs are
+compared with it and exit with status 1 when any row loses more than THRESHOLD (or
+`--threshold`) of its ops/sec or allocates that much more than its baseline. Baselines
+depend on the machine, so save one on the reference commit before measuring a change.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+import calc.core as core
+from calc.cache import ExpressionCache
+from calc.evaluator import safe_eval
+from calc.lexer import normalize_expression
+from calc.time_utils import (
+    convert_time_expressions,
+    format_colon,
+    format_english,
+    format_japanese,
+)
+
+BASELINE_PATH = Path(__file__).with_name("baselines") / "pipeline.json"
+THRESHOLD = 0.25
+MIN_SECONDS = 0.05
+ROUNDS = 5
+
+CORPORA: dict[str, list[str]] = {
+    "arithmetic": ["1 + 2 * 3", "(17 - 4) / 3 % 5", "2^10 - 1.5 x 4", "100 ÷ 8 + 0.25"],
+    "separators": ["1,234,567.89 x 3", "9,876,543,210 - 1,000,000 + 12,345", "1,000 ÷ 8"],
+    "english": ["1 day and 2 hours 30 min + 45 sec", "1h 30m x 3", "90 minutes - 15s"],
+    "japanese": ["1日と2時間30分 + 45秒", "2時間 - 15分", "3日 / 4"],
+    "functions": ["round(sqrt(2) * max(1, 5, 3), 2)", "avg(1.5, 2.5, 3) + log(10)", "sin(pi/6)"],
+    "long": [" + ".join(f"{n},{n % 1000:03}.5" for n in range(1, 201))],
+    "errors": ["1 +", "1 / 0", "sqrt(-1)", "1,20", "1h + 1", "foo(2)"],
+}
+
+
+def _calculate(expression: str) -> tuple[bool, str, str]:
+    return core.calculate(expression, "0")
+
+
+STAGES: dict[str, Callable[[Any], object]] = {
+    "calculate": _calculate,
+    "normalize": normalize_expression,
+    "convert_time": convert_time_expressions,
+    "safe_eval": safe_eval,
+    "format_decimal": core._format_decimal,
+    "format_colon": format_colon,
+    "format_english": format_english,
+    "format_japanese": format_japanese,
+}
+
+
+def _attempt(function: Callable[[Any], object], value: object) -> object:
+    """Call function, returning the exception an error input raises"""
+    try:
+        return function(value)
+    except Exception as e:
+        return e
+
+
+def _inputs(expressions: list[str]) -> dict[str, list[Any]]:
+    """Return the inputs of every stage for a corpus, derived from the earlier stages"""
+    lexed = [_attempt(normalize_expression, e) for e in expressions]
+    normalized = [e for e in lexed if isinstance(e, str)]
+    results = [_attempt(safe_eval, e) for e in normalized]
+    durations = [r for r in results if isinstance(r, timedelta)]
+    return {
+        "calculate": expressions,
+        "normalize": expressions,
+        "convert_time": expressions,
+        "safe_eval": normalized,
+        "format_decimal": [r for r in results if isinstance(r, Decimal)],
+        "format_colon": durations,
+        "format_english": durations,
+        "format_japanese": durations,
+    }
+
+
+def _measure(function: Callable[[Any], object], values: list[Any]) -> dict[str, float]:
+    """
+    Time calls one by one for ROUNDS rounds of MIN_SECONDS, then trace one more pass
+
+    ops/sec is taken from the fastest round, which is the least disturbed by other load.
+    """
+    latencies: list[int] = []
+    best_ops = 0.0
+    for _ in range(ROUNDS):
+        round_start = len(latencies)
+        deadline = time.perf_counter() + MIN_SECONDS
+        while time.perf_counter() < deadline:
+            for value in values:
+                start = time.perf_counter_ns()
+                _attempt(function, value)
+                latencies.append(time.perf_counter_ns() - start)
+        timed = latencies[round_start:]
+        best_ops = max(best_ops, len(timed) * 1e9 / sum(timed))
+
+    peaks = []
+    tracemalloc.start()
+    for value in values:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        _attempt(function, value)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {
+        "ops": best_ops,
+        "p50": percentiles[49] / 1000,
+        "p95": percentiles[94] / 1000,
+        "p99": percentiles[98] / 1000,
+        "bytes": statistics.fmean(peaks),
+    }
+
+
+def _regressions(row: dict[str, float], baseline: dict[str, float], threshold: float) -> list[str]:
+    """Describe how row falls behind baseline by more than threshold"""
+    problems = []
+    if row["ops"] < baseline["ops"] * (1 - threshold):
+        problems.append(f"ops/sec {baseline['ops']:,.0f} -> {row['ops']:,.0f}")
+    # A few dozen bytes of slack keep tiny allocations from flagging on noise
+    if row["bytes"] > baseline["bytes"] * (1 + threshold) + 64:
+        problems.append(f"bytes/op {baseline['bytes']:,.0f} -> {row['bytes']:,.0f}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help=f"allowed fraction of regression (default: {THRESHOLD})",
+    )
+    args = parser.parse_args()
+
+    core.expression_cache = ExpressionCache(maxsize=0)
+    baseline: dict[str, dict[str, float]] = {}
+    if not args.save and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+
+    results: dict[str, dict[str, float]] = {}
+    failures: list[str] = []
+    print(
+        f"{'stage':<16}{'corpus':<12}{'ops/sec':>12}{'p50 us':>9}{'p95 us':>9}{'p99 us':>9}"
+        f"{'bytes/op':>10}{'vs base':>9}"
+    )
+    for corpus, expressions in CORPORA.items():
+        inputs = _inputs(expressions)
+        for stage, function in STAGES.items():
+            if not inputs[stage]:
+                continue
+            key = f"{stage}/{corpus}"
+            row = results[key] = _measure(function, inputs[stage])
+            change = ""
+            if key in baseline:
+                change = f"{row['ops'] / baseline[key]['ops'] - 1:+.0%}"
+                failures += [
+                    f"{key}: {p}" for p in _regressions(row, baseline[key], args.threshold)
+                ]
+            print(
+                f"{stage:<16}{corpus:<12}{row['ops']:>12,.0f}{row['p50']:>9.1f}"
+                f"{row['p95']:>9.1f}{row['p99']:>9.1f}{row['bytes']:>10,.0f}{change:>9}"
+            )
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved to {args.baseline}")
+    elif not baseline:
+        print(f"No baseline at {args.baseline}; run with --save to store one")
+    for failure in failures:
+        print(f"Regression: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Per-line cost of convert_time_expressions as lines grow longer
+
+Every duration literal is found in one left-to-right scan, so the cost of a line should
+grow linearly with its length whatever mix of literals it holds. Exits with status 1 when
+the cost per character of any corpus grows by more than MAX_GROWTH from the shortest line
+to the longest.
+"""
+
+import sys
+import time
+
+from calc.time_utils import convert_time_expressions
+
+LENGTHS = [16, 256, 4_096, 65_536]
+MAX_GROWTH = 4.0
+MIN_SECONDS = 0.2
+
+CORPORA = {
+    "no durations": "1234 * 5 + 6 / 2 - ",
+    "english": "1 day and 2 hours 30 min + 45 sec + ",
+    "japanese": "1日2時間30分 + 45秒 + ",
+    "clock": "01:30:00 + 1d 02:00:00.5 + ",
+    "near misses": "1 dozen 2 hats 3 mice 4 suns ",
+    "digit run": "1234567890",
+}
+
+
+def _measure(line: str) -> float:
+    """Return seconds per call, repeating until MIN_SECONDS have elapsed"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        convert_time_expressions(line)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return elapsed / calls
+
+
+def main() -> None:
+    failed = False
+    print(f"{'corpus':<16}" + "".join(f"{length:>16,}" for length in LENGTHS) + "    growth")
+    for name, unit in CORPORA.items():
+        lines = [unit * max(1, length // len(unit)) for length in LENGTHS]
+        seconds = [_measure(line) for line in lines]
+        per_char = [s / len(line) for s, line in zip(seconds, lines, strict=True)]
+        growth = per_char[-1] / per_char[0]
+        failed = failed or growth > MAX_GROWTH
+        cells = "".join(f"{s * 1e6:>13.1f} us" for s in seconds)
+        print(f"{name:<16}{cells}{growth:>9.2f}x")
+    print("(time per line; growth compares cost per character)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,248 +1,758 @@
+import functools
+import itertools
+import math
+import os
 import re
 import sys
-from collections.abc import Iterator
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from datetime import timedelta
-from decimal import Decimal
-
-from prompt_toolkit import PromptSession
-
-from .evaluator import RESERVED_WORDS
-from .evaluator import safe_eval as ast_safe_eval
-from .help_text import get_help
-from .time_utils import (
-    convert_time_expressions,
-    format_colon,
-    format_english,
-    format_japanese,
-    to_scalar,
+from decimal import Decimal, InvalidOperation, getcontext
+from typing import TYPE_CHECKING, TextIO, cast
+
+from .cache import DEFAULT_CACHE_SIZE
+from .core import (
+    COMMANDS,
+    DEFAULT_CACHE_MEGABYTES,
+    NUMERIC_BACKENDS,
+    BatchTask,
+    Result,
+    _assignment,
+    _calculate,
+    _check_directive,
+    _define_variable,
+    _error_message,
+    _evaluate_and_print,
+    _evaluate_line,
+    _format_result,
+    _init_worker,
+    _is_valid_format,
+    _new_variables,
+    _normalize_result,
+    _process_command,
+    _remove_comments,
+    _set_precision,
+    _timed,
+    _timed_line,
+    set_profiler,
 )
+from .evaluator import evaluate
+from .history import History
+from .lexer import normalize_expression
+from .limits import Limits, check_result, get_limits, set_limits
+from .time_utils import format_colon
+
+# Only what a mode needs is imported, and only once it runs: a one-shot `calc EXPR` or
+# piped run never loads prompt_toolkit, argparse, the process pool or the CSV machinery.
+# tests/test_startup.py keeps these out of the startup imports.
+if TYPE_CHECKING:
+    import argparse
+    from concurrent.futures import Future
+
+    from .columns import ColumnExpression
+    from .mapped import MappedRange
+    from .output import Record
+    from .variables import Variables
+
+# Options are only recognized as the first argument, so expressions such as "-5+3" and
+# "--5" are still evaluated directly.
+OPTION_PATTERN = re.compile(r"--[a-z]")
+# Size hint for each read in batch mode; the results of a chunk are written in one call.
+BATCH_CHUNK_SIZE = 1 << 20
+# Lines per unit of work handed to a batch worker process
+BATCH_TASK_LINES = 1024
+ERROR_POLICIES = ("inline", "continue", "abort")
+# Lines the profile lists by default
+DEFAULT_SLOWEST_LINES = 10
+# Result formats: "text" is the usual "= value" display, the others are for programs
+OUTPUT_FORMATS = ("text", "jsonl", "csv", "raw")
+
+# What _evaluate_segment returns
+_EvaluatedSegment = tuple[BatchTask | None, tuple[int, list[Result]]]
+
+
+@functools.lru_cache(maxsize=DEFAULT_CACHE_SIZE)
+def _memoized_line(expression: str, default_format: str, numeric: str, precision: int) -> Result:
+    return _calculate(expression, History(), default_format, numeric, files=True)
+
+
+def _calculate_line(expression: str, default_format: str, numeric: str, precision: int) -> Result:
+    """
+    Calculate a batch line that does not use history, memoized on its raw text and precision
 
-# The suffix group excludes every character with a meaning in the expression grammar
-# (digits, whitespace, operators + - * / % ^, parentheses, comma, decimal point), so a
-# unit match stops at expression syntax and only the unit word itself is captured:
-# in "100円+200" the unit is 円, and "+200" stays part of the expression.
-NUMBER_WITH_SUFFIX_PATTERN = r"\b(\d+(?:,\d{3})*(?:\.\d+)?)\s*([^\d\s\-+*/(),.^%]+)\b"
-OUTPUT_DIRECTIVE_PATTERN = r"\s+as\s+(\w+)\s*$"
-# Threshold for _has_precision_artifact: long enough that values a user deliberately
-# enters rarely hit it, short enough to catch real artifacts, whose runs are 13+ digits
-# (see _has_precision_artifact for where those runs come from).
-PRECISION_DIGITS = 12
-TIME_FORMATTERS = {
-    "default": format_colon,
-    "colon": format_colon,
-    "japanese": format_japanese,
-    "jp": format_japanese,
-    "ja": format_japanese,
-    "english": format_english,
-    "en": format_english,
-}
-TIME_UNITS = {
-    "sec": "sec",
-    "seconds": "sec",
-    "s": "sec",
-    "min": "min",
-    "minutes": "min",
-    "m": "min",
-    "hour": "hour",
-    "hours": "hour",
-    "h": "hour",
-    "day": "day",
-    "days": "day",
-    "d": "day",
-}
-
-
-def _is_valid_format(name: str) -> bool:
-    """Check if name is a known time format or unit"""
-    return name in TIME_FORMATTERS or name in TIME_UNITS
-
-
-def _remove_comments(expression: str) -> str:
-    """Remove comments from expression"""
-    return expression.split("#", 1)[0].strip()
-
-
-def _extract_output_directive(expression: str) -> tuple[str, str | None]:
-    """Extract trailing output format directive (as <format>)"""
-    match = re.search(OUTPUT_DIRECTIVE_PATTERN, expression)
-    if not match:
-        return (expression, None)
-    return (expression[: match.start()], match.group(1))
-
-
-def _substitute_history(expression: str, last_result: str) -> str:
-    """Substitute ? with last result"""
-    return expression.replace("?", last_result)
-
-
-def _normalize_operators(expression: str) -> str:
-    """Normalize operator aliases to standard Python operators"""
-    expression = expression.replace("＋", "+")
-    expression = expression.replace("－", "-")
-    expression = re.sub(r"([\d\s\-+*/(),.^%])([xX])([\d\s\-+*/(),.^%])", r"\1*\3", expression)
-    expression = expression.replace("×", "*")
-    expression = expression.replace("÷", "/")
-    expression = expression.replace("^", "**")
-    return expression
-
-
-def _remove_non_time_units(expression: str) -> str:
-    """Remove non-time unit words after numbers"""
-
-    def replace_unit(match: re.Match[str]) -> str:
-        number = match.group(1)
-        word = match.group(2)
-        if word in RESERVED_WORDS:
-            return match.group(0)
-        return number
-
-    return re.sub(NUMBER_WITH_SUFFIX_PATTERN, replace_unit, expression)
-
-
-def _remove_thousands_separators(expression: str) -> str:
-    """Remove comma separators from numbers"""
-    return re.sub(r"(\d),(?=\d{3}(?!\d))", r"\1", expression)
-
-
-def _has_precision_artifact(value: Decimal) -> bool:
-    """Check if value has precision artifacts like repeated 9s or 0s"""
-    # Two noise sources both leave a long run of identical digits: Decimal division
-    # expanding to the 28-digit context (1/3*3 -> 0.9999999999999999999999999999) and
-    # math functions/constants round-tripping through binary float
-    # (sqrt(2)^2 -> 2.000000000000000144...). Genuine results rarely look like this.
-    str_val = str(value)
-    pattern_9s = "9" * PRECISION_DIGITS
-    pattern_0s = "0" * PRECISION_DIGITS
-    return pattern_9s in str_val or pattern_0s in str_val
-
-
-def _normalize_result(value: Decimal) -> Decimal:
-    """Normalize high-precision Decimal to user-friendly display format"""
-    if _has_precision_artifact(value):
-        quantize_pattern = Decimal(f"0.{'0' * PRECISION_DIGITS}")
-        tolerance = Decimal(f"1e-{PRECISION_DIGITS - 2}")
-        rounded = value.quantize(quantize_pattern)
-        if abs(rounded - round(rounded)) < tolerance:
-            return Decimal(int(round(rounded)))
-        return rounded.normalize()
-    return value
+    A line reading a file with @ is calculated every time, since the file may change.
+    """
+    if "@" in expression:
+        return _calculate(expression, History(), default_format, numeric, files=True)
+    return _memoized_line(expression, default_format, numeric, precision)
 
 
-def _format_decimal(value: Decimal) -> str:
-    """Format Decimal with normalization and thousands separators"""
-    normalized = _normalize_result(value)
-    if normalized == normalized.to_integral_value():
-        return f"{int(normalized):,}"
-    return f"{normalized:,f}"
-
-
-def _format_result(
-    result: Decimal | timedelta, directive: str | None = None, default_format: str = "default"
-) -> str:
-    """Format calculation result for display"""
-    if directive is not None and not _is_valid_format(directive):
-        raise ValueError(f"Unknown format: '{directive}'")
-    if isinstance(result, Decimal):
-        if directive is not None:
-            raise ValueError(
-                f"'{directive}' format only applies to time values, got a plain number"
-            )
-        return _format_decimal(result)
+def _batch_segments(stream: TextIO) -> Iterator[str | BatchTask]:
+    """
+    Split batch input into commands and tasks of expression lines
+
+    Assignments are commands too, so that variables are defined in input order. Each
+    expression line carries the format in effect for it, and a new task only starts at a
+    line without ?, so tasks can be evaluated independently of each other.
+    """
+    current_format = "default"
+    task: BatchTask = []
+    line_number = 0
+    while lines := stream.readlines(BATCH_CHUNK_SIZE):
+        for line in lines:
+            line_number += 1
+            expression = line.strip()
+            if (
+                expression in COMMANDS
+                or expression.startswith("format ")
+                or _assignment(expression) is not None
+            ):
+                if task:
+                    yield task
+                    task = []
+                yield expression
+                if expression == "exit":
+                    return
+                name = expression.removeprefix("format ").strip()
+                if expression.startswith("format ") and _is_valid_format(name):
+                    current_format = name
+            elif _remove_comments(expression):
+                if len(task) >= BATCH_TASK_LINES and "?" not in expression:
+                    yield task
+                    task = []
+                task.append((line_number, expression, current_format))
+    if task:
+        yield task
+
+
+def _evaluate_task(task: BatchTask, numeric: str = "decimal") -> tuple[int, list[Result]]:
+    """
+    Evaluate a batch task without knowing the results before it
+
+    Lines up to the first successful line without ? depend on earlier results and are left
+    to the caller, and so are the lines from the first one referring to a result before
+    that line on.
+
+    Returns: (number of leading lines left to the caller, results of the lines after them)
+    """
+    results: list[Result] = []
+    history: History | None = None
+    pending = len(task)
+    precision = getcontext().prec
+    for index, (_, expression, default_format) in enumerate(task):
+        if history is None:
+            if "?" in expression:
+                continue
+            result = _calculate_line(expression, default_format, numeric, precision)
+            if not result.ok:
+                continue
+            history = History()
+            pending = index
+        elif "?" in expression:
+            if not history.can_resolve(expression):
+                break
+            result = _calculate(expression, history, default_format, numeric, files=True)
+        else:
+            result = _calculate_line(expression, default_format, numeric, precision)
+        if result.value is not None:
+            history.append(result.value)
+        results.append(result)
+    return (pending, results)
+
+
+def _segment_task(segment: "BatchTask | MappedRange") -> BatchTask:
+    """Expression lines of a batch task, read from the mapped file for a range"""
+    if isinstance(segment, list):
+        return segment
+    from .mapped import read_range
+
+    return read_range(segment)
+
+
+def _evaluate_segment(
+    segment: "BatchTask | MappedRange", numeric: str = "decimal"
+) -> _EvaluatedSegment:
+    """
+    Evaluate a batch task, reading it first from the mapped file for a range
+
+    Returns: (task read from the file, or None for a task given as lines, its evaluation)
+    """
+    task = _segment_task(segment)
+    return (None if task is segment else task, _evaluate_task(task, numeric))
+
+
+class _BatchRun:
+    """Output, history and variable state of a batch run, fed with results in input order"""
+
+    def __init__(self, on_error: str, numeric: str) -> None:
+        self.on_error = on_error
+        self.numeric = numeric
+        self.history = History()
+        # Created by the first assignment; from then on, lines are evaluated here in order
+        self.variables: Variables | None = None
+        self.current_format = "default"
+        self.had_error = False
+        self.stop = False
+        self._output: list[str] = []
+
+    def command(self, expression: str) -> None:
+        """Run a command line, or an assignment, through the shared command handler"""
+        self.flush()
+        if self.variables is None and _assignment(expression) is not None:
+            self.variables = _new_variables(self.numeric)
+        should_continue, self.current_format, success = _process_command(
+            expression,
+            self.history,
+            self.current_format,
+            self.numeric,
+            variables=self.variables,
+            files=True,
+        )
+        self.had_error = self.had_error or not success
+        self.stop = not should_continue or (not success and self.on_error == "abort")
+
+    def task(self, task: BatchTask, evaluated: tuple[int, list[Result]] | None = None) -> None:
+        """
+        Record the results of a task, evaluating the lines that needed earlier results
+
+        Without evaluated results, which tasks after an assignment have, every line is
+        evaluated here.
+        """
+        pending, results = evaluated if evaluated is not None else (len(task), [])
+        for line_number, expression, default_format in task[:pending]:
+            self._line(line_number, self._calculate(expression, default_format))
+            if self.stop:
+                return
+        for (line_number, _, _), result in zip(task[pending:], results, strict=False):
+            self._line(line_number, result)
+            if self.stop:
+                return
+        for line_number, expression, default_format in task[pending + len(results) :]:
+            self._line(line_number, self._calculate(expression, default_format))
+            if self.stop:
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        sys.stdout.write("".join(self._output))
+        self._output.clear()
+
+    def _calculate(self, expression: str, default_format: str) -> Result:
+        variables = self.variables.referenced(expression) if self.variables is not None else None
+        return _calculate(
+            expression, self.history, default_format, self.numeric, None, variables, files=True
+        )
+
+    def _line(self, line_number: int, result: Result) -> None:
+        if result.ok:
+            if result.value is not None:
+                self.history.append(result.value)
+                self._output.append(f"= {result.formatted}\n")
+            return
+        self.had_error = True
+        if self.on_error == "inline":
+            self._output.append(f"Error: {result.error}\n")
+            return
+        self.flush()
+        print(f"Error: line {line_number}: {result.error}", file=sys.stderr)
+        self.stop = self.on_error == "abort"
+
+
+def _run_batch(
+    segments: "Iterator[str | BatchTask | MappedRange]",
+    on_error: str,
+    workers: int = 1,
+    numeric: str = "decimal",
+) -> int:
+    """
+    Evaluate the commands and tasks of batch input, writing the results of each task in one call
+
+    Output matches piped mode. on_error selects what a failed line does: "inline" prints
+    the error in place of the result, "continue" reports it with its line number on
+    stderr, and "abort" reports it the same way and stops. With more than one worker,
+    tasks are evaluated in a process pool while results are still written in input order.
+    Variables only exist in this process: tasks after the first assignment are evaluated
+    here, one line after another.
+
+    Returns: exit status (1 if any line failed)
+    """
+    run = _BatchRun(on_error, numeric)
+    if workers == 1:
+        for segment in segments:
+            if isinstance(segment, str):
+                run.command(segment)
+            elif run.variables is not None:
+                run.task(_segment_task(segment))
+            else:
+                task, evaluated = _evaluate_segment(segment, numeric)
+                run.task(task if task is not None else cast(BatchTask, segment), evaluated)
+            if run.stop:
+                break
     else:
-        directive = directive if directive is not None else default_format
-        if directive in TIME_UNITS:
-            unit = TIME_UNITS[directive]
-            return f"{_format_decimal(to_scalar(result, unit))} {unit}"
-        return TIME_FORMATTERS[directive](result)
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(getcontext().prec, get_limits())
+        ) as executor:
+            queue: deque[str | tuple[BatchTask | MappedRange, Future[_EvaluatedSegment] | None]]
+            queue = deque()
+            assigned = False
+            while not run.stop:
+                # Keep a few tasks per worker in flight while results are written in order;
+                # a mapped range travels as offsets and is read by the worker itself
+                while len(queue) < workers * 4 and (pending := next(segments, None)):
+                    if isinstance(pending, str):
+                        queue.append(pending)
+                        assigned = assigned or _assignment(pending) is not None
+                    elif assigned:
+                        queue.append((pending, None))
+                    else:
+                        future = executor.submit(_evaluate_segment, pending, numeric)
+                        queue.append((pending, future))
+                if not queue:
+                    break
+                item = queue.popleft()
+                if isinstance(item, str):
+                    run.command(item)
+                elif item[1] is None:
+                    run.task(_segment_task(item[0]))
+                else:
+                    task, evaluated = item[1].result()
+                    run.task(task if task is not None else cast(BatchTask, item[0]), evaluated)
+            executor.shutdown(cancel_futures=True)
+    run.flush()
+    sys.stdout.flush()
+    return 1 if run.had_error else 0
+
+
+def _run_batch_file(path: str, on_error: str, workers: int = 1, numeric: str = "decimal") -> int:
+    """
+    Run batch mode on the file at path, or on stdin for "-"
+
+    A regular file is memory-mapped and split in place, so memory use stays flat however
+    large it is; other input is read as a stream.
+    """
+    from .mapped import can_map, mapped_segments
 
+    if path == "-" or not can_map(path):
+        return _with_input(
+            path, lambda stream: _run_batch(_batch_segments(stream), on_error, workers, numeric)
+        )
+    try:
+        segments = mapped_segments(path)
+        try:
+            return _run_batch(segments, on_error, workers, numeric)
+        finally:
+            segments.close()
+    except OSError as e:
+        print(f"Error: {e.strerror}: '{path}'", file=sys.stderr)
+        return 1
+
+
+def _digit_count(value: str) -> int:
+    """Parse a positive count, such as the digits of --precision"""
+    import argparse
+
+    count = int(value)
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"must be positive, got {count}")
+    return count
+
+
+def _evaluate_record(
+    expression: str,
+    history: History,
+    default_format: str,
+    numeric: str,
+    raw: bool,
+    stdin: TextIO | None = None,
+    variables: "Variables | None" = None,
+) -> tuple["Record", Decimal | timedelta | None]:
+    """
+    Evaluate an input line into a record; raw records skip formatting the result
+
+    With variables, an assignment defines a variable and its record holds the value.
 
-def calculate(
-    expression: str, last_result: str, default_format: str = "default"
-) -> tuple[bool, str, str]:
+    Returns: (record, result to add to history, or None if there is none)
     """
-    Calculate mathematical expression with preprocessing
+    from .output import Record, raw_value, value_type
+
+    assignment = _assignment(expression) if variables is not None else None
+    with _timed_line(expression):
+        try:
+            if variables is None:
+                result, directive = _evaluate_line(expression, history, numeric, stdin, files=True)
+            elif assignment is not None:
+                name, definition = assignment.groups()
+                result, directive, _ = _define_variable(
+                    name, definition, history, variables, files=True
+                )
+            else:
+                names = variables.referenced(expression)
+                result, directive = _evaluate_line(
+                    expression, history, numeric, stdin, names, files=True
+                )
+            if result is None:
+                last = history.last
+                return (Record(expression, True, raw_value(last), value_type(last)), None)
+            if raw:
+                _check_directive(result, directive)
+                formatted = None
+            else:
+                with _timed("format"):
+                    formatted = _format_result(result, directive, default_format)
+            record = Record(expression, True, raw_value(result), value_type(result), formatted)
+            return (record, result)
+        except Exception as e:
+            return (Record(expression, False, error=_error_message(e)), None)
+
+
+@functools.lru_cache(maxsize=DEFAULT_CACHE_SIZE)
+def _record_line(
+    expression: str, default_format: str, numeric: str, raw: bool, precision: int
+) -> tuple["Record", Decimal | timedelta | None]:
+    """Evaluate a line that does not use history into a record, memoized like _calculate_line"""
+    return _evaluate_record(expression, History(), default_format, numeric, raw)
+
+
+def _run_records(
+    lines: Iterable[str],
+    output: str,
+    on_error: str = "inline",
+    numeric: str = "decimal",
+    stdin: TextIO | None = None,
+) -> int:
+    """
+    Evaluate every line and write a machine-readable record for each one
+
+    jsonl and csv records hold the input, success, exact value, value type, formatted value
+    and error; raw output only writes the exact value. Records are written in large chunks.
+    A failed line is reported like in batch mode: "continue" and "abort" also report it on
+    stderr, where raw output leaves it out of stdout, and "abort" stops after it. An
+    assignment defines a variable, and its record holds the value; lines from the first
+    one on are no longer memoized.
 
-    Returns: (success: bool, value: str, error: str)
+    Returns: exit status (1 if any line failed)
     """
-    expression = _remove_comments(expression)
-    expression, directive = _extract_output_directive(expression)
-    expression = _substitute_history(expression, last_result)
-    if not expression:
-        return (True, last_result, "")
+    from .output import WRITE_CHUNK_RECORDS, Record, RecordWriter
 
+    # Someone at a terminal sees each record as soon as it is evaluated
+    interactive = sys.stdin.isatty() or sys.stdout.isatty()
+    writer = RecordWriter(output, chunk_records=1 if interactive else WRITE_CHUNK_RECORDS)
+    raw = output == "raw"
+    precision = getcontext().prec
+    current_format = "default"
+    history = History()
+    variables: Variables | None = None
+    had_error = False
+    for line_number, line in enumerate(lines, 1):
+        expression = line.strip()
+        if expression == "exit":
+            break
+        elif expression in COMMANDS or not _remove_comments(expression):
+            continue
+        elif expression.startswith("format "):
+            name = expression.removeprefix("format ").strip()
+            if _is_valid_format(name):
+                current_format = name
+                continue
+            record, result = (Record(expression, False, error=f"Unknown format: '{name}'"), None)
+        else:
+            if variables is None and _assignment(expression) is not None:
+                variables = _new_variables(numeric)
+            if variables is not None or "?" in expression or "@" in expression:
+                record, result = _evaluate_record(
+                    expression, history, current_format, numeric, raw, stdin, variables
+                )
+            else:
+                record, result = _record_line(expression, current_format, numeric, raw, precision)
+        if result is not None:
+            history.append(result)
+        elif not record.ok:
+            had_error = True
+        if record.ok or not raw or on_error == "inline":
+            writer.write(record)
+        if not record.ok and on_error != "inline":
+            writer.flush()
+            print(f"Error: line {line_number}: {record.error}", file=sys.stderr)
+            if on_error == "abort":
+                break
+    writer.flush()
+    return 1 if had_error else 0
+
+
+def _worker_count(value: str) -> int:
+    """Parse a --workers value, where 0 stands for the number of CPUs"""
+    import argparse
+
+    count = int(value)
+    if count < 0:
+        raise argparse.ArgumentTypeError(f"must be non-negative, got {count}")
+    return count or os.cpu_count() or 1
+
+
+def _parse_options(args: list[str]) -> "argparse.Namespace":
+    """Parse command-line options; the remaining arguments form the expression"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="calc", description="A simple command-line calculator")
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="evaluate each line of FILE ('-' for stdin) with buffered output",
+    )
+    parser.add_argument(
+        "--on-error",
+        choices=ERROR_POLICIES,
+        default="inline",
+        help="what a failed line does in batch mode (default: inline)",
+    )
+    parser.add_argument(
+        "--columns",
+        metavar="FILE",
+        help="evaluate the expression for every row of a CSV/TSV FILE ('-' for stdin), "
+        "reading columns by header name, and append the result as a new column",
+    )
+    parser.add_argument(
+        "--numeric",
+        choices=NUMERIC_BACKENDS,
+        default="decimal",
+        help="number type: decimal is exact, float is faster binary floating point "
+        "(default: decimal)",
+    )
+    parser.add_argument(
+        "--precision",
+        type=_digit_count,
+        metavar="DIGITS",
+        help="significant digits of decimal results, math functions and constants (default: 28)",
+    )
+    parser.add_argument(
+        "--max-digits",
+        type=_digit_count,
+        metavar="N",
+        help="reject numbers of 10^(N+1) or more, or nonzero ones below 10^-N in absolute "
+        f"value, before evaluating them where possible (default: {Limits().max_digits:,})",
+    )
+    parser.add_argument(
+        "--output-column",
+        default="result",
+        metavar="NAME",
+        help="header of the result column in column mode (default: result)",
+    )
+    parser.add_argument(
+        "--serve",
+        nargs="?",
+        const="",
+        metavar="SOCKET",
+        help="keep a warm server listening on a Unix SOCKET for calc-client "
+        "(default: $CALC_SOCKET or a per-user socket in the runtime directory)",
+    )
+    parser.add_argument(
+        "--session",
+        action="store_true",
+        help="with --serve, keep history (?) and format across the lines of a connection",
+    )
+    parser.add_argument(
+        "--workers",
+        type=_worker_count,
+        default=1,
+        metavar="N",
+        help="worker processes for batch mode; 0 uses every CPU (default: 1)",
+    )
+    parser.add_argument(
+        "--output",
+        choices=OUTPUT_FORMATS,
+        default="text",
+        help="result format: jsonl and csv write one record per line with the input, success, "
+        "exact value, value type, formatted value and error; raw writes the exact value only "
+        "(default: text)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="keep the results of an expression given as arguments in a database under DIR, "
+        "shared by every calc run using it (default: $CALC_CACHE_DIR, so setting it caches "
+        "every such run; no cache if unset)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=_digit_count,
+        default=DEFAULT_CACHE_MEGABYTES,
+        metavar="MB",
+        help="megabytes the result cache may use before the least recently used results are "
+        f"dropped (default: {DEFAULT_CACHE_MEGABYTES})",
+    )
+    parser.add_argument("expression", nargs=argparse.REMAINDER, help="expression to evaluate")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time each stage of evaluation and report percentiles and the slowest lines on stderr",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=DEFAULT_SLOWEST_LINES,
+        metavar="N",
+        help=f"slowest lines the profile lists (default: {DEFAULT_SLOWEST_LINES})",
+    )
+    parser.add_argument(
+        "--profile-json",
+        metavar="FILE",
+        help="also write the profile to FILE as JSON; implies --profile",
+    )
+    options = parser.parse_args(args)
+    options.profile = options.profile or options.profile_json is not None
+    if options.profile:
+        if options.columns is not None or options.serve is not None:
+            parser.error("--profile cannot be combined with --columns or --serve")
+        if options.workers != 1:
+            parser.error("--profile cannot be combined with --workers")
+    if options.cache_dir is not None and (
+        not options.expression
+        or options.output != "text"
+        or any(mode is not None for mode in (options.batch, options.columns, options.serve))
+    ):
+        parser.error("--cache-dir only applies to a text result of an expression argument")
+    if options.output != "text":
+        if options.columns is not None or options.serve is not None:
+            parser.error("--output cannot be combined with --columns or --serve")
+        if options.workers != 1:
+            parser.error("--output cannot be combined with --workers")
+    return options
+
+
+def _parse_cell(row: Sequence[str], index: int, column: str) -> Decimal:
+    """Parse the number in a CSV cell, allowing thousands separators but not NaN or Infinity"""
+    if index >= len(row):
+        raise ValueError(f"Missing value in column '{column}'")
     try:
-        expression = _normalize_operators(expression)
-        expression = _remove_thousands_separators(expression)
-        expression = convert_time_expressions(expression)
-        expression = _remove_non_time_units(expression)
-
-        result = ast_safe_eval(expression)
-        formatted_result = _format_result(result, directive, default_format)
-
-        return (True, formatted_result, "")
-
-    except (ValueError, TypeError) as e:
-        return (False, last_result, str(e))
-    except ZeroDivisionError:
-        return (False, last_result, "Division by zero")
-    except OverflowError:
-        return (False, last_result, "Number too large")
-    except SyntaxError:
-        return (False, last_result, "Invalid syntax")
-    except Exception as e:
-        return (False, last_result, f"{type(e).__name__} - {e}")
+        value = Decimal(row[index].replace(",", ""))
+    except InvalidOperation:
+        value = None
+    if value is None or not value.is_finite():
+        raise ValueError(f"Invalid number in column '{column}': '{row[index]}'")
+    return value
 
 
-def _evaluate_and_print(
-    expression: str, last_result: str, default_format: str = "default"
-) -> tuple[bool, str]:
-    """Evaluate expression, print the result or error, and return success and history value"""
-    if not _remove_comments(expression):
-        return (True, last_result)
+def _format_cell(result: Decimal | timedelta) -> str:
+    """Format a result for a CSV cell: numbers without thousands separators"""
+    if isinstance(result, timedelta):
+        return format_colon(result)
+    return f"{_normalize_result(result):f}"
 
-    success, value, error = calculate(expression, last_result, default_format)
 
-    if success:
-        print(f"= {value}")
-    else:
-        print(f"Error: {error}")
+def _evaluate_row(expression: "ColumnExpression", row: Sequence[str]) -> Decimal | timedelta:
+    """Evaluate expression with Decimal over the cells of one row"""
+    columns = zip(expression.columns, expression.indices, strict=True)
+    names = {column: _parse_cell(row, index, column) for column, index in columns}
+    return evaluate(expression.compiled, names)
+
+
+def _evaluate_decimal_block(
+    expression: "ColumnExpression", rows: Sequence[Sequence[str]]
+) -> tuple[list[str], bool]:
+    """
+    Evaluate expression row by row with Decimal
 
-    return (success, value)
+    Returns: (result cells, whether any row failed)
+    """
+    results: list[str] = []
+    failed = False
+    for row in rows:
+        try:
+            results.append(_format_cell(_evaluate_row(expression, row)))
+        except Exception as e:
+            results.append(f"Error: {_error_message(e)}")
+            failed = True
+    return (results, failed)
+
+
+def _format_float_block(
+    expression: "ColumnExpression", rows: Sequence[Sequence[str]], values: Sequence[float]
+) -> tuple[list[str], bool]:
+    """
+    Format the float results of a block like those of the float backend
 
+    A value that is not finite is an error: the row is evaluated with Decimal to name it,
+    as in "Division by zero", and otherwise reported as a float overflow.
 
-def _process_command(
-    expression: str, last_result: str, current_format: str
-) -> tuple[bool, str, str, bool]:
+    Returns: (result cells, whether any row failed)
     """
-    Process a single command expression
+    from .float_evaluator import to_decimal
+
+    results: list[str] = []
+    failed = False
+    for row, value in zip(rows, values, strict=True):
+        try:
+            if not math.isfinite(value):
+                _evaluate_row(expression, row)
+            result = to_decimal(value)
+            check_result(result)
+            results.append(_format_cell(result))
+        except Exception as e:
+            results.append(f"Error: {_error_message(e)}")
+            failed = True
+    return (results, failed)
+
+
+def _run_columns(
+    stream: TextIO, delimiter: str, expression: str, numeric: str, output_column: str
+) -> int:
+    """
+    Evaluate expression for every row of a CSV/TSV stream and append the result column
+
+    The expression is compiled once against the header. With the float backend, blocks
+    are evaluated on NumPy arrays when the expression and cells allow it; otherwise each
+    row is evaluated exactly with Decimal.
 
-    Returns:
-        (should_continue: bool, last_result: str, current_format: str, success: bool)
+    Returns: exit status (1 if any row failed)
     """
-    if not expression:
-        return (True, last_result, current_format, True)
-    elif expression == "exit":
-        return (False, last_result, current_format, True)
-    elif expression == "help":
-        print(get_help())
-        return (True, last_result, current_format, True)
-    elif expression == "format":
-        print(current_format)
-        return (True, last_result, current_format, True)
-    elif expression.startswith("format "):
-        name = expression.removeprefix("format ").strip()
-        if _is_valid_format(name):
-            return (True, last_result, name, True)
-        print(f"Error: Unknown format: '{name}'")
-        return (True, last_result, current_format, False)
-    else:
-        success, new_result = _evaluate_and_print(expression, last_result, current_format)
-        return (True, new_result, current_format, success)
+    import csv
+
+    from .columns import COLUMN_BLOCK_ROWS, compile_columns, evaluate_float_block
+
+    reader = csv.reader(stream, delimiter=delimiter)
+    writer = csv.writer(sys.stdout, delimiter=delimiter, lineterminator="\n")
+    header = [name.strip() for name in next(reader, [])]
+    try:
+        column_expression = compile_columns(normalize_expression(expression), header)
+    except Exception as e:
+        print(f"Error: {_error_message(e)}", file=sys.stderr)
+        return 1
+    writer.writerow([*header, output_column])
+
+    vectorize = numeric == "float" and column_expression.vectorizable
+    had_error = False
+    while block := list(itertools.islice(reader, COLUMN_BLOCK_ROWS)):
+        rows = [row for row in block if row]
+        values = evaluate_float_block(column_expression, rows) if vectorize else None
+        if values is None:
+            results, failed = _evaluate_decimal_block(column_expression, rows)
+        else:
+            results, failed = _format_float_block(column_expression, rows, values)
+        had_error = had_error or failed
+        writer.writerows([*row, result] for row, result in zip(rows, results, strict=True))
+    sys.stdout.flush()
+    return 1 if had_error else 0
+
+
+def _with_input(path: str, run: Callable[[TextIO], int], newline: str | None = None) -> int:
+    """Call run with the file at path, or with stdin for "-"; return its exit status"""
+    if path == "-":
+        return run(sys.stdin)
+    try:
+        with open(path, encoding="utf-8", newline=newline) as stream:
+            return run(stream)
+    except OSError as e:
+        print(f"Error: {e.strerror}: '{path}'", file=sys.stderr)
+        return 1
 
 
 def _input_lines() -> Iterator[str]:
     """Yield input lines from the prompt session (tty) or stdin (pipe)"""
     if sys.stdin.isatty():
+        from prompt_toolkit import PromptSession
+
         session: PromptSession[str] = PromptSession()
         while True:
             yield session.prompt()
@@ -250,21 +760,86 @@ def _input_lines() -> Iterator[str]:
         yield from sys.stdin
 
 
-def main() -> None:
-    last_result = "0"
+def _run_mode(args: list[str], options: "argparse.Namespace | None") -> None:
+    """Run the mode that options select, or evaluate args or the input lines without them"""
     current_format = "default"
-
-    if len(sys.argv) > 1:
-        expression = " ".join(sys.argv[1:])
-        success, _ = _evaluate_and_print(expression, last_result)
+    numeric = "decimal"
+    output = "text"
+
+    if options is not None:
+        if options.precision is not None:
+            _set_precision(options.precision)
+        if options.max_digits is not None:
+            set_limits(Limits(max_digits=options.max_digits))
+        if options.batch is not None and options.output != "text":
+            sys.exit(
+                _with_input(
+                    options.batch,
+                    lambda stream: _run_records(
+                        stream, options.output, options.on_error, options.numeric
+                    ),
+                )
+            )
+        if options.batch is not None:
+            sys.exit(
+                _run_batch_file(options.batch, options.on_error, options.workers, options.numeric)
+            )
+        if options.serve is not None:
+            from .client import default_socket_path
+            from .server import serve
+
+            path = options.serve or default_socket_path()
+            sys.exit(serve(path, options.session, options.numeric))
+        if options.columns is not None:
+            delimiter = "\t" if options.columns.lower().endswith(".tsv") else ","
+            expression = " ".join(options.expression)
+            sys.exit(
+                _with_input(
+                    options.columns,
+                    lambda stream: _run_columns(
+                        stream, delimiter, expression, options.numeric, options.output_column
+                    ),
+                    newline="",
+                )
+            )
+        args = options.expression
+        numeric = options.numeric
+        output = options.output
+
+    if output != "text":
+        lines: Iterable[str] = [" ".join(args)] if args else _input_lines()
+        status = _run_records(lines, output, numeric=numeric, stdin=sys.stdin if args else None)
+        sys.exit(0 if sys.stdin.isatty() and not args else status)
+
+    if args:
+        expression = " ".join(args)
+        cache_dir = options.cache_dir if options is not None else None
+        cache_dir = cache_dir or os.environ.get("CALC_CACHE_DIR")
+        if cache_dir:
+            from .disk_cache import calculate_cached
+
+            megabytes = options.cache_size if options is not None else DEFAULT_CACHE_MEGABYTES
+            result = calculate_cached(
+                expression, cache_dir, megabytes << 20, numeric, sys.stdin, files=True
+            )
+            if not result.ok:
+                print(f"Error: {result.error}")
+            elif result.formatted:
+                print(f"= {result.formatted}")
+            sys.exit(0 if result.ok else 1)
+        success = _evaluate_and_print(
+            expression, History(), numeric=numeric, stdin=sys.stdin, files=True
+        )
         sys.exit(0 if success else 1)
 
+    history = History()
+    variables = _new_variables(numeric)
     interactive = sys.stdin.isatty()
     had_error = False
     for line in _input_lines():
         expression = line.strip()
-        should_continue, last_result, current_format, success = _process_command(
-            expression, last_result, current_format
+        should_continue, current_format, success = _process_command(
+            expression, history, current_format, numeric, variables=variables, files=True
         )
         had_error = had_error or not success
         if not should_continue:
@@ -273,5 +848,21 @@ def main() -> None:
         sys.exit(1)
 
 
+def main() -> None:
+    args = sys.argv[1:]
+    options = _parse_options(args) if args and OPTION_PATTERN.match(args[0]) else None
+    if options is not None and options.profile:
+        from .profiling import Profiler
+
+        with Profiler(options.profile_top, options.profile_json) as profiler:
+            set_profiler(profiler)
+            try:
+                _run_mode(args, options)
+            finally:
+                set_profiler(None)
+    else:
+        _run_mode(args, options)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,180 @@
+import asyncio
+import multiprocessing
+import os
+from decimal import getcontext
+from multiprocessing.connection import Connection
+from types import TracebackType
+from typing import Any, Final
+
+from .core import _init_worker, calculate
+from .limits import Limits, get_limits
+
+# Seconds an expression may take by default before its evaluation is stopped
+DEFAULT_TIMEOUT: Final = 1.0
+# Sent by a worker once it has imported calc and can evaluate without delay
+_READY: Final = "ready"
+
+CalculateResult = tuple[bool, str, str]
+
+
+def _serve(connection: Connection, precision: int, limits: Limits) -> None:
+    """Evaluate the calculate() arguments received on connection until it closes"""
+    _init_worker(precision, limits)
+    connection.send(_READY)
+    while True:
+        try:
+            args = connection.recv()
+        except EOFError:
+            return
+        connection.send(calculate(*args))
+
+
+class _Worker:
+    """Process evaluating one expression at a time, killed when it takes too long"""
+
+    def __init__(self, context: Any, precision: int, limits: Limits) -> None:
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, precision, limits), daemon=True)
+        self.process.start()
+        child.close()
+
+    async def receive(self) -> Any:
+        """Wait without blocking the event loop for the next message from the process"""
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+
+        def on_readable() -> None:
+            if not readable.done():
+                readable.set_result(None)
+
+        descriptor = self.connection.fileno()
+        loop.add_reader(descriptor, on_readable)
+        try:
+            await readable
+        finally:
+            loop.remove_reader(descriptor)
+        return self.connection.recv()
+
+    async def calculate(self, args: tuple[str, str, str, str]) -> CalculateResult:
+        self.connection.send(args)
+        result: CalculateResult = await self.receive()
+        return result
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def close(self) -> None:
+        """Let the process exit once it sees the closed connection"""
+        self.connection.close()
+        self.process.join()
+
+
+class AsyncCalculator:
+    """
+    Evaluate expressions from asyncio code in worker processes, with a deadline each
+
+    At most max_workers expressions are evaluated at a time; further calls wait for a free
+    worker. An expression still running at its deadline has its worker killed and
+    replaced, so it stops using CPU and memory, and the call returns a timeout error.
+    Use it as an async context manager, or call close() when done.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        timeout: float | None = DEFAULT_TIMEOUT,
+        precision: int | None = None,
+    ) -> None:
+        """
+        timeout is the default deadline in seconds, or None for none; precision is the
+        significant digits of Decimal results, by default those of the decimal context.
+        Workers apply the limits of calc.limits in effect when the instance is created.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.precision = precision or getcontext().prec
+        self.limits = get_limits()
+        # Forking a process that runs an event loop and threads is unsafe
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._idle: list[_Worker] = []
+        self._busy: set[_Worker] = set()
+
+    async def __aenter__(self) -> "AsyncCalculator":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    async def calculate(
+        self,
+        expression: str,
+        last_result: str = "0",
+        default_format: str = "default",
+        numeric: str = "decimal",
+        timeout: float | None = None,
+    ) -> CalculateResult:
+        """
+        Calculate expression like calculate() without blocking the event loop
+
+        timeout, if given, replaces the default deadline of this instance. A timeout is
+        reported as an error like any other.
+
+        Returns: (success: bool, value: str, error: str)
+        """
+        deadline = timeout if timeout is not None else self.timeout
+        async with self._slots:
+            worker = await self._acquire()
+            try:
+                result = await asyncio.wait_for(
+                    worker.calculate((expression, last_result, default_format, numeric)),
+                    deadline,
+                )
+            except asyncio.TimeoutError:
+                self._discard(worker)
+                return (False, last_result, f"Timed out after {deadline:g} s")
+            except (EOFError, OSError):
+                self._discard(worker)
+                return (False, last_result, "Evaluation process exited unexpectedly")
+            except BaseException:
+                # Cancelled mid-evaluation: the worker may still be busy with it
+                self._discard(worker)
+                raise
+            self._busy.discard(worker)
+            self._idle.append(worker)
+            return result
+
+    async def _acquire(self) -> _Worker:
+        """Take an idle worker, or start one and wait until it is ready"""
+        if self._idle:
+            worker = self._idle.pop()
+        else:
+            worker = _Worker(self._context, self.precision, self.limits)
+            try:
+                await worker.receive()
+            except BaseException:
+                worker.kill()
+                raise
+        self._busy.add(worker)
+        return worker
+
+    def _discard(self, worker: _Worker) -> None:
+        self._busy.discard(worker)
+        worker.kill()
+
+    async def close(self) -> None:
+        """Stop every worker process"""
+        for worker in self._busy:
+            worker.kill()
+        self._busy.clear()
+        idle, self._idle = self._idle, []
+        loop = asyncio.get_running_loop()
+        for worker in idle:
+            await loop.run_in_executor(None, worker.close)
@@ -0,0 +1,95 @@
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import NamedTuple
+
+from .evaluator import CompiledExpression
+
+DEFAULT_CACHE_SIZE = 4096
+
+# Whitespace is dropped only where Python's tokenizer cannot merge the neighbours into a
+# different token: around parentheses and commas, and between an operand and an operator.
+# Runs between two operator characters are kept so "* *" never becomes "**", and the
+# look-behinds keep an invalid "1e - 3" from turning into the exponent literal "1e-3".
+_PUNCTUATION_SPACE = re.compile(r"\s*([(),])\s*")
+_OPERAND_OPERATOR_SPACE = re.compile(
+    r"(?<=[\w.])(?<![\d.][eE])\s+(?=[-+*/%])|(?<=[-+*/%])(?<![\d.][eE][-+])\s+(?=[\w.])"
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def canonical_key(expression: str) -> str:
+    """Return the canonical form of a preprocessed expression, used as the cache key"""
+    expression = _WHITESPACE.sub(" ", expression).strip()
+    expression = _PUNCTUATION_SPACE.sub(r"\1", expression)
+    return _OPERAND_OPERATOR_SPACE.sub("", expression)
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    """Compiled plan for a canonical expression, plus its result once known"""
+
+    compiled: CompiledExpression
+    result: Decimal | timedelta | None = None
+    # Decimal precision the result was calculated at
+    precision: int = 0
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+class ExpressionCache:
+    """Bounded LRU cache of compiled expressions keyed on their canonical form"""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE) -> None:
+        if maxsize < 0:
+            raise ValueError(f"Cache size must be non-negative, got {maxsize}")
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> CacheEntry | None:
+        """Return the entry for key and mark it most recently used, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        """Store entry under key, evicting the least recently used entries over the limit"""
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    def info(self) -> CacheInfo:
+        """Report hit, miss and eviction counters with the size limit and current size"""
+        with self._lock:
+            return CacheInfo(
+                self._hits, self._misses, self._evictions, self.maxsize, len(self._entries)
+            )
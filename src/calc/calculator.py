@@ -0,0 +1,95 @@
+from collections.abc import Iterable
+from datetime import timedelta
+from decimal import Decimal, localcontext
+
+from .cache import DEFAULT_CACHE_SIZE, ExpressionCache
+from .core import (
+    NUMERIC_BACKENDS,
+    Result,
+    _error_message,
+    _evaluate_cached,
+    _extract_output_directive,
+    _format_result,
+    _is_valid_format,
+    _remove_comments,
+    _substitute_files,
+)
+from .history import HISTORY_SIZE, History
+from .lexer import normalize_expression
+
+__all__ = ["Calculator", "Result"]
+
+
+class Calculator:
+    """
+    Calculator session for use as a library, keeping its own history, format and cache
+
+    The results that ?, ?N and ?-N refer to are kept as exact values rather than as their
+    display text. An instance is not meant to be shared between threads; use one per
+    thread.
+    """
+
+    def __init__(
+        self,
+        default_format: str = "default",
+        numeric: str = "decimal",
+        precision: int | None = None,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        history_size: int = HISTORY_SIZE,
+    ) -> None:
+        """
+        default_format is the format of time results without as <format>; numeric is the
+        backend, "decimal" or "float". precision is the significant digits of Decimal
+        results, or None for the precision of the calling thread's decimal context.
+        history_size is the number of results kept for ?N and ?-N.
+        """
+        if not _is_valid_format(default_format):
+            raise ValueError(f"Unknown format: '{default_format}'")
+        if numeric not in NUMERIC_BACKENDS:
+            raise ValueError(f"Unknown numeric backend: '{numeric}'")
+        if precision is not None and precision < 1:
+            raise ValueError(f"Precision must be positive, got {precision}")
+        self.default_format = default_format
+        self.numeric = numeric
+        self.precision = precision
+        self.cache = ExpressionCache(cache_size)
+        self.history = History(size=history_size)
+
+    @property
+    def last_result(self) -> Decimal | timedelta:
+        """The result ? refers to"""
+        return self.history.last
+
+    def evaluate(self, expression: str) -> Result:
+        """Evaluate expression, which may refer to earlier results with ?, ?N and ?-N"""
+        with localcontext() as context:
+            if self.precision is not None:
+                context.prec = self.precision
+            return self._evaluate(expression)
+
+    def evaluate_many(self, expressions: Iterable[str]) -> list[Result]:
+        """Evaluate expressions in order, each seeing the results before it"""
+        with localcontext() as context:
+            if self.precision is not None:
+                context.prec = self.precision
+            return [self._evaluate(expression) for expression in expressions]
+
+    def _evaluate(self, expression: str) -> Result:
+        try:
+            expression, directive = _extract_output_directive(_remove_comments(expression))
+            if not expression:
+                return Result(True)
+            names: dict[str, Decimal | timedelta] = {}
+            if "?" in expression:
+                expression, names = self.history.substitute(expression)
+            if "@" in expression:
+                # Rejected: a session never reads files, as its input may come from anyone
+                _substitute_files(expression, None, files=False)
+            result = _evaluate_cached(
+                normalize_expression(expression), True, self.numeric, names, self.cache
+            )
+            formatted = _format_result(result, directive, self.default_format)
+        except Exception as e:
+            return Result(False, error=_error_message(e))
+        self.history.append(result)
+        return Result(True, result, formatted)
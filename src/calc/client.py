@@ -0,0 +1,79 @@
+import os
+import socket
+import sys
+import tempfile
+import threading
+from collections.abc import Iterable
+from typing import BinaryIO, TextIO
+
+# Marks the end of the reply to one request line; the digit after it is the exit status
+# the line would have produced in main(). Output lines never contain a NUL character.
+END_OF_REPLY = "\0"
+
+
+def default_socket_path() -> str:
+    """Return the socket path used when none is given: $CALC_SOCKET or a per-user file"""
+    path = os.environ.get("CALC_SOCKET")
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"calc-{os.getuid()}.sock")
+
+
+def _send_lines(sock: socket.socket, lines: Iterable[str]) -> None:
+    """Send request lines, then shut down the sending side so the server sees the end"""
+    try:
+        for line in lines:
+            sock.sendall(line.rstrip("\n").encode("utf-8") + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+
+def _print_replies(replies: BinaryIO, output: TextIO) -> bool:
+    """Print reply lines until the server closes the connection; return whether all succeeded"""
+    success = True
+    for raw in replies:
+        line = raw.decode("utf-8")
+        if line.startswith(END_OF_REPLY):
+            success = success and line[1:].strip() == "0"
+        else:
+            output.write(line)
+    output.flush()
+    return success
+
+
+def main() -> None:
+    """
+    Send expressions to a running `calc --serve` and print the replies
+
+    Usage: calc-client [--socket PATH] [expression...]
+
+    An expression given as arguments is sent as one line, like `calc "expression"`;
+    otherwise stdin is sent line by line, like piped input. Exit status follows main().
+    """
+    args = sys.argv[1:]
+    path = default_socket_path()
+    if args[:1] == ["--socket"] and len(args) > 1:
+        path, args = args[1], args[2:]
+
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+    except OSError as e:
+        print(f"Error: cannot connect to calc server at '{path}': {e.strerror}", file=sys.stderr)
+        sys.exit(1)
+
+    with sock:
+        lines: Iterable[str] = [" ".join(args)] if args else sys.stdin
+        # Sending runs in its own thread so a long input never blocks on unread replies
+        sender = threading.Thread(target=_send_lines, args=(sock, lines), daemon=True)
+        sender.start()
+        with sock.makefile("rb") as replies:
+            success = _print_replies(replies, sys.stdout)
+    interactive = not args and sys.stdin.isatty()
+    sys.exit(0 if success or interactive else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import ast
+import functools
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Final, cast
+
+from .evaluator import (
+    _ALLOWED_BINARY_OPERATORS,
+    _ALLOWED_CONSTANTS,
+    _ALLOWED_FUNCTIONS,
+    CompiledExpression,
+    compile_expression,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+    from numpy.typing import NDArray
+
+    FloatArray = NDArray[np.float64]
+
+# Rows evaluated and written together; bounds memory use on large files
+COLUMN_BLOCK_ROWS = 65_536
+
+# Functions with an elementwise NumPy counterpart. timedelta has none, so an expression
+# calling it is always evaluated row by row with Decimal.
+_VECTOR_FUNCTIONS: Final[frozenset[str]] = frozenset(_ALLOWED_FUNCTIONS.keys() - {"timedelta"})
+
+
+@dataclass(frozen=True, slots=True)
+class ColumnExpression:
+    """Expression compiled once against the header of a CSV/TSV file"""
+
+    compiled: CompiledExpression
+    columns: tuple[str, ...]
+    indices: tuple[int, ...]
+    vectorizable: bool
+
+
+def _check_node(node: ast.AST, header: Sequence[str], columns: dict[str, int]) -> bool:
+    """
+    Check node against the evaluator's whitelist, collecting the columns it reads
+
+    Returns: whether NumPy can evaluate node elementwise
+    """
+    if isinstance(node, ast.BinOp):
+        if type(node.op) not in _ALLOWED_BINARY_OPERATORS:
+            raise TypeError(f"Unsupported operator: {type(node.op).__name__}")
+        left = _check_node(node.left, header, columns)
+        return _check_node(node.right, header, columns) and left
+    elif isinstance(node, ast.UnaryOp):
+        if not isinstance(node.op, (ast.UAdd, ast.USub)):
+            raise TypeError(f"Unsupported unary operator: {type(node.op).__name__}")
+        return _check_node(node.operand, header, columns)
+    elif isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name):
+            raise TypeError(f"Unsupported function call type: {type(node.func).__name__}")
+        func_name = node.func.id
+        if func_name not in _ALLOWED_FUNCTIONS:
+            raise TypeError(f"Unsupported function: {func_name}")
+        checked = [_check_node(arg, header, columns) for arg in node.args]
+        checked += [_check_node(keyword.value, header, columns) for keyword in node.keywords]
+        # NumPy rounds a whole array to one precision, so it has to be a literal
+        literal_precision = func_name not in ("round", "roundeven") or all(
+            isinstance(arg, ast.Constant) for arg in node.args[1:]
+        )
+        return (
+            all(checked)
+            and func_name in _VECTOR_FUNCTIONS
+            and not node.keywords
+            and (literal_precision)
+        )
+    elif isinstance(node, ast.Name):
+        if node.id in _ALLOWED_CONSTANTS:
+            return True
+        if node.id not in header:
+            raise ValueError(f"Unknown column: '{node.id}'")
+        columns.setdefault(node.id, list(header).index(node.id))
+        return True
+    elif isinstance(node, ast.Constant):
+        if not isinstance(node.value, (int, float)):
+            raise TypeError(f"Unsupported constant type: {type(node.value).__name__}")
+        return True
+    else:
+        raise TypeError(f"Unsupported AST node type: {type(node).__name__}")
+
+
+def compile_columns(expression: str, header: Sequence[str]) -> ColumnExpression:
+    """Compile a preprocessed expression whose free names refer to columns of header"""
+    compiled = compile_expression(expression)
+    too_deep = "Expression is nested too deeply for column mode"
+    if compiled.node is None:
+        raise ValueError(too_deep)
+    columns: dict[str, int] = {}
+    try:
+        vectorizable = _check_node(compiled.node, header, columns)
+    except RecursionError:
+        raise ValueError(too_deep) from None
+    return ColumnExpression(compiled, tuple(columns), tuple(columns.values()), vectorizable)
+
+
+def evaluate_float_block(
+    expression: ColumnExpression, rows: Sequence[Sequence[str]]
+) -> list[float] | None:
+    """
+    Evaluate a vectorizable expression over a block of rows with NumPy float64 arrays
+
+    Results follow IEEE float semantics (division by zero gives inf, invalid input nan),
+    so the caller has to reject values that are not finite. Returns None when NumPy is
+    not installed or a cell is not a plain number, so the caller can evaluate the block
+    with Decimal instead.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+
+    values: dict[str, FloatArray] = {}
+    try:
+        for column, index in zip(expression.columns, expression.indices, strict=True):
+            cells = [row[index] for row in rows]
+            try:
+                values[column] = np.array(cells, dtype=np.float64)
+            except ValueError:
+                values[column] = np.array([c.replace(",", "") for c in cells], dtype=np.float64)
+    except (IndexError, ValueError):
+        return None
+
+    def round_half_up(array: "FloatArray", precision: float = 0) -> "FloatArray":
+        scale = 10.0 ** int(precision)
+        return np.copysign(np.floor(np.abs(array) * scale + 0.5), array) / scale
+
+    functions: dict[str, Callable[..., Any]] = {
+        "abs": np.abs,
+        "avg": lambda *args: functools.reduce(np.add, args) / len(args),
+        "ceil": np.ceil,
+        "cos": np.cos,
+        "exp": np.exp,
+        "floor": np.floor,
+        "log": np.log,
+        "max": lambda *args: functools.reduce(np.maximum, args),
+        "min": lambda *args: functools.reduce(np.minimum, args),
+        "round": round_half_up,
+        "roundeven": lambda array, precision=0: np.round(array, int(precision)),
+        "sin": np.sin,
+        "sqrt": np.sqrt,
+        "sum": lambda *args: functools.reduce(np.add, args, 0.0),
+        "tan": np.tan,
+    }
+    # fmod truncates like Decimal's remainder; NumPy's % would floor
+    operators: dict[type, Callable[[Any, Any], Any]] = {
+        ast.Add: np.add,
+        ast.Sub: np.subtract,
+        ast.Mult: np.multiply,
+        ast.Div: np.true_divide,
+        ast.Mod: np.fmod,
+        ast.Pow: np.power,
+    }
+    constants = {name: float(value()) for name, value in _ALLOWED_CONSTANTS.items()}
+
+    def visit(node: ast.AST) -> Any:
+        if isinstance(node, ast.BinOp):
+            return operators[type(node.op)](visit(node.left), visit(node.right))
+        elif isinstance(node, ast.UnaryOp):
+            operand = visit(node.operand)
+            return np.negative(operand) if isinstance(node.op, ast.USub) else operand
+        elif isinstance(node, ast.Call):
+            func_name = cast(ast.Name, node.func).id
+            return functions[func_name](*[visit(arg) for arg in node.args])
+        elif isinstance(node, ast.Name):
+            return constants[node.id] if node.id in constants else values[node.id]
+        else:
+            return cast(ast.Constant, node).value
+
+    with np.errstate(all="ignore"):
+        result = np.broadcast_to(
+            np.asarray(visit(cast(ast.expr, expression.compiled.node)), np.float64), len(rows)
+        )
+    return cast(list[float], result.tolist())
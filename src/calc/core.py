@@ -0,0 +1,522 @@
+import re
+from collections.abc import Callable, Mapping
+from datetime import timedelta
+from decimal import Decimal, DefaultContext, Overflow, getcontext, localcontext
+from typing import TYPE_CHECKING, NamedTuple, TextIO
+
+from .cache import CacheEntry, ExpressionCache, canonical_key
+from .evaluator import compile_expression, evaluate, prepare
+from .history import History
+from .lexer import normalize_expression
+from .limits import Limits, set_limits
+from .time_utils import (
+    format_colon,
+    format_english,
+    format_japanese,
+    to_scalar,
+)
+
+# Evaluation shared by the modes of the command line and by the library modules. It lives
+# apart from calc.__main__, which only runs the modes, so that importing it from a module
+# never loads the command line a second time under `python -m calc`.
+if TYPE_CHECKING:
+    from contextlib import AbstractContextManager
+
+    from .profiling import Profiler
+    from .variables import Variables
+
+FORMAT_NAME_PATTERN = re.compile(r"\w+")
+# Megabytes the result cache of --cache-dir uses by default
+DEFAULT_CACHE_MEGABYTES = 64
+NUMERIC_BACKENDS = ("decimal", "float")
+COMMANDS = frozenset({"exit", "help", "format"})
+# "name = expression" defines a variable; "==" is not an assignment
+ASSIGNMENT_PATTERN = re.compile(r"([^\W\d]\w*)\s*=(?!=)\s*(.*)")
+# Threshold for _has_precision_artifact: long enough that values a user deliberately
+# enters rarely hit it, short enough to catch real artifacts, whose runs are 13+ digits
+# (see _has_precision_artifact for where those runs come from).
+PRECISION_DIGITS = 12
+TIME_FORMATTERS = {
+    "default": format_colon,
+    "colon": format_colon,
+    "japanese": format_japanese,
+    "jp": format_japanese,
+    "ja": format_japanese,
+    "english": format_english,
+    "en": format_english,
+}
+TIME_UNITS = {
+    "sec": "sec",
+    "seconds": "sec",
+    "s": "sec",
+    "min": "min",
+    "minutes": "min",
+    "m": "min",
+    "hour": "hour",
+    "hours": "hour",
+    "h": "hour",
+    "day": "day",
+    "days": "day",
+    "d": "day",
+}
+
+
+expression_cache = ExpressionCache()
+# The profiler of --profile while it runs; stages and lines are only timed when it is set
+_profiler: "Profiler | None" = None
+
+# Expression lines of a batch task: (line number, expression, format in effect)
+BatchTask = list[tuple[int, str, str]]
+
+
+class Result(NamedTuple):
+    """Outcome of evaluating one line"""
+
+    ok: bool
+    # The exact result; None when evaluation failed or the line was only a comment
+    value: Decimal | timedelta | None = None
+    # The result as calc displays it
+    formatted: str = ""
+    error: str = ""
+
+
+class _Untimed:
+    """Stands in for the timers of the profiler when there is none"""
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info: object) -> None:
+        pass
+
+    def __call__(self, expression: str) -> "_Untimed":
+        return self
+
+
+_UNTIMED = _Untimed()
+
+
+def set_profiler(profiler: "Profiler | None") -> None:
+    """Time stages and lines with profiler from now on; None stops timing them"""
+    global _profiler
+    _profiler = profiler
+
+
+def _timed(stage: str) -> "AbstractContextManager[None]":
+    """Context manager timing a block as a call of stage while profiling"""
+    return _UNTIMED if _profiler is None else _profiler.timer(stage)
+
+
+def _timed_line(expression: str) -> "AbstractContextManager[None]":
+    """Context manager timing the evaluation of an input line while profiling"""
+    return _UNTIMED if _profiler is None else _profiler.line(expression)
+
+
+def _is_valid_format(name: str) -> bool:
+    """Check if name is a known time format or unit"""
+    return name in TIME_FORMATTERS or name in TIME_UNITS
+
+
+def _remove_comments(expression: str) -> str:
+    """Remove comments from expression"""
+    return expression.split("#", 1)[0].strip()
+
+
+def _extract_output_directive(expression: str) -> tuple[str, str | None]:
+    """Extract trailing output format directive (as <format>)"""
+    # Splitting off the last two words from the right keeps this linear in the input length;
+    # a regex anchored at the end would be retried at every whitespace run.
+    parts = expression.rsplit(maxsplit=2)
+    if len(parts) != 3 or parts[1] != "as" or not FORMAT_NAME_PATTERN.fullmatch(parts[2]):
+        return (expression, None)
+    return (parts[0], parts[2])
+
+
+def _has_precision_artifact(value: Decimal) -> bool:
+    """Check if value has precision artifacts like repeated 9s or 0s"""
+    # Two noise sources both leave a long run of identical digits: rounding to the digits
+    # of the decimal context (1/3*3 -> 0.9999999999999999999999999999, sqrt(2)^2 ->
+    # 1.999999999999999999999999999) and, with the float backend, binary floating point
+    # (sqrt(2)^2 -> 2.0000000000000004). Genuine results rarely look like this.
+    str_val = str(value)
+    pattern_9s = "9" * PRECISION_DIGITS
+    pattern_0s = "0" * PRECISION_DIGITS
+    return pattern_9s in str_val or pattern_0s in str_val
+
+
+def _normalize_result(value: Decimal) -> Decimal:
+    """Normalize high-precision Decimal to user-friendly display format"""
+    if _has_precision_artifact(value):
+        quantize_pattern = Decimal(f"0.{'0' * PRECISION_DIGITS}")
+        tolerance = Decimal(f"1e-{PRECISION_DIGITS - 2}")
+        with localcontext() as context:
+            # Large values need more digits than the context keeps to be quantized
+            context.prec = max(context.prec, value.adjusted() + PRECISION_DIGITS + 1)
+            rounded = value.quantize(quantize_pattern)
+            if abs(rounded - round(rounded)) < tolerance:
+                return Decimal(int(round(rounded)))
+            return rounded.normalize()
+    return value
+
+
+def _format_decimal(value: Decimal) -> str:
+    """Format Decimal with normalization and thousands separators"""
+    normalized = _normalize_result(value)
+    if normalized == normalized.to_integral_value():
+        return f"{int(normalized):,}"
+    return f"{normalized:,f}"
+
+
+def _check_directive(result: Decimal | timedelta, directive: str | None) -> None:
+    """Raise ValueError unless directive is absent or a known format that applies to result"""
+    if directive is None:
+        return
+    if not _is_valid_format(directive):
+        raise ValueError(f"Unknown format: '{directive}'")
+    if isinstance(result, Decimal):
+        raise ValueError(f"'{directive}' format only applies to time values, got a plain number")
+
+
+def _format_result(
+    result: Decimal | timedelta, directive: str | None = None, default_format: str = "default"
+) -> str:
+    """Format calculation result for display"""
+    _check_directive(result, directive)
+    if isinstance(result, Decimal):
+        return _format_decimal(result)
+    else:
+        directive = directive if directive is not None else default_format
+        if directive in TIME_UNITS:
+            unit = TIME_UNITS[directive]
+            return f"{_format_decimal(to_scalar(result, unit))} {unit}"
+        return TIME_FORMATTERS[directive](result)
+
+
+def _evaluate_cached(
+    expression: str,
+    store_result: bool,
+    numeric: str = "decimal",
+    names: Mapping[str, Decimal | timedelta] | None = None,
+    cache: ExpressionCache | None = None,
+) -> Decimal | timedelta:
+    """
+    Evaluate a preprocessed expression, reusing the cached plan and result when possible
+
+    names holds the values of variables, history and file references; the result of an
+    expression using them is never stored. cache defaults to expression_cache, looked up
+    on every call so that replacing the module's cache takes effect.
+    """
+    if cache is None:
+        cache = expression_cache
+    key = canonical_key(expression)
+    entry = cache.get(key)
+    if entry is None:
+        with _timed("parse"):
+            entry = CacheEntry(compile_expression(key))
+            cache.put(key, entry)
+            # evaluate() would plan the expression on first use; doing it here counts the
+            # plan as parsing. The float backend walks the tree and has no plan.
+            if numeric == "decimal":
+                prepare(entry.compiled)
+    elif (
+        entry.result is not None
+        and numeric == "decimal"
+        and not names
+        and entry.precision == getcontext().prec
+    ):
+        return entry.result
+    with _timed("evaluate"):
+        # Only Decimal results are stored; the float backend is cheap enough to rerun
+        if numeric == "float":
+            from .float_evaluator import evaluate_float
+
+            return evaluate_float(entry.compiled, names)
+        if names:
+            return evaluate(entry.compiled, names)
+        result = evaluate(entry.compiled)
+    if store_result:
+        entry.result = result
+        entry.precision = getcontext().prec
+    return result
+
+
+def _error_message(error: Exception) -> str:
+    """Describe an evaluation error for display"""
+    if isinstance(error, (ValueError, TypeError)):
+        return str(error)
+    elif isinstance(error, ZeroDivisionError):
+        return "Division by zero"
+    elif isinstance(error, (OverflowError, Overflow)):
+        return "Number too large"
+    elif isinstance(error, SyntaxError):
+        return "Invalid syntax"
+    else:
+        return f"{type(error).__name__} - {error}"
+
+
+def _substitute_files(
+    expression: str, stdin: TextIO | None, files: bool
+) -> tuple[str, dict[str, Decimal | timedelta]]:
+    """
+    Aggregate the file references of expression, which are only read when files is set
+
+    File references open any path the process can read, so only the command line, whose
+    user already has that access, enables them; library callers and the server do not.
+    """
+    if not files:
+        raise ValueError("File references (@) are only available on the command line")
+    from .streams import substitute_references
+
+    return substitute_references(expression, stdin)
+
+
+def _evaluate_line(
+    expression: str,
+    history: History,
+    numeric: str = "decimal",
+    stdin: TextIO | None = None,
+    variables: Mapping[str, Decimal | timedelta] | None = None,
+    *,
+    files: bool = False,
+) -> tuple[Decimal | timedelta | None, str | None]:
+    """
+    Preprocess and evaluate an input line, raising on failure; files enables @ references
+
+    Returns: (result, or None when only a comment is left; output directive)
+    """
+    expression = _remove_comments(expression)
+    expression, directive = _extract_output_directive(expression)
+    if not expression:
+        return (None, directive)
+
+    names = variables
+    if "?" in expression:
+        expression, results = history.substitute(expression)
+        names = {**(names or {}), **results}
+    if "@" in expression:
+        expression, references = _substitute_files(expression, stdin, files)
+        names = {**(names or {}), **references}
+    with _timed("preprocess"):
+        expression = normalize_expression(expression)
+    return (_evaluate_cached(expression, True, numeric, names), directive)
+
+
+def _calculate(
+    expression: str,
+    history: History,
+    default_format: str = "default",
+    numeric: str = "decimal",
+    stdin: TextIO | None = None,
+    variables: Mapping[str, Decimal | timedelta] | None = None,
+    *,
+    files: bool = False,
+) -> Result:
+    """Calculate an input line like calculate(), keeping the exact result"""
+    with _timed_line(expression):
+        try:
+            result, directive = _evaluate_line(
+                expression, history, numeric, stdin, variables, files=files
+            )
+            if result is None:
+                return Result(True)
+            with _timed("format"):
+                formatted = _format_result(result, directive, default_format)
+            return Result(True, result, formatted)
+        except Exception as e:
+            return Result(False, error=_error_message(e))
+
+
+def _text_history(expression: str, last_result: str) -> History:
+    """History holding last_result, a displayed result, when expression refers to it"""
+    if "?" not in expression or last_result == "0":
+        return History()
+    with _timed("preprocess"):
+        last_result = normalize_expression(last_result)
+    return History([_evaluate_cached(last_result, True)])
+
+
+def calculate(
+    expression: str,
+    last_result: str,
+    default_format: str = "default",
+    numeric: str = "decimal",
+    stdin: TextIO | None = None,
+    variables: Mapping[str, Decimal | timedelta] | None = None,
+    *,
+    files: bool = False,
+) -> tuple[bool, str, str]:
+    """
+    Calculate mathematical expression with preprocessing
+
+    last_result is the previous result as displayed, which ? refers to. numeric selects
+    the backend: "decimal" (exact) or "float" (binary floating point, faster, results may
+    differ in the last digits). variables holds values the expression may refer to by
+    name. File references such as sum(@values.txt) read files and are rejected unless
+    files is set; stdin is the stream a reference to "-", as in sum(@-), reads.
+
+    Returns: (success: bool, value: str, error: str)
+    """
+    try:
+        history = _text_history(expression, last_result)
+    except Exception as e:
+        return (False, last_result, _error_message(e))
+    result = _calculate(expression, history, default_format, numeric, stdin, variables, files=files)
+    if not result.ok:
+        return (False, last_result, result.error)
+    return (True, result.formatted if result.value is not None else last_result, "")
+
+
+def _evaluate_and_print(
+    expression: str,
+    history: History,
+    default_format: str = "default",
+    numeric: str = "decimal",
+    write: Callable[[str], object] = print,
+    stdin: TextIO | None = None,
+    variables: Mapping[str, Decimal | timedelta] | None = None,
+    *,
+    files: bool = False,
+) -> bool:
+    """Evaluate expression, print the result or error, and add the result to history"""
+    result = _calculate(expression, history, default_format, numeric, stdin, variables, files=files)
+    if not result.ok:
+        write(f"Error: {result.error}")
+    elif result.value is not None:
+        write(f"= {result.formatted}")
+        history.append(result.value)
+    return result.ok
+
+
+def _assignment(expression: str) -> "re.Match[str] | None":
+    """Match an input line that defines a variable, capturing its name and expression"""
+    if "=" not in expression:
+        return None
+    return ASSIGNMENT_PATTERN.fullmatch(_remove_comments(expression))
+
+
+def _new_variables(numeric: str) -> "Variables":
+    """Variables for a session, loading calc.variables once a mode needs it"""
+    from .variables import Variables
+
+    return Variables(numeric)
+
+
+def _define_variable(
+    name: str, expression: str, history: History, variables: "Variables", files: bool = False
+) -> tuple[Decimal | timedelta, str | None, list[str]]:
+    """
+    Preprocess the expression of an assignment and define the variable, raising on failure
+
+    Returns: (value, output directive, variables recomputed with it)
+    """
+    expression, directive = _extract_output_directive(expression)
+    # The results a definition refers to are fixed when it is made
+    expression, references = history.substitute(expression)
+    if "@" in expression:
+        expression, aggregates = _substitute_files(expression, None, files)
+        references.update(aggregates)
+    with _timed("preprocess"):
+        expression = normalize_expression(expression)
+    result, recomputed = variables.define(name, expression, references)
+    return (result, directive, recomputed)
+
+
+def _define_and_print(
+    name: str,
+    expression: str,
+    history: History,
+    default_format: str,
+    variables: "Variables",
+    write: Callable[[str], object] = print,
+    files: bool = False,
+) -> bool:
+    """Define a variable, print its value and every variable recomputed with it"""
+    try:
+        result, directive, recomputed = _define_variable(
+            name, expression, history, variables, files
+        )
+        with _timed("format"):
+            value = _format_result(result, directive, default_format)
+    except Exception as e:
+        write(f"Error: {_error_message(e)}")
+        return False
+
+    write(f"= {value}")
+    history.append(result)
+    success = True
+    for dependent in recomputed:
+        if dependent in variables.errors:
+            write(f"Error: {dependent}: {_error_message(variables.errors[dependent])}")
+            success = False
+        else:
+            with _timed("format"):
+                value = _format_result(variables.values[dependent], None, default_format)
+            write(f"{dependent} = {value}")
+    return success
+
+
+def _process_command(
+    expression: str,
+    history: History,
+    current_format: str,
+    numeric: str = "decimal",
+    write: Callable[[str], object] = print,
+    variables: "Variables | None" = None,
+    *,
+    files: bool = False,
+) -> tuple[bool, str, bool]:
+    """
+    Process a single command expression, printing its output line by line with write
+
+    Results are added to history. variables holds the session's variables; without it,
+    assignments are not accepted. files enables file references, which only the command
+    line passes.
+
+    Returns: (should_continue: bool, current_format: str, success: bool)
+    """
+    if not expression:
+        return (True, current_format, True)
+    elif expression == "exit":
+        return (False, current_format, True)
+    elif expression == "help":
+        from .help_text import get_help
+
+        write(get_help())
+        return (True, current_format, True)
+    elif expression == "format":
+        write(current_format)
+        return (True, current_format, True)
+    elif expression.startswith("format "):
+        name = expression.removeprefix("format ").strip()
+        if _is_valid_format(name):
+            return (True, name, True)
+        write(f"Error: Unknown format: '{name}'")
+        return (True, current_format, False)
+    assignment = _assignment(expression)
+    if variables is not None and assignment is not None:
+        success = _define_and_print(
+            assignment[1], assignment[2], history, current_format, variables, write, files
+        )
+    else:
+        success = _evaluate_and_print(
+            expression,
+            history,
+            current_format,
+            numeric,
+            write,
+            variables=variables.referenced(expression) if variables is not None else None,
+            files=files,
+        )
+    return (True, current_format, success)
+
+
+def _set_precision(digits: int) -> None:
+    """Round Decimal results to digits significant digits in this process and new threads"""
+    DefaultContext.prec = digits
+    getcontext().prec = digits
+
+
+def _init_worker(precision: int, limits: Limits) -> None:
+    """Evaluate like the parent process in a worker process"""
+    _set_precision(precision)
+    set_limits(limits)
@@ -0,0 +1,286 @@
+import functools
+import math
+from collections.abc import Callable
+from decimal import Decimal, Overflow, getcontext, localcontext
+from typing import Final, ParamSpec
+
+_P = ParamSpec("_P")
+
+# Every function rounds to the precision of the current decimal context. Intermediate
+# steps carry this many extra digits, so their rounding errors vanish in the result.
+GUARD_DIGITS: Final = 10
+# Constants, tables and series coefficients are computed once per precision
+_CACHED_PRECISIONS: Final = 32
+# exp and log look up exp(j/16) for |j| <= _TABLE_STEPS, which covers [-ln(10)/2, ln(10)/2],
+# so the series around it only has to converge for |x| <= 1/32
+_TABLE_STEPS: Final = 19
+_SIXTEENTHS: Final = tuple(Decimal(j) / 16 for j in range(-_TABLE_STEPS, _TABLE_STEPS + 1))
+# Beyond this many integer digits, exp overflows or underflows Decimal's exponent range
+_MAX_EXP_DIGITS: Final = 8
+# sin, cos and tan reduce their argument by a multiple of pi/2, which takes one more digit
+# of pi per integer digit of the argument; larger arguments are rejected
+_MAX_REDUCTION_DIGITS: Final = 1_000
+# Up to this many integer digits, a float quotient picks a close enough multiple of pi/2
+_FLOAT_REDUCTION_DIGITS: Final = 14
+_HALF_PI: Final = math.pi / 2
+_LN_10: Final = math.log(10)
+_SQRT_10: Final = math.sqrt(10)
+
+
+def _arctan_inverse(n: int, unity: int) -> int:
+    """arctan(1/n) in fixed point, scaled by unity"""
+    total = term = unity // n
+    square = n * n
+    divisor = 1
+    while term:
+        term //= square
+        divisor += 2
+        total -= term // divisor
+        term //= square
+        divisor += 2
+        total += term // divisor
+    return total
+
+
+@functools.lru_cache(maxsize=_CACHED_PRECISIONS)
+def _pi(digits: int) -> Decimal:
+    """pi to digits significant digits, from Machin's formula in integer arithmetic"""
+    scale = digits + GUARD_DIGITS
+    unity = 10**scale
+    fixed = 4 * (4 * _arctan_inverse(5, unity) - _arctan_inverse(239, unity))
+    with localcontext() as context:
+        context.prec = digits
+        return Decimal(fixed).scaleb(-scale)
+
+
+@functools.lru_cache(maxsize=_CACHED_PRECISIONS)
+def _half_pi(digits: int) -> Decimal:
+    with localcontext() as context:
+        context.prec = digits
+        return _pi(digits) / 2
+
+
+@functools.lru_cache(maxsize=_CACHED_PRECISIONS)
+def _ln10(digits: int) -> Decimal:
+    with localcontext() as context:
+        context.prec = digits
+        return Decimal(10).ln()
+
+
+@functools.lru_cache(maxsize=_CACHED_PRECISIONS)
+def _exp_table(digits: int) -> tuple[Decimal, ...]:
+    """exp(j/16) for j from -_TABLE_STEPS to _TABLE_STEPS, as powers of exp(1/16)"""
+    with localcontext() as context:
+        context.prec = digits
+        step = _SIXTEENTHS[_TABLE_STEPS + 1].exp()
+        powers = [Decimal(1)]
+        for _ in range(_TABLE_STEPS):
+            powers.append(powers[-1] * step)
+        return (*(1 / power for power in reversed(powers[1:])), *powers)
+
+
+@functools.lru_cache(maxsize=_CACHED_PRECISIONS)
+def _reciprocal_factorials(digits: int, bound: int) -> tuple[Decimal, ...]:
+    """1/n! for n = 0, 1, ... as long as x**n/n! still matters for |x| <= 1/bound"""
+    with localcontext() as context:
+        context.prec = digits
+        threshold = Decimal(1).scaleb(-digits)
+        reciprocals = [Decimal(1)]
+        term = Decimal(1)
+        while term >= threshold:
+            n = len(reciprocals)
+            reciprocals.append(reciprocals[-1] / n)
+            term /= n * bound
+    return tuple(reciprocals)
+
+
+@functools.lru_cache(maxsize=_CACHED_PRECISIONS)
+def _trig_coefficients(digits: int) -> tuple[tuple[Decimal, ...], tuple[Decimal, ...]]:
+    """
+    Taylor coefficients of sin(x)/x and cos(x) in powers of -x**2, for |x| <= 1
+
+    Returns: (1/1!, 1/3!, 1/5!, ...), (1/0!, 1/2!, 1/4!, ...)
+    """
+    reciprocals = _reciprocal_factorials(digits, 1)
+    return (reciprocals[1::2], reciprocals[0::2])
+
+
+@functools.lru_cache(maxsize=_CACHED_PRECISIONS)
+def _atanh_coefficients(digits: int) -> tuple[Decimal, ...]:
+    """Taylor coefficients of atanh(x)/x in powers of x**2, for |x| <= 1/64"""
+    with localcontext() as context:
+        context.prec = digits
+        threshold = Decimal(1).scaleb(-digits)
+        coefficients = [Decimal(1)]
+        term = Decimal(1)
+        while term >= threshold:
+            coefficients.append(1 / Decimal(2 * len(coefficients) + 1))
+            term /= 64 * 64
+    return tuple(coefficients)
+
+
+def _polynomial(x: Decimal, coefficients: tuple[Decimal, ...]) -> Decimal:
+    """c0 + c1 * x + c2 * x**2 + ..., by Horner's method"""
+    total = Decimal(0)
+    for coefficient in reversed(coefficients):
+        total = coefficient + x * total
+    return total
+
+
+def _with_guard_digits(function: Callable[_P, Decimal]) -> Callable[_P, Decimal]:
+    """Run function with GUARD_DIGITS more precision, rounding its result to the context"""
+
+    @functools.wraps(function)
+    def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> Decimal:
+        context = getcontext()
+        digits = context.prec
+        context.prec = digits + GUARD_DIGITS
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            context.prec = digits
+        return +result
+
+    return wrapper
+
+
+def _exp(x: Decimal) -> Decimal:
+    """exp(x) in the current context, as 10**k * exp(j/16) * exp(s) with |s| <= 1/32"""
+    magnitude = x.adjusted()
+    if magnitude >= _MAX_EXP_DIGITS:
+        if x > 0:
+            raise OverflowError("math range error")
+        return Decimal(0)
+    context = getcontext()
+    digits = context.prec
+    power = round(float(x) / _LN_10)
+    if power:
+        # k * ln(10) has the integer digits of x on top of the digits the result needs
+        context.prec = digits + max(magnitude, 0)
+        x -= power * _ln10(context.prec)
+        context.prec = digits
+    step = round(float(x) * 16)
+    series = _polynomial(x - _SIXTEENTHS[step + _TABLE_STEPS], _reciprocal_factorials(digits, 32))
+    return (_exp_table(digits)[step + _TABLE_STEPS] * series).scaleb(power)
+
+
+def _ln(x: Decimal) -> Decimal:
+    """
+    ln(x) of a positive x in the current context
+
+    x is m * 10**k with sqrt(1/10) <= m < sqrt(10), m is exp(j/16) * u with u close to 1,
+    and ln(u) is 2 * atanh((u - 1) / (u + 1)).
+    """
+    power = x.adjusted()
+    mantissa = x.scaleb(-power)
+    if float(mantissa) >= _SQRT_10:
+        power += 1
+        mantissa = mantissa.scaleb(-1)
+    digits = getcontext().prec
+    step = round(math.log(float(mantissa)) * 16)
+    ratio = mantissa / _exp_table(digits)[step + _TABLE_STEPS]
+    z = (ratio - 1) / (ratio + 1)
+    result = 2 * z * _polynomial(z * z, _atanh_coefficients(digits))
+    result += _SIXTEENTHS[step + _TABLE_STEPS]
+    if power:
+        result += power * _ln10(digits)
+    return result
+
+
+def _reduce(x: Decimal) -> tuple[Decimal, int]:
+    """
+    Write x as r + k * pi/2 with |r| <= 1, in the current context
+
+    Returns: (r, k modulo 4)
+    """
+    magnitude = x.adjusted()
+    if magnitude < 0:
+        return (x, 0)
+    if magnitude > _MAX_REDUCTION_DIGITS:
+        raise OverflowError("math range error")
+    context = getcontext()
+    digits = context.prec
+    quotient = None
+    if magnitude <= _FLOAT_REDUCTION_DIGITS:
+        quotient = round(float(x) / _HALF_PI)
+    # Subtracting k * pi/2 cancels the integer digits of x, and the leading fraction digits
+    # too when x is close to a multiple of pi/2, so pi needs that many more digits
+    cancelled = 0
+    while True:
+        context.prec = digits + magnitude + cancelled
+        half_pi = _half_pi(context.prec)
+        if quotient is None:
+            quotient = int((x / half_pi).to_integral_value())
+        remainder = x - quotient * half_pi
+        if -remainder.adjusted() <= cancelled or cancelled > _MAX_REDUCTION_DIGITS:
+            break
+        cancelled = -remainder.adjusted()
+    context.prec = digits
+    return (+remainder, quotient % 4)
+
+
+def _sin_cos(x: Decimal, sine: bool, cosine: bool) -> tuple[Decimal, Decimal]:
+    """sin(x) and cos(x), each only when asked for, in the current context"""
+    remainder, quadrant = _reduce(x)
+    # sin(r + k * pi/2) cycles through sin(r), cos(r), -sin(r) and -cos(r) as k grows
+    if quadrant % 2:
+        sine, cosine = cosine, sine
+    square = -remainder * remainder
+    sine_coefficients, cosine_coefficients = _trig_coefficients(getcontext().prec)
+    sin_r = remainder * _polynomial(square, sine_coefficients) if sine else Decimal(0)
+    if cosine and sine:
+        # cos(r) > 0.5 for |r| <= 1, so the square root loses no digits
+        cos_r = (1 - sin_r * sin_r).sqrt()
+    else:
+        cos_r = _polynomial(square, cosine_coefficients) if cosine else Decimal(0)
+    if quadrant >= 2:
+        sin_r, cos_r = -sin_r, -cos_r
+    return (cos_r, -sin_r) if quadrant % 2 else (sin_r, cos_r)
+
+
+def pi() -> Decimal:
+    return _pi(getcontext().prec)
+
+
+def e() -> Decimal:
+    return exp(Decimal(1))
+
+
+def sqrt(x: Decimal) -> Decimal:
+    if x < 0:
+        raise ValueError("math domain error")
+    return x.sqrt()
+
+
+@_with_guard_digits
+def exp(x: Decimal) -> Decimal:
+    try:
+        return _exp(x)
+    except Overflow:
+        raise OverflowError("math range error") from None
+
+
+@_with_guard_digits
+def log(x: Decimal, base: Decimal | None = None) -> Decimal:
+    """Natural logarithm of x, or its logarithm to base"""
+    if x <= 0 or (base is not None and base <= 0):
+        raise ValueError("math domain error")
+    if base is None:
+        return _ln(x)
+    return _ln(x) / _ln(base)
+
+
+@_with_guard_digits
+def sin(x: Decimal) -> Decimal:
+    return _sin_cos(x, True, False)[0]
+
+
+@_with_guard_digits
+def cos(x: Decimal) -> Decimal:
+    return _sin_cos(x, False, True)[1]
+
+
+@_with_guard_digits
+def tan(x: Decimal) -> Decimal:
+    sine, cosine = _sin_cos(x, True, True)
+    return sine / cosine
@@ -0,0 +1,209 @@
+import contextlib
+import functools
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from decimal import getcontext
+from typing import Final, TextIO
+
+from .cache import canonical_key
+from .core import (
+    DEFAULT_CACHE_MEGABYTES,
+    Result,
+    _calculate,
+    _extract_output_directive,
+    _remove_comments,
+)
+from .history import History
+from .lexer import normalize_expression
+from .limits import get_limits
+
+DATABASE_NAME: Final = "results.sqlite3"
+# Seconds a process waits for another one holding the database lock
+_BUSY_TIMEOUT: Final = 5.0
+# Part of the entries, least recently used first, dropped when the database is too large
+_EVICTED_SHARE: Final = 4
+
+_SCHEMA: Final = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    formatted TEXT NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+@functools.cache
+def fingerprint() -> str:
+    """
+    Identify the semantics of this calc: the Python version and the modules it is made of
+
+    Modules are identified by name, size and modification time rather than by content, so
+    that a cache hit costs a directory listing instead of reading the whole package. Any
+    change to calc, including an upgrade, which rewrites the modules, gives a new
+    fingerprint, so results calculated by an earlier version are never returned.
+    """
+    # A CRC rather than a cryptographic hash: it only has to change with calc, and hashlib
+    # alone would take longer to import than a cache hit takes
+    checksum = zlib.crc32(repr(sys.version_info[:3]).encode())
+    with os.scandir(os.path.dirname(__file__)) as entries:
+        modules = sorted((e.name, e.stat()) for e in entries if e.name.endswith(".py"))
+    for name, status in modules:
+        checksum = zlib.crc32(
+            f"{name}\0{status.st_size}\0{status.st_mtime_ns}\0".encode(), checksum
+        )
+    return f"{checksum:08x}"
+
+
+def result_key(
+    expression: str, default_format: str = "default", numeric: str = "decimal"
+) -> str | None:
+    """
+    Key of the result of an input line, or None if it cannot be cached
+
+    The key covers the canonical expression, its output directive, the default format,
+    the numeric backend, the precision and the limits. Lines using ? or file references
+    depend on more than their text and have no key.
+    """
+    expression, directive = _extract_output_directive(_remove_comments(expression))
+    if not expression or "?" in expression or "@" in expression:
+        return None
+    try:
+        expression = canonical_key(normalize_expression(expression))
+    except Exception:
+        return None
+    context = (directive or "", default_format, numeric, getcontext().prec, get_limits())
+    return "\0".join([expression, *map(str, context)])
+
+
+class ResultCache:
+    """
+    Formatted results kept in SQLite under a directory, shared by concurrent processes
+
+    The database is in WAL mode, so readers do not block the writer, and a process waits
+    up to _BUSY_TIMEOUT seconds for a lock. Once the database holds more than max_bytes,
+    the least recently used entries are dropped. Entries stored by another calc
+    fingerprint are never returned, and are removed when a new fingerprint first opens
+    the database.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_MEGABYTES << 20) -> None:
+        """Open or create the database; raise sqlite3.Error or OSError when it cannot be"""
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._fingerprint = fingerprint()
+        self._connection = sqlite3.connect(
+            os.path.join(directory, DATABASE_NAME), timeout=_BUSY_TIMEOUT, isolation_level=None
+        )
+        try:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+            self._invalidate()
+        except BaseException:
+            self._connection.close()
+            raise
+
+    def _invalidate(self) -> None:
+        """Remove the entries of other fingerprints once the fingerprint changes"""
+        row = self._connection.execute(
+            "SELECT value FROM settings WHERE name = 'fingerprint'"
+        ).fetchone()
+        if row is not None and row[0] == self._fingerprint:
+            return
+        with self._transaction():
+            self._connection.execute(
+                "DELETE FROM results WHERE fingerprint != ?", (self._fingerprint,)
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO settings VALUES ('fingerprint', ?)", (self._fingerprint,)
+            )
+
+    def _transaction(self) -> sqlite3.Connection:
+        # In autocommit mode, the connection as a context manager only commits or rolls
+        # back; BEGIN IMMEDIATE takes the write lock up front so the transaction cannot
+        # fail to upgrade a read lock halfway through
+        self._connection.execute("BEGIN IMMEDIATE")
+        return self._connection
+
+    def get(self, key: str) -> str | None:
+        """Return the formatted result stored under key and mark it used, or None"""
+        row = self._connection.execute(
+            "SELECT formatted FROM results WHERE key = ? AND fingerprint = ?",
+            (key, self._fingerprint),
+        ).fetchone()
+        if row is None:
+            return None
+        self._connection.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        formatted: str = row[0]
+        return formatted
+
+    def put(self, key: str, formatted: str) -> None:
+        """Store a formatted result under key, then evict entries over the size limit"""
+        with self._transaction():
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, self._fingerprint, formatted, time.time()),
+            )
+            if self.size() > self.max_bytes:
+                self._connection.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used "
+                    "LIMIT (SELECT COUNT(*) / ? + 1 FROM results))",
+                    (_EVICTED_SHARE,),
+                )
+
+    def size(self) -> int:
+        """Bytes of the database in use; pages freed by eviction are reused, not counted"""
+        pages = self._connection.execute("PRAGMA page_count").fetchone()[0]
+        free = self._connection.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = self._connection.execute("PRAGMA page_size").fetchone()[0]
+        return int((pages - free) * page_size)
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def calculate_cached(
+    expression: str,
+    directory: str,
+    max_bytes: int = DEFAULT_CACHE_MEGABYTES << 20,
+    numeric: str = "decimal",
+    stdin: TextIO | None = None,
+    files: bool = False,
+) -> Result:
+    """
+    Calculate an expression given on the command line, reusing a result cached under directory
+
+    A result read from the cache has only its formatted value. The cache never changes
+    the outcome: a failed line is not stored, and a cache that cannot be opened is
+    reported on stderr and skipped. files enables file references as for calculate();
+    lines using them are never cached.
+    """
+    key = result_key(expression, numeric=numeric)
+    if key is None:
+        return _calculate(expression, History(), numeric=numeric, stdin=stdin, files=files)
+    try:
+        cache = ResultCache(directory, max_bytes)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: result cache disabled: {e}", file=sys.stderr)
+        return _calculate(expression, History(), numeric=numeric, stdin=stdin, files=files)
+    try:
+        try:
+            formatted = cache.get(key)
+        except sqlite3.Error:
+            # Still locked by other processes after the timeout: calculate instead
+            formatted = None
+        if formatted is not None:
+            return Result(True, formatted=formatted)
+        result = _calculate(expression, History(), numeric=numeric, stdin=stdin, files=files)
+        if result.value is not None:
+            with contextlib.suppress(sqlite3.Error):
+                cache.put(key, result.formatted)
+        return result
+    finally:
+        cache.close()
@@ -0,0 +1,114 @@
+from datetime import timedelta
+from decimal import Decimal
+from typing import Final
+
+MICROSECONDS_PER_SECOND: Final = 1_000_000
+
+# Microseconds per unit of the timedelta() arguments, in positional order
+TIMEDELTA_UNITS: Final[dict[str, int]] = {
+    "days": 86_400 * MICROSECONDS_PER_SECOND,
+    "seconds": MICROSECONDS_PER_SECOND,
+    "microseconds": 1,
+    "milliseconds": 1_000,
+    "minutes": 60 * MICROSECONDS_PER_SECOND,
+    "hours": 3_600 * MICROSECONDS_PER_SECOND,
+    "weeks": 7 * 86_400 * MICROSECONDS_PER_SECOND,
+}
+
+
+def round_ratio(numerator: int, denominator: int) -> int:
+    """Divide integers, rounding ties to even like timedelta does"""
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    quotient, remainder = divmod(numerator, denominator)
+    twice = 2 * remainder
+    if twice > denominator or (twice == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+class Duration:
+    """
+    Exact duration as an integer count of microseconds
+
+    The evaluator's internal time value: arithmetic, rounding and aggregates stay in
+    integers, and a timedelta is only built for the final result. Results that fall
+    between microseconds round ties to even, like timedelta (and round() of a Decimal).
+    """
+
+    __slots__ = ("microseconds",)
+
+    def __init__(self, microseconds: int) -> None:
+        self.microseconds = microseconds
+
+    @classmethod
+    def from_timedelta(cls, td: timedelta) -> "Duration":
+        return cls((td.days * 86_400 + td.seconds) * MICROSECONDS_PER_SECOND + td.microseconds)
+
+    @classmethod
+    def from_seconds(cls, seconds: Decimal) -> "Duration":
+        """Build a duration from seconds, rounding to the nearest microsecond"""
+        return cls(round(seconds.scaleb(6)))
+
+    def to_timedelta(self) -> timedelta:
+        """Convert to timedelta, raising OverflowError beyond its range"""
+        return timedelta(microseconds=self.microseconds)
+
+    def seconds(self) -> Decimal:
+        return Decimal(self.microseconds).scaleb(-6)
+
+    def scale(self, factor: Decimal) -> "Duration":
+        """Multiply by a number, rounding to the nearest microsecond"""
+        return Duration(round(self.microseconds * factor))
+
+    def divide(self, divisor: Decimal) -> "Duration":
+        """Divide by a number, rounding to the nearest microsecond"""
+        if not divisor:
+            raise ZeroDivisionError("division by zero")
+        return Duration(round(self.microseconds / divisor))
+
+    def __add__(self, other: "Duration") -> "Duration":
+        return Duration(self.microseconds + other.microseconds)
+
+    def __sub__(self, other: "Duration") -> "Duration":
+        return Duration(self.microseconds - other.microseconds)
+
+    def __mod__(self, other: "Duration") -> "Duration":
+        return Duration(self.microseconds % other.microseconds)
+
+    def __truediv__(self, other: "Duration") -> Decimal:
+        if other.microseconds == 0:
+            raise ZeroDivisionError("division by zero")
+        return Decimal(self.microseconds) / Decimal(other.microseconds)
+
+    def __neg__(self) -> "Duration":
+        return Duration(-self.microseconds)
+
+    def __pos__(self) -> "Duration":
+        return self
+
+    def __abs__(self) -> "Duration":
+        return Duration(abs(self.microseconds))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Duration):
+            return NotImplemented
+        return self.microseconds == other.microseconds
+
+    def __hash__(self) -> int:
+        return hash(self.microseconds)
+
+    def __lt__(self, other: "Duration") -> bool:
+        return self.microseconds < other.microseconds
+
+    def __le__(self, other: "Duration") -> bool:
+        return self.microseconds <= other.microseconds
+
+    def __gt__(self, other: "Duration") -> bool:
+        return self.microseconds > other.microseconds
+
+    def __ge__(self, other: "Duration") -> bool:
+        return self.microseconds >= other.microseconds
+
+    def __repr__(self) -> str:
+        return f"Duration({self.microseconds})"
@@ -1,11 +1,18 @@
 import ast
+import functools
 import math
 import operator as op
-from collections.abc import Callable
+import re
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass, field
 from datetime import timedelta
-from decimal import ROUND_HALF_EVEN, ROUND_HALF_UP, Decimal
+from decimal import ROUND_HALF_EVEN, ROUND_HALF_UP, Decimal, getcontext
 from typing import Any, Final, cast
 
+from . import decimal_math
+from .duration import TIMEDELTA_UNITS, Duration, round_ratio
+from .limits import PostfixCheck, check_expression, check_result, literal_source
+
 _ALLOWED_BINARY_OPERATORS: Final[dict[type, Callable[[Any, Any], Any]]] = {
     ast.Add: op.add,
     ast.Sub: op.sub,
@@ -16,88 +23,121 @@ _ALLOWED_BINARY_OPERATORS: Final[dict[type, Callable[[Any, Any], Any]]] = {
 }
 
 
-def _validate_uniform_types(args: tuple[Decimal | timedelta, ...], function_name: str) -> type:
-    """Validate that all arguments are of the same type"""
-    if not args:
-        raise TypeError(f"{function_name} expected at least 1 argument, got 0")
-
-    expected_type = type(args[0])
+# Values inside the evaluator: durations stay exact integer microseconds until the result
+# is returned as a timedelta
+_Value = Decimal | Duration
 
-    for arg in args:
-        if not isinstance(arg, expected_type):
-            raise TypeError(f"Cannot mix timedelta and Decimal in {function_name}")
 
-    return expected_type
+def _type_name(value: _Value) -> str:
+    """Name the type of value as the user sees it"""
+    return "timedelta" if isinstance(value, Duration) else "Decimal"
 
 
-def _ensure_decimal(value: Decimal | timedelta) -> Decimal:
-    """Ensure value is Decimal, raising TypeError for timedelta"""
+def _ensure_decimal(value: _Value) -> Decimal:
+    """Ensure value is Decimal, raising TypeError for a duration"""
     if isinstance(value, Decimal):
         return value
     else:
-        raise TypeError(f"Math functions only accept Decimal values, got {type(value).__name__}")
-
-
-def _to_float_args(
-    args: list[Decimal | timedelta], kwargs: dict[str, Decimal | timedelta]
-) -> tuple[list[float], dict[str, float]]:
-    """Convert args and kwargs to floats, rejecting timedelta"""
-    float_args = [float(_ensure_decimal(arg)) for arg in args]
-    float_kwargs = {k: float(_ensure_decimal(v)) for k, v in kwargs.items()}
-    return float_args, float_kwargs
-
-
-def _apply_to_timedelta_seconds(td: timedelta, func: Callable[..., Any], *args: Any) -> timedelta:
-    """Apply function to timedelta by converting to seconds and back"""
-    seconds = Decimal(str(td.total_seconds()))
-    result_seconds = func(seconds, *args)
-    return timedelta(seconds=float(result_seconds))
-
+        raise TypeError(f"Math functions only accept Decimal values, got {_type_name(value)}")
+
+
+def _apply_to_duration_seconds(
+    duration: Duration, func: Callable[..., Any], *args: Any
+) -> Duration:
+    """Apply function to a duration in seconds, rounding back to whole microseconds"""
+    return Duration.from_seconds(Decimal(func(duration.seconds(), *args)))
+
+
+def _mixed_types(function_name: str) -> TypeError:
+    return TypeError(f"Cannot mix timedelta and Decimal in {function_name}")
+
+
+def _total(values: Iterable[_Value], function_name: str) -> tuple[_Value | None, int]:
+    """
+    Add up values as they stream in, checking that they all have the type of the first
+
+    Returns: (total, or None when there are no values; number of values)
+    """
+    iterator = iter(values)
+    first = next(iterator, None)
+    count = 1
+    if first is None:
+        return (None, 0)
+    elif isinstance(first, Duration):
+        microseconds = first.microseconds
+        for value in iterator:
+            if not isinstance(value, Duration):
+                raise _mixed_types(function_name)
+            microseconds += value.microseconds
+            count += 1
+        return (Duration(microseconds), count)
+    total = _ZERO + first
+    for value in iterator:
+        if not isinstance(value, Decimal):
+            raise _mixed_types(function_name)
+        total += value
+        count += 1
+    return (total, count)
+
+
+def _average(values: Iterable[_Value]) -> _Value:
+    """Calculate average of Decimal or duration values"""
+    total, count = _total(values, "avg")
+    if total is None:
+        raise TypeError("avg expected at least 1 argument, got 0")
+    elif isinstance(total, Duration):
+        return Duration(round_ratio(total.microseconds, count))
+    else:
+        return total / Decimal(count)
 
-def _avg_wrapper(*args: Decimal | timedelta) -> Decimal | timedelta:
-    """Calculate average of Decimal or timedelta values"""
-    arg_type = _validate_uniform_types(args, "avg")
 
-    if arg_type is timedelta:
-        total_time = cast(timedelta, sum(args, timedelta()))
-        avg_seconds = total_time.total_seconds() / len(args)
-        return timedelta(seconds=avg_seconds)
-    else:
-        total = cast(Decimal, sum(args, Decimal("0")))
-        return total / Decimal(len(args))
+def _extremum(better: Callable[[Any, Any], bool], name: str, values: Iterable[_Value]) -> _Value:
+    """Shared implementation for max/min, keeping the first of equal values"""
+    iterator = iter(values)
+    best = next(iterator, None)
+    if best is None:
+        raise TypeError(f"{name} expected at least 1 argument, got 0")
+    best_type = type(best)
+    for value in iterator:
+        if not isinstance(value, best_type):
+            raise _mixed_types(name)
+        if better(value, best):
+            best = value
+    return best
 
 
-def _extremum(
-    func: Callable[..., Any], name: str, args: tuple[Decimal | timedelta, ...]
-) -> Decimal | timedelta:
-    """Shared implementation for max/min"""
-    if len(args) == 1:
-        return args[0]
-    _validate_uniform_types(args, name)
-    return cast(Decimal | timedelta, func(*args))
+def _maximum(values: Iterable[_Value]) -> _Value:
+    """Return maximum of Decimal or duration values"""
+    return _extremum(op.gt, "max", values)
 
 
-def _max_wrapper(*args: Decimal | timedelta) -> Decimal | timedelta:
-    """Return maximum of Decimal or timedelta values"""
-    return _extremum(max, "max", args)
+def _minimum(values: Iterable[_Value]) -> _Value:
+    """Return minimum of Decimal or duration values"""
+    return _extremum(op.lt, "min", values)
 
 
-def _min_wrapper(*args: Decimal | timedelta) -> Decimal | timedelta:
-    """Return minimum of Decimal or timedelta values"""
-    return _extremum(min, "min", args)
+def _sum(values: Iterable[_Value]) -> _Value:
+    """Calculate sum of Decimal or duration values"""
+    total, _ = _total(values, "sum")
+    return _ZERO if total is None else total
 
 
-def _sum_wrapper(*args: Decimal | timedelta) -> Decimal | timedelta:
-    """Calculate sum of Decimal or timedelta values"""
-    if not args:
-        return Decimal("0")
+# Aggregates that take their values one at a time, so a stream is never held in memory
+_STREAMING_AGGREGATES: Final[dict[str, Callable[[Iterable[_Value]], _Value]]] = {
+    "avg": _average,
+    "max": _maximum,
+    "min": _minimum,
+    "sum": _sum,
+}
 
-    arg_type = _validate_uniform_types(args, "sum")
 
-    if arg_type is timedelta:
-        return sum(args, timedelta())
-    else:
-        return sum(args, Decimal("0"))
+def aggregate(function_name: str, values: Iterable[Decimal | timedelta]) -> Decimal | timedelta:
+    """Apply sum, avg, max or min to values as they stream in, in constant memory"""
+    result = _STREAMING_AGGREGATES[function_name](
+        Duration.from_timedelta(value) if isinstance(value, timedelta) else value
+        for value in values
+    )
+    return result.to_timedelta() if isinstance(result, Duration) else result
 
 
 def _round_decimal(value: Decimal, precision: int, rounding: str) -> Decimal:
@@ -117,13 +157,13 @@ def _round_half_even(value: Decimal, precision: int = 0) -> Decimal:
     return _round_decimal(value, precision, ROUND_HALF_EVEN)
 
 
-_MATH_FUNCTIONS: Final[dict[str, Callable[..., Any]]] = {
-    "cos": math.cos,
-    "exp": math.exp,
-    "log": math.log,
-    "sin": math.sin,
-    "sqrt": math.sqrt,
-    "tan": math.tan,
+_MATH_FUNCTIONS: Final[dict[str, Callable[..., Decimal]]] = {
+    "cos": decimal_math.cos,
+    "exp": decimal_math.exp,
+    "log": decimal_math.log,
+    "sin": decimal_math.sin,
+    "sqrt": decimal_math.sqrt,
+    "tan": decimal_math.tan,
 }
 
 _ROUNDING_FUNCTIONS: Final[dict[str, Callable[..., Any]]] = {
@@ -135,10 +175,7 @@ _ROUNDING_FUNCTIONS: Final[dict[str, Callable[..., Any]]] = {
 
 _AGGREGATE_FUNCTIONS: Final[dict[str, Callable[..., Any]]] = {
     "abs": abs,
-    "avg": _avg_wrapper,
-    "max": _max_wrapper,
-    "min": _min_wrapper,
-    "sum": _sum_wrapper,
+    **_STREAMING_AGGREGATES,
 }
 
 _ALLOWED_FUNCTIONS: Final[dict[str, Callable[..., Any]]] = {
@@ -148,9 +185,15 @@ _ALLOWED_FUNCTIONS: Final[dict[str, Callable[..., Any]]] = {
     "timedelta": timedelta,
 }
 
-_ALLOWED_CONSTANTS: Final[dict[str, Decimal]] = {
-    "e": Decimal(str(math.e)),
-    "pi": Decimal(str(math.pi)),
+_TIMEDELTA_UNITS: Final[dict[str, Decimal]] = {
+    name: Decimal(microseconds) for name, microseconds in TIMEDELTA_UNITS.items()
+}
+_ZERO: Final = Decimal(0)
+
+# Constants are computed to the precision of the decimal context
+_ALLOWED_CONSTANTS: Final[dict[str, Callable[[], Decimal]]] = {
+    "e": decimal_math.e,
+    "pi": decimal_math.pi,
 }
 
 RESERVED_WORDS: Final[frozenset[str]] = frozenset(
@@ -158,66 +201,58 @@ RESERVED_WORDS: Final[frozenset[str]] = frozenset(
 )
 
 
-def _can_mix_types(
-    left: Decimal | timedelta, right: Decimal | timedelta, operator_type: type
-) -> bool:
+def _can_mix_types(left_type: type, right_type: type, operator_type: type) -> bool:
     """Check if type mixing is allowed for the given operation"""
-    if isinstance(left, timedelta) and isinstance(right, Decimal):
+    if left_type is Duration and right_type is Decimal:
         return operator_type in [ast.Mult, ast.Div]
-    elif isinstance(left, Decimal) and isinstance(right, timedelta):
+    elif left_type is Decimal and right_type is Duration:
         return operator_type == ast.Mult
+    elif left_type is Duration:
+        return operator_type in [ast.Add, ast.Sub, ast.Div, ast.Mod]
     else:
         return True
 
 
-def _convert_for_mixed_operation(
-    left: Decimal | timedelta, right: Decimal | timedelta
-) -> tuple[Decimal | float | timedelta, Decimal | float | timedelta]:
-    """Convert operands for mixed-type operations"""
-    if isinstance(left, timedelta) and isinstance(right, Decimal):
-        return left, float(right)
-    elif isinstance(left, Decimal) and isinstance(right, timedelta):
-        return float(left), right
-    else:
-        return left, right
+def _check_mix_types(left_type: type, right_type: type, operator_type: type) -> None:
+    """Raise TypeError if the operand types cannot be mixed in the given operation"""
+    if not _can_mix_types(left_type, right_type, operator_type):
+        op_name = operator_type.__name__
+        left_name = "timedelta" if left_type is Duration else "Decimal"
+        right_name = "timedelta" if right_type is Duration else "Decimal"
+        raise TypeError(f"Unsupported operation '{op_name}' between {left_name} and {right_name}")
 
 
-def _eval_binop(
-    left: Decimal | timedelta, right: Decimal | timedelta, operator_type: type
-) -> Decimal | timedelta:
-    """Evaluate binary operation with type mixing rules for timedelta and Decimal"""
+def _eval_binop(left: _Value, right: _Value, operator_type: type) -> _Value:
+    """Evaluate binary operation with type mixing rules for durations and Decimal"""
     if operator_type not in _ALLOWED_BINARY_OPERATORS:
         raise TypeError(f"Unsupported operator: {operator_type.__name__}")
 
-    if not _can_mix_types(left, right, operator_type):
-        op_name = operator_type.__name__
-        left_type = type(left).__name__
-        right_type = type(right).__name__
-        raise TypeError(f"Unsupported operation '{op_name}' between {left_type} and {right_type}")
+    _check_mix_types(type(left), type(right), operator_type)
 
+    # Scaling a duration by a number is exact, rounding once to whole microseconds
+    if isinstance(left, Duration) and isinstance(right, Decimal):
+        return left.scale(right) if operator_type is ast.Mult else left.divide(right)
+    elif isinstance(right, Duration) and isinstance(left, Decimal):
+        return right.scale(left)
     operator_func = _ALLOWED_BINARY_OPERATORS[operator_type]
-    converted_left, converted_right = _convert_for_mixed_operation(left, right)
-    result = operator_func(converted_left, converted_right)
-    return cast(Decimal | timedelta, result)
+    return cast(_Value, operator_func(left, right))
 
 
-def _eval_math_func(
-    func_name: str, args: list[Decimal | timedelta], kwargs: dict[str, Decimal | timedelta]
-) -> Decimal:
-    """Evaluate math functions"""
-    float_args, float_kwargs = _to_float_args(args, kwargs)
-    result = _MATH_FUNCTIONS[func_name](*float_args, **float_kwargs)
-    return Decimal(str(result))
+def _eval_math_func(func_name: str, args: list[_Value], kwargs: dict[str, _Value]) -> Decimal:
+    """Evaluate math functions to the precision of the decimal context"""
+    if kwargs:
+        raise TypeError(f"{func_name}() takes no keyword arguments")
+    return _MATH_FUNCTIONS[func_name](*[_ensure_decimal(arg) for arg in args])
 
 
-def _eval_rounding_func(func_name: str, args: list[Decimal | timedelta]) -> Decimal | timedelta:
+def _eval_rounding_func(func_name: str, args: list[_Value]) -> _Value:
     """Evaluate rounding functions"""
-    if isinstance(args[0], timedelta):
+    if isinstance(args[0], Duration):
         if func_name in ("round", "roundeven") and len(args) > 1:
             precision = int(_ensure_decimal(args[1]))
-            return _apply_to_timedelta_seconds(args[0], _ROUNDING_FUNCTIONS[func_name], precision)
+            return _apply_to_duration_seconds(args[0], _ROUNDING_FUNCTIONS[func_name], precision)
         else:
-            return _apply_to_timedelta_seconds(args[0], _ROUNDING_FUNCTIONS[func_name])
+            return _apply_to_duration_seconds(args[0], _ROUNDING_FUNCTIONS[func_name])
     else:
         decimal_arg = _ensure_decimal(args[0])
         if func_name in ("round", "roundeven") and len(args) > 1:
@@ -228,65 +263,219 @@ def _eval_rounding_func(func_name: str, args: list[Decimal | timedelta]) -> Deci
             return Decimal(str(result))
 
 
-def _eval_timedelta(
-    args: list[Decimal | timedelta], kwargs: dict[str, Decimal | timedelta]
-) -> timedelta:
-    """Evaluate timedelta function"""
-    float_args, float_kwargs = _to_float_args(args, kwargs)
-    return timedelta(*float_args, **float_kwargs)
+def _timedelta_keywords(args: list[_Value], kwargs: dict[str, _Value]) -> dict[str, _Value]:
+    """Name the positional arguments of a timedelta call like timedelta does"""
+    if len(args) > len(_TIMEDELTA_UNITS):
+        raise TypeError(
+            f"timedelta expected at most {len(_TIMEDELTA_UNITS)} arguments, got {len(args)}"
+        )
+    keywords = dict(zip(_TIMEDELTA_UNITS, args, strict=False))
+    for name, value in kwargs.items():
+        if name in keywords:
+            raise TypeError(f"argument for timedelta given by name ('{name}') and position")
+        keywords[name] = value
+    return keywords
 
 
-def _eval_func(
-    func_name: str, args: list[Decimal | timedelta], kwargs: dict[str, Decimal | timedelta]
-) -> Decimal | timedelta:
-    """Dispatch function call to appropriate handler"""
+def _eval_timedelta(args: list[_Value], kwargs: dict[str, _Value]) -> Duration:
+    """Evaluate timedelta function in Decimal microseconds, rounding once to even"""
+    if args:
+        kwargs = _timedelta_keywords(args, kwargs)
+    microseconds = _ZERO
+    for name, value in kwargs.items():
+        unit = _TIMEDELTA_UNITS.get(name)
+        if unit is None:
+            raise TypeError(f"'{name}' is an invalid keyword argument for timedelta")
+        microseconds += _ensure_decimal(value) * unit
+    return Duration(round(microseconds))
+
+
+_Function = Callable[[list[_Value], dict[str, _Value]], _Value]
+
+
+def _resolve_function(func_name: str) -> _Function:
+    """Look up the handler a function call dispatches to"""
     if func_name not in _ALLOWED_FUNCTIONS:
         raise TypeError(f"Unsupported function: {func_name}")
 
     if func_name in _MATH_FUNCTIONS:
-        return _eval_math_func(func_name, args, kwargs)
+        return functools.partial(_eval_math_func, func_name)
     elif func_name in _ROUNDING_FUNCTIONS:
-        return _eval_rounding_func(func_name, args)
+        return lambda args, kwargs: _eval_rounding_func(func_name, args)
     elif func_name == "timedelta":
-        return _eval_timedelta(args, kwargs)
+        return _eval_timedelta
+    elif func_name in _STREAMING_AGGREGATES:
+        aggregate_values = _STREAMING_AGGREGATES[func_name]
+
+        def call_aggregate(args: list[_Value], kwargs: dict[str, _Value]) -> _Value:
+            if kwargs:
+                raise TypeError(f"{func_name}() takes no keyword arguments")
+            return aggregate_values(args)
+
+        return call_aggregate
     else:
-        result = _ALLOWED_FUNCTIONS[func_name](*args, **kwargs)
-        return cast(Decimal | timedelta, result)
+        function = _ALLOWED_FUNCTIONS[func_name]
+        return lambda args, kwargs: cast(_Value, function(*args, **kwargs))
+
+
+def _eval_func(func_name: str, args: list[_Value], kwargs: dict[str, _Value]) -> _Value:
+    """Dispatch function call to appropriate handler"""
+    return _resolve_function(func_name)(args, kwargs)
+
+
+# The evaluation plan: an optimized tree in which constant subexpressions are folded into
+# values, names of constants are resolved and function calls hold their handler.
+
+
+@dataclass(slots=True)
+class _Constant:
+    value: _Value
+
+
+@dataclass(slots=True)
+class _Name:
+    id: str
+
+
+@dataclass(slots=True)
+class _Negate:
+    operand: "_Plan"
+
+
+@dataclass(slots=True)
+class _BinOp:
+    operator_type: type
+    left: "_Plan"
+    right: "_Plan"
+
+
+@dataclass(slots=True)
+class _Call:
+    name: str
+    function: _Function
+    args: tuple["_Plan", ...]
+    kwargs: tuple[tuple[str, "_Plan"], ...]
+
+
+@dataclass(slots=True)
+class _Apply:
+    """Postfix step applying a binary operator, or ast.USub, to the top of the stack"""
+
+    operator_type: type
+
+
+@dataclass(slots=True)
+class _Invoke:
+    """Postfix step calling a function with the values on top of the stack"""
+
+    name: str
+    function: _Function
+    positional: int
+    keywords: tuple[str, ...]
+
+
+_Step = _Constant | _Name | _Apply | _Invoke
+
 
+@dataclass(slots=True)
+class _Program:
+    """Plan of an expression too deeply nested for a tree, as steps in postfix order"""
 
-def _eval_node(node: ast.AST, expression: str) -> Decimal | timedelta:
-    """Recursively evaluate AST node to Decimal or timedelta"""
+    steps: tuple[_Step, ...]
+
+
+_Plan = _Constant | _Name | _Negate | _BinOp | _Call | _Program
+
+
+def _fold(function: Callable[..., _Value], *args: Any) -> _Constant | None:
+    """
+    Evaluate a subexpression whose inputs are all constant into a constant
+
+    A subexpression that fails, like 1 / 0, is not folded so it raises when evaluated.
+    """
+    try:
+        return _Constant(function(*args))
+    except Exception:
+        return None
+
+
+def _call_type(func_name: str, arg_types: list[type | None]) -> type | None:
+    """Return the result type of a function call when the argument types are known"""
+    if func_name in _MATH_FUNCTIONS or func_name == "sum" and not arg_types:
+        return Decimal
+    elif func_name == "timedelta":
+        return Duration
+    elif arg_types and (func_name in _ROUNDING_FUNCTIONS or len(set(arg_types)) == 1):
+        return arg_types[0]
+    return None
+
+
+def _optimize(node: ast.AST, expression: str) -> tuple[_Plan, type | None]:
+    """
+    Build the evaluation plan of an AST node, rejecting unsupported syntax
+
+    Returns: (plan, result type when known before evaluation: Decimal, Duration or None)
+    """
     if isinstance(node, ast.Constant):
         if not isinstance(node.value, (int, float)):
             raise TypeError(f"Unsupported constant type: {type(node.value).__name__}")
-        original_str = expression[node.col_offset : node.end_col_offset]
-        return Decimal(original_str)
+        return (_Constant(Decimal(literal_source(node, expression))), Decimal)
     elif isinstance(node, ast.BinOp):
-        left = _eval_node(node.left, expression)
-        right = _eval_node(node.right, expression)
-        return _eval_binop(left, right, type(node.op))
+        operator_type = type(node.op)
+        if operator_type not in _ALLOWED_BINARY_OPERATORS:
+            raise TypeError(f"Unsupported operator: {operator_type.__name__}")
+        left, left_type = _optimize(node.left, expression)
+        right, right_type = _optimize(node.right, expression)
+        if isinstance(left, _Constant) and isinstance(right, _Constant):
+            folded = _fold(_eval_binop, left.value, right.value, operator_type)
+            if folded is not None:
+                return (folded, type(folded.value))
+        result_type: type | None = None
+        if left_type is not None and right_type is not None:
+            _check_mix_types(left_type, right_type, operator_type)
+            both_durations = left_type is Duration and right_type is Duration
+            result_type = Decimal if left_type is right_type is Decimal else Duration
+            if both_durations and operator_type is ast.Div:
+                result_type = Decimal
+        return (_BinOp(operator_type, left, right), result_type)
     elif isinstance(node, ast.UnaryOp):
         if isinstance(node.op, ast.UAdd):
-            return _eval_node(node.operand, expression)
+            return _optimize(node.operand, expression)
         elif isinstance(node.op, ast.USub):
-            return -_eval_node(node.operand, expression)
+            operand, operand_type = _optimize(node.operand, expression)
+            if isinstance(operand, _Constant):
+                return (_Constant(-operand.value), operand_type)
+            return (_Negate(operand), operand_type)
         else:
             raise TypeError(f"Unsupported unary operator: {type(node.op).__name__}")
     elif isinstance(node, ast.Call):
         if not isinstance(node.func, ast.Name):
             raise TypeError(f"Unsupported function call type: {type(node.func).__name__}")
         func_name = node.func.id
-        args = [_eval_node(arg, expression) for arg in node.args]
-        kwargs = {}
+        args = [_optimize(arg, expression) for arg in node.args]
+        kwargs = []
         for keyword in node.keywords:
             if keyword.arg is None:
                 raise TypeError("Unsupported syntax: '**' argument unpacking")
-            kwargs[keyword.arg] = _eval_node(keyword.value, expression)
-        return _eval_func(func_name, args, kwargs)
+            kwargs.append((keyword.arg, _optimize(keyword.value, expression)[0]))
+        function = _resolve_function(func_name)
+        arg_plans = tuple(arg for arg, _ in args)
+        if all(isinstance(arg, _Constant) for arg in arg_plans) and all(
+            isinstance(value, _Constant) for _, value in kwargs
+        ):
+            folded = _fold(
+                function,
+                [cast(_Constant, arg).value for arg in arg_plans],
+                {name: cast(_Constant, value).value for name, value in kwargs},
+            )
+            if folded is not None:
+                return (folded, type(folded.value))
+        call_type = _call_type(func_name, [arg_type for _, arg_type in args])
+        return (_Call(func_name, function, arg_plans, tuple(kwargs)), call_type)
     elif isinstance(node, ast.Name):
         if node.id in _ALLOWED_CONSTANTS:
-            return _ALLOWED_CONSTANTS[node.id]
-        raise TypeError(f"Unsupported name: {node.id}")
+            return (_Constant(_ALLOWED_CONSTANTS[node.id]()), Decimal)
+        return (_Name(node.id), None)
     elif isinstance(node, ast.Tuple):
         # A stray comma parses as a tuple, e.g. "1,20"
         raise ValueError(
@@ -297,7 +486,494 @@ def _eval_node(node: ast.AST, expression: str) -> Decimal | timedelta:
         raise TypeError(f"Unsupported AST node type: {type(node).__name__}")
 
 
+# Postfix plans: expressions nested more deeply than Python's parser allows, like a
+# generated "1 + 2 + ... + 100000", and very long sources are parsed by a shunting-yard
+# scan instead. Parsing and evaluating them take linear time and a bounded stack depth.
+
+_PRECEDENCE: Final[dict[type, int]] = {
+    ast.Add: 1,
+    ast.Sub: 1,
+    ast.Mult: 2,
+    ast.Div: 2,
+    ast.Mod: 2,
+    ast.USub: 3,
+    ast.Pow: 4,
+}
+_OPERATOR_TYPES: Final[dict[str, type]] = {
+    "+": ast.Add,
+    "-": ast.Sub,
+    "*": ast.Mult,
+    "/": ast.Div,
+    "%": ast.Mod,
+    "**": ast.Pow,
+}
+
+
+# Longer sources are not parsed into a tree at all: Python's AST takes about ten times the
+# memory of the postfix program
+_TREE_SOURCE_LIMIT: Final = 1_000_000
+# How Python's parser rejects more parentheses than it can nest, which the linear parser
+# has no limit on
+_TOO_MANY_PARENTHESES: Final = "too many nested parentheses"
+
+
+@functools.cache
+def _postfix_token_regex() -> re.Pattern[str]:
+    return re.compile(
+        r"\s*(?:(?P<number>(?:\d[\d_]*(?:\.[\d_]*)?|\.\d[\d_]*)(?:[eE][-+]?\d+)?)"
+        r"|(?P<name>[^\W\d]\w*)|(?P<operator>\*\*|[-+*/%(),=]))"
+    )
+
+
+@dataclass(slots=True)
+class _PendingCall:
+    """Function call whose arguments are being parsed"""
+
+    name: str
+    function: _Function
+    positional: int = 0
+    keywords: list[str] = field(default_factory=list)
+    keyword_argument: bool = False
+
+
+def _emit(steps: list[_Step], step: _Step, check: PostfixCheck) -> None:
+    """
+    Append step to a postfix program, folding it when its operands are constant
+
+    The value of every step is checked against the limits before anything is folded.
+    """
+    if isinstance(step, _Apply):
+        arity = 1 if step.operator_type is ast.USub else 2
+        if arity == 1:
+            check.negate()
+        else:
+            check.operation(step.operator_type)
+    elif isinstance(step, _Invoke):
+        arity = step.positional + len(step.keywords)
+        check.call(step.name, step.positional, step.keywords)
+    else:
+        value = step.value if isinstance(step, _Constant) else None
+        check.push(value if isinstance(value, Decimal) else None)
+        steps.append(step)
+        return
+    start = len(steps) - arity
+    values = []
+    for operand in steps[start:]:
+        if not isinstance(operand, _Constant):
+            steps.append(step)
+            return
+        values.append(operand.value)
+    if isinstance(step, _Invoke):
+        keywords = dict(zip(step.keywords, values[step.positional :], strict=True))
+        folded = _fold(step.function, values[: step.positional], keywords)
+    elif arity == 1:
+        folded = _Constant(-values[0])
+    else:
+        folded = _fold(_eval_binop, values[0], values[1], step.operator_type)
+    if folded is None:
+        steps.append(step)
+    else:
+        steps[start:] = [folded]
+
+
+def _close_argument(call: _PendingCall) -> None:
+    """Count the argument that ends at a comma or closing parenthesis"""
+    if call.keyword_argument:
+        call.keyword_argument = False
+    elif call.keywords:
+        raise SyntaxError("positional argument follows keyword argument")
+    else:
+        call.positional += 1
+
+
+def _emit_call(steps: list[_Step], call: _PendingCall, check: PostfixCheck) -> None:
+    _emit(steps, _Invoke(call.name, call.function, call.positional, tuple(call.keywords)), check)
+
+
+def _postfix_plan(expression: str) -> _Plan:
+    """Parse expression into a postfix program with the shunting-yard algorithm"""
+    token_regex = _postfix_token_regex()
+    steps: list[_Step] = []
+    check = PostfixCheck()
+    # Operators, function calls and grouping parentheses (None) waiting for their operands
+    pending: list[_Apply | _PendingCall | None] = []
+    expect_operand = True
+    # Whether the next token starts a function argument, after "(" or ","
+    argument_start = False
+    position = 0
+    while match := token_regex.match(expression, position):
+        position = match.end()
+        kind = cast(str, match.lastgroup)
+        text = match[kind]
+        if kind == "number" and expect_operand:
+            _emit(steps, _Constant(Decimal(text)), check)
+            expect_operand = argument_start = False
+        elif kind == "name" and expect_operand:
+            following = token_regex.match(expression, position)
+            following_text = following["operator"] if following else None
+            following_end = following.end() if following else position
+            if following_text == "(":
+                position = following_end
+                pending.append(_PendingCall(text, _resolve_function(text)))
+                argument_start = True
+            elif following_text == "=" and argument_start:
+                position = following_end
+                call = cast(_PendingCall, pending[-1])
+                if text in call.keywords:
+                    raise SyntaxError(f"keyword argument repeated: {text}")
+                call.keywords.append(text)
+                call.keyword_argument = True
+                argument_start = False
+            else:
+                constant = _ALLOWED_CONSTANTS.get(text)
+                _emit(steps, _Name(text) if constant is None else _Constant(constant()), check)
+                expect_operand = argument_start = False
+        elif kind != "operator":
+            raise SyntaxError("invalid syntax")
+        elif text in ("(", "+", "-") and expect_operand:
+            if text != "+":
+                pending.append(None if text == "(" else _Apply(ast.USub))
+            argument_start = False
+        elif text in (")", ",") and expect_operand:
+            # Only an empty argument list or a trailing comma closes a call here
+            if text != ")" or not argument_start:
+                raise SyntaxError("invalid syntax")
+            _emit_call(steps, cast(_PendingCall, pending.pop()), check)
+            expect_operand = argument_start = False
+        elif text in (")", ","):
+            while pending and isinstance(pending[-1], _Apply):
+                _emit(steps, cast(_Apply, pending.pop()), check)
+            top = pending[-1] if pending else None
+            if isinstance(top, _PendingCall):
+                _close_argument(top)
+                if text == ")":
+                    _emit_call(steps, top, check)
+                    pending.pop()
+            elif text == ",":
+                # A stray comma, which the tree-based parser sees as a tuple like "1,20"
+                raise ValueError(
+                    "Invalid comma: use ',' as a thousands separator like '1,000' "
+                    "or between function arguments like 'max(1, 2)'"
+                )
+            elif not pending:
+                raise SyntaxError("unmatched ')'")
+            else:
+                pending.pop()
+            expect_operand = argument_start = text == ","
+        elif text in _OPERATOR_TYPES and not expect_operand:
+            operator_type = _OPERATOR_TYPES[text]
+            precedence = _PRECEDENCE[operator_type]
+            # ** is right-associative; the other binary operators are left-associative
+            while pending and isinstance(waiting := pending[-1], _Apply):
+                waiting_precedence = _PRECEDENCE[waiting.operator_type]
+                if waiting_precedence < precedence or (
+                    waiting_precedence == precedence and operator_type is ast.Pow
+                ):
+                    break
+                _emit(steps, waiting, check)
+                pending.pop()
+            pending.append(_Apply(operator_type))
+            expect_operand = True
+        else:
+            raise SyntaxError("invalid syntax")
+    if expression[position:].strip() or expect_operand:
+        raise SyntaxError("invalid syntax")
+    while pending:
+        step = pending.pop()
+        if not isinstance(step, _Apply):
+            raise SyntaxError("'(' was never closed")
+        _emit(steps, step, check)
+    if len(steps) == 1 and isinstance(steps[0], (_Constant, _Name)):
+        return steps[0]
+    return _Program(tuple(steps))
+
+
+def _run_program(program: _Program, names: Mapping[str, Decimal | timedelta] | None) -> _Value:
+    """Evaluate a postfix program with a value stack"""
+    stack: list[_Value] = []
+    for step in program.steps:
+        if isinstance(step, _Constant):
+            stack.append(step.value)
+        elif isinstance(step, _Apply):
+            right = stack.pop()
+            if step.operator_type is ast.USub:
+                stack.append(-right)
+            else:
+                stack.append(_eval_binop(stack.pop(), right, step.operator_type))
+        elif isinstance(step, _Invoke):
+            start = len(stack) - step.positional - len(step.keywords)
+            args = stack[start:]
+            del stack[start:]
+            kwargs = dict(zip(step.keywords, args[step.positional :], strict=True))
+            stack.append(step.function(args[: step.positional], kwargs))
+        else:
+            stack.append(_lookup_name(step.id, names))
+    return stack[0]
+
+
+def _lookup_name(name: str, names: Mapping[str, Decimal | timedelta] | None) -> _Value:
+    if names is not None and name in names:
+        value = names[name]
+        return Duration.from_timedelta(value) if isinstance(value, timedelta) else value
+    raise TypeError(f"Unsupported name: {name}")
+
+
+# Compiled plans: every node of a plan becomes a closure with its operator, handler and
+# number of arguments resolved once, so an evaluation only calls closures instead of
+# dispatching on the type of every node. Only plans, which hold nothing but whitelisted
+# operations, are compiled.
+
+_Names = Mapping[str, Decimal | timedelta] | None
+_Evaluator = Callable[[_Names], _Value]
+
+
+# Operations on durations that _can_mix_types allows, by operator and operand types
+_DURATION_OPERATIONS: Final[dict[type, dict[tuple[type, type], Callable[[Any, Any], _Value]]]] = {
+    ast.Add: {(Duration, Duration): op.add},
+    ast.Sub: {(Duration, Duration): op.sub},
+    ast.Mod: {(Duration, Duration): op.mod},
+    ast.Div: {(Duration, Duration): op.truediv, (Duration, Decimal): Duration.divide},
+    ast.Mult: {
+        (Duration, Decimal): Duration.scale,
+        (Decimal, Duration): lambda number, duration: duration.scale(number),
+    },
+}
+
+
+def _compile_name(name: str) -> _Evaluator:
+    def lookup(names: _Names) -> _Value:
+        try:
+            value = names[name]  # type: ignore[index]
+        except (KeyError, TypeError):
+            raise TypeError(f"Unsupported name: {name}") from None
+        if type(value) is Decimal:
+            return value
+        return Duration.from_timedelta(value) if isinstance(value, timedelta) else value
+
+    return lookup
+
+
+def _compile_binop(plan: _BinOp) -> _Evaluator:
+    operator_type = plan.operator_type
+    operator_func = _ALLOWED_BINARY_OPERATORS[operator_type]
+    operations = _DURATION_OPERATIONS.get(operator_type, {})
+
+    def mixed(left_value: _Value, right_value: _Value) -> _Value:
+        operation = operations.get((type(left_value), type(right_value)))
+        if operation is None:
+            # Raises the error for operand types that do not mix
+            return _eval_binop(left_value, right_value, operator_type)
+        return operation(left_value, right_value)
+
+    # Two numbers mix with every operator, so they skip the type rules; a constant
+    # operand is bound into the closure
+    if isinstance(plan.right, _Constant) and type(plan.right.value) is Decimal:
+        left = _compile_plan(plan.left)
+        constant = plan.right.value
+
+        def binop_constant_right(names: _Names) -> _Value:
+            left_value = left(names)
+            if type(left_value) is Decimal:
+                return cast(Decimal, operator_func(left_value, constant))
+            return mixed(left_value, constant)
+
+        return binop_constant_right
+    if isinstance(plan.left, _Constant) and type(plan.left.value) is Decimal:
+        right = _compile_plan(plan.right)
+        constant = plan.left.value
+
+        def binop_constant_left(names: _Names) -> _Value:
+            right_value = right(names)
+            if type(right_value) is Decimal:
+                return cast(Decimal, operator_func(constant, right_value))
+            return mixed(constant, right_value)
+
+        return binop_constant_left
+    left = _compile_plan(plan.left)
+    right = _compile_plan(plan.right)
+
+    def binop(names: _Names) -> _Value:
+        left_value = left(names)
+        right_value = right(names)
+        if type(left_value) is Decimal and type(right_value) is Decimal:
+            return cast(Decimal, operator_func(left_value, right_value))
+        return mixed(left_value, right_value)
+
+    return binop
+
+
+def _compile_timedelta(
+    args: tuple[_Evaluator, ...], kwargs: tuple[tuple[str, _Evaluator], ...]
+) -> _Evaluator | None:
+    """Compile a timedelta call with its units resolved, or None when it has invalid ones"""
+    names = [*list(_TIMEDELTA_UNITS)[: len(args)], *(name for name, _ in kwargs)]
+    if len(args) > len(_TIMEDELTA_UNITS) or len(set(names)) < len(names):
+        return None
+    if any(name not in _TIMEDELTA_UNITS for name in names):
+        return None
+    units = tuple(_TIMEDELTA_UNITS[name] for name in names)
+    values = (*args, *(value for _, value in kwargs))
+    if len(values) == 1:
+        value = values[0]
+        unit = units[0]
+        return lambda names: Duration(round(_ensure_decimal(value(names)) * unit))
+
+    def call_timedelta(names: _Names) -> _Value:
+        microseconds = _ZERO
+        for value, unit in zip([value(names) for value in values], units, strict=True):
+            microseconds += _ensure_decimal(value) * unit
+        return Duration(round(microseconds))
+
+    return call_timedelta
+
+
+def _constant_places(plan: _Call) -> int | None:
+    """Decimal places of a rounding call given as a constant second argument, else None"""
+    if len(plan.args) != 2 or plan.kwargs or not isinstance(plan.args[1], _Constant):
+        return None
+    places = plan.args[1].value
+    return int(places) if type(places) is Decimal else None
+
+
+def _compile_call(plan: _Call) -> _Evaluator:
+    function = plan.function
+    args = tuple(_compile_plan(arg) for arg in plan.args)
+    kwargs = tuple((name, _compile_plan(value)) for name, value in plan.kwargs)
+    if plan.name == "timedelta":
+        call_timedelta = _compile_timedelta(args, kwargs)
+        if call_timedelta is not None:
+            return call_timedelta
+    elif plan.name in _MATH_FUNCTIONS and len(args) == 1 and not kwargs:
+        math_function = _MATH_FUNCTIONS[plan.name]
+        arg = args[0]
+        return lambda names: math_function(_ensure_decimal(arg(names)))
+    elif plan.name in ("round", "roundeven") and (places := _constant_places(plan)):
+        rounding = ROUND_HALF_UP if plan.name == "round" else ROUND_HALF_EVEN
+        exponent = Decimal(1).scaleb(-places)
+        arg = args[0]
+        places_value = Decimal(places)
+
+        def call_rounding(names: _Names) -> _Value:
+            value = arg(names)
+            if type(value) is Decimal:
+                return value.quantize(exponent, rounding=rounding)
+            return function([value, places_value], {})
+
+        return call_rounding
+    elif plan.name in _STREAMING_AGGREGATES and not kwargs:
+        aggregate_values = _STREAMING_AGGREGATES[plan.name]
+        return lambda names: aggregate_values([arg(names) for arg in args])
+    # Other calls, including those with invalid arguments, go through the handler, which
+    # raises the same errors as ever
+    return lambda names: function(
+        [arg(names) for arg in args], {name: value(names) for name, value in kwargs}
+    )
+
+
+def _compile_plan(plan: _Plan) -> _Evaluator:
+    """Turn an evaluation plan into a closure evaluating it to Decimal or Duration"""
+    if isinstance(plan, _Constant):
+        value = plan.value
+        return lambda names: value
+    elif isinstance(plan, _BinOp):
+        return _compile_binop(plan)
+    elif isinstance(plan, _Call):
+        return _compile_call(plan)
+    elif isinstance(plan, _Negate):
+        operand = _compile_plan(plan.operand)
+        return lambda names: -operand(names)
+    elif isinstance(plan, _Program):
+        return functools.partial(_run_program, plan)
+    else:
+        return _compile_name(plan.id)
+
+
+@dataclass(slots=True)
+class CompiledExpression:
+    """Parsed expression that can be evaluated repeatedly without re-parsing"""
+
+    # None when the expression is too long or nested too deeply for Python's parser
+    node: ast.expr | None
+    source: str
+    # Built on the first Decimal evaluation; the float backend only reads node
+    _plan: _Plan | None = field(default=None, repr=False, compare=False)
+    # The plan compiled, which is what evaluations run
+    _evaluator: _Evaluator | None = field(default=None, repr=False, compare=False)
+    # Constants are folded to the context precision, so another precision rebuilds the plan
+    _plan_precision: int = field(default=0, repr=False, compare=False)
+
+
+def compile_expression(expression: str) -> CompiledExpression:
+    """Parse expression into a reusable evaluation plan"""
+    node: ast.expr | None = None
+    if len(expression) <= _TREE_SOURCE_LIMIT:
+        try:
+            node = ast.parse(expression, mode="eval").body
+        except (RecursionError, MemoryError):
+            # Nested too deeply for the parser's stack, like "2 ** 2 ** ... ** 2"
+            pass
+        except SyntaxError as e:
+            if e.msg != _TOO_MANY_PARENTHESES:
+                raise
+    return CompiledExpression(node, expression)
+
+
+def _build_plan(compiled: CompiledExpression) -> tuple[_Plan, _Evaluator]:
+    """
+    Optimize the tree, or parse the source linearly when it nests too deeply for one
+
+    Returns: (plan, plan compiled)
+    """
+    if compiled.node is not None:
+        try:
+            check_expression(compiled.node, compiled.source)
+            plan = _optimize(compiled.node, compiled.source)[0]
+            return (plan, _compile_plan(plan))
+        except RecursionError:
+            pass
+    plan = _postfix_plan(compiled.source)
+    return (plan, _compile_plan(plan))
+
+
+def _plan(compiled: CompiledExpression) -> _Evaluator:
+    """Build and keep the plan of compiled for the precision of the decimal context"""
+    compiled._plan, evaluator = _build_plan(compiled)
+    compiled._evaluator = evaluator
+    compiled._plan_precision = getcontext().prec
+    return evaluator
+
+
+def prepare(compiled: CompiledExpression) -> None:
+    """
+    Build the plan evaluate() would build on its next call, so that its cost can be told
+    apart from evaluation; does nothing if the plan already fits the decimal context
+    """
+    if compiled._evaluator is None or compiled._plan_precision != getcontext().prec:
+        _plan(compiled)
+
+
+def evaluate(
+    compiled: CompiledExpression, names: Mapping[str, Decimal | timedelta] | None = None
+) -> Decimal | timedelta:
+    """
+    Evaluate a compiled expression to Decimal or timedelta, looking up free names in names
+
+    The first call optimizes the expression once: constant subexpressions are folded,
+    operand types known in advance are checked and the rest is compiled into closures, so
+    later calls only run the parts that depend on names. Results are rounded to the
+    precision of the decimal context. An expression with a value certain to exceed the
+    limits of calc.limits is rejected before it is evaluated, and so is a result that
+    exceeds them.
+    """
+    evaluator = compiled._evaluator
+    if evaluator is None or compiled._plan_precision != getcontext().prec:
+        evaluator = _plan(compiled)
+    value = evaluator(names)
+    result = value.to_timedelta() if isinstance(value, Duration) else value
+    check_result(result)
+    return result
+
+
 def safe_eval(expression: str) -> Decimal | timedelta:
     """Safely evaluate mathematical expression using AST-based whitelist approach"""
-    node = ast.parse(expression, mode="eval").body
-    return _eval_node(node, expression)
+    return evaluate(compile_expression(expression))
@@ -0,0 +1,225 @@
+import ast
+import math
+from collections.abc import Callable, Mapping
+from datetime import timedelta
+from decimal import Decimal
+from typing import Final
+
+from .evaluator import _ALLOWED_FUNCTIONS, CompiledExpression, evaluate
+from .limits import check_result
+
+# Binary-float counterpart of the Decimal evaluator. Numbers are float and durations are
+# int microseconds, so the two kinds stay distinguishable by type alone and the same
+# mixing rules as timedelta and Decimal apply.
+Value = float | int
+
+_MICROSECONDS_PER_SECOND: Final = 1_000_000
+_ONE_MICROSECOND: Final = timedelta(microseconds=1)
+
+_CONSTANTS: Final[dict[str, float]] = {"e": math.e, "pi": math.pi}
+
+_MATH_FUNCTIONS: Final[dict[str, Callable[..., float]]] = {
+    "cos": math.cos,
+    "exp": math.exp,
+    "log": math.log,
+    "sin": math.sin,
+    "sqrt": math.sqrt,
+    "tan": math.tan,
+}
+
+
+def _kind(value: Value) -> str:
+    return "timedelta" if isinstance(value, int) else "Decimal"
+
+
+def _number(value: Value) -> float:
+    """Ensure value is a number, raising TypeError for a duration"""
+    if isinstance(value, int):
+        raise TypeError("Math functions only accept Decimal values, got timedelta")
+    return value
+
+
+def _round_half_up(value: float, precision: int = 0) -> float:
+    """Round with ties away from zero on the binary value"""
+    scale = 10.0**precision
+    return math.copysign(math.floor(abs(value) * scale + 0.5), value) / scale
+
+
+_ROUNDING_FUNCTIONS: Final[dict[str, Callable[..., float]]] = {
+    "ceil": math.ceil,
+    "floor": math.floor,
+    "round": _round_half_up,
+    "roundeven": round,
+}
+
+
+def _uniform(args: list[Value], function_name: str) -> type:
+    """Validate that all arguments are of the same kind"""
+    if not args:
+        raise TypeError(f"{function_name} expected at least 1 argument, got 0")
+    expected_type = type(args[0])
+    if any(type(arg) is not expected_type for arg in args):
+        raise TypeError(f"Cannot mix timedelta and Decimal in {function_name}")
+    return expected_type
+
+
+def _eval_number_binop(left: float, right: float, operator_type: type) -> float:
+    """Evaluate binary operation between two numbers"""
+    if operator_type is ast.Add:
+        return left + right
+    elif operator_type is ast.Sub:
+        return left - right
+    elif operator_type is ast.Mult:
+        return left * right
+    elif operator_type is ast.Div:
+        return left / right
+    elif operator_type is ast.Mod:
+        # fmod keeps the sign of the dividend, like Decimal's remainder
+        return math.fmod(left, right)
+    elif operator_type is ast.Pow:
+        # math.pow raises instead of returning a complex number for a negative base
+        return math.pow(left, right)
+    raise TypeError(f"Unsupported operator: {operator_type.__name__}")
+
+
+def _eval_binop(left: Value, right: Value, operator_type: type) -> Value:
+    """Evaluate binary operation with the timedelta and Decimal mixing rules"""
+    if isinstance(left, float) and isinstance(right, float):
+        return _eval_number_binop(left, right, operator_type)
+    elif isinstance(left, int) and isinstance(right, int):
+        if operator_type is ast.Add:
+            return left + right
+        elif operator_type is ast.Sub:
+            return left - right
+        elif operator_type is ast.Div:
+            return left / right
+        elif operator_type is ast.Mod:
+            return left % right
+    elif isinstance(left, int):
+        if operator_type is ast.Mult:
+            return round(left * right)
+        elif operator_type is ast.Div:
+            return round(left / right)
+    elif operator_type is ast.Mult:
+        return round(left * right)
+
+    if operator_type not in (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.Pow):
+        raise TypeError(f"Unsupported operator: {operator_type.__name__}")
+    op_name = operator_type.__name__
+    raise TypeError(f"Unsupported operation '{op_name}' between {_kind(left)} and {_kind(right)}")
+
+
+def _duration_seconds(func: Callable[..., float], microseconds: int, *args: int) -> int:
+    """Apply a rounding function to a duration in seconds"""
+    seconds = func(microseconds / _MICROSECONDS_PER_SECOND, *args)
+    return round(seconds * _MICROSECONDS_PER_SECOND)
+
+
+def _eval_func(func_name: str, args: list[Value], kwargs: dict[str, Value]) -> Value:
+    """Evaluate a whitelisted function on floats and integer-microsecond durations"""
+    if func_name not in _ALLOWED_FUNCTIONS:
+        raise TypeError(f"Unsupported function: {func_name}")
+
+    if func_name in _MATH_FUNCTIONS:
+        number_kwargs = {k: _number(v) for k, v in kwargs.items()}
+        return _MATH_FUNCTIONS[func_name](*[_number(arg) for arg in args], **number_kwargs)
+    elif func_name in _ROUNDING_FUNCTIONS:
+        precision = [int(_number(arg)) for arg in args[1:2] if func_name.startswith("round")]
+        func = _ROUNDING_FUNCTIONS[func_name]
+        if isinstance(args[0], int):
+            return _duration_seconds(func, args[0], *precision)
+        return float(func(args[0], *precision))
+    elif func_name == "timedelta":
+        number_args = [_number(arg) for arg in args]
+        duration = timedelta(*number_args, **{k: _number(v) for k, v in kwargs.items()})
+        return duration // _ONE_MICROSECOND
+    elif func_name == "abs":
+        return abs(*args)
+    elif func_name == "sum":
+        if not args:
+            return 0.0
+        return sum(args, 0 if _uniform(args, "sum") is int else 0.0)
+    elif func_name == "avg":
+        total = sum(args, 0 if _uniform(args, "avg") is int else 0.0)
+        return round(total / len(args)) if isinstance(total, int) else total / len(args)
+    else:
+        if len(args) != 1:
+            _uniform(args, func_name)
+        return max(args) if func_name == "max" else min(args)
+
+
+# Values of the free names of an expression, as the Decimal evaluator takes them
+_Names = Mapping[str, Decimal | timedelta] | None
+
+
+def _name(name: str, names: _Names) -> Value:
+    if name in _CONSTANTS:
+        return _CONSTANTS[name]
+    if names is None or name not in names:
+        raise TypeError(f"Unsupported name: {name}")
+    value = names[name]
+    return value // _ONE_MICROSECOND if isinstance(value, timedelta) else float(value)
+
+
+def _eval_node(node: ast.AST, expression: str, names: _Names) -> Value:
+    """Recursively evaluate AST node to float or integer microseconds"""
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, (int, float)):
+            raise TypeError(f"Unsupported constant type: {type(node.value).__name__}")
+        return float(node.value)
+    elif isinstance(node, ast.BinOp):
+        left = _eval_node(node.left, expression, names)
+        right = _eval_node(node.right, expression, names)
+        return _eval_binop(left, right, type(node.op))
+    elif isinstance(node, ast.UnaryOp):
+        if isinstance(node.op, ast.UAdd):
+            return _eval_node(node.operand, expression, names)
+        elif isinstance(node.op, ast.USub):
+            return -_eval_node(node.operand, expression, names)
+        else:
+            raise TypeError(f"Unsupported unary operator: {type(node.op).__name__}")
+    elif isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name):
+            raise TypeError(f"Unsupported function call type: {type(node.func).__name__}")
+        args = [_eval_node(arg, expression, names) for arg in node.args]
+        kwargs = {}
+        for keyword in node.keywords:
+            if keyword.arg is None:
+                raise TypeError("Unsupported syntax: '**' argument unpacking")
+            kwargs[keyword.arg] = _eval_node(keyword.value, expression, names)
+        return _eval_func(node.func.id, args, kwargs)
+    elif isinstance(node, ast.Name):
+        return _name(node.id, names)
+    elif isinstance(node, ast.Tuple):
+        raise ValueError(
+            "Invalid comma: use ',' as a thousands separator like '1,000' "
+            "or between function arguments like 'max(1, 2)'"
+        )
+    else:
+        raise TypeError(f"Unsupported AST node type: {type(node).__name__}")
+
+
+def to_decimal(result: float) -> Decimal:
+    """Convert a float result to Decimal from its shortest repr, rejecting inf and nan"""
+    if not math.isfinite(result):
+        raise OverflowError("float result is not finite")
+    return Decimal(repr(result))
+
+
+def evaluate_float(compiled: CompiledExpression, names: _Names = None) -> Decimal | timedelta:
+    """
+    Evaluate a compiled expression with binary floats, looking up free names in names
+
+    The result is converted back to Decimal (from the shortest repr of the float) or
+    timedelta so it can be formatted like a Decimal-mode result. Expressions nested too
+    deeply for a tree are evaluated exactly by the Decimal evaluator's linear path.
+    """
+    if compiled.node is None:
+        return evaluate(compiled, names)
+    try:
+        result = _eval_node(compiled.node, compiled.source, names)
+    except RecursionError:
+        return evaluate(compiled, names)
+    value = timedelta(microseconds=result) if isinstance(result, int) else to_decimal(result)
+    check_result(value)
+    return value
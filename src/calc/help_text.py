@@ -1,7 +1,8 @@
 HELP_TEXT = """calc: A simple command-line calculator
 
 Features:
-  ?           Previous result
+  ?           Previous result (?N: Nth result, ?-N: Nth most recent)
+  a = 2 * b   Variable; redefining b recomputes a
   1,000       Thousands separators
   #           Comments
   exit        Exit calculator
@@ -11,6 +12,7 @@ Operators:
 
 Functions:
   abs avg ceil cos exp floor log max min round roundeven sin sqrt sum tan
+  sum(@file)  Aggregate one value per line of a file (@- is stdin)
 
 Constants: pi e
 
@@ -0,0 +1,84 @@
+import re
+from collections import deque
+from collections.abc import Iterable
+from datetime import timedelta
+from decimal import Decimal
+from typing import Final
+
+# Results a session keeps for ?N and ?-N; older ones are dropped first
+HISTORY_SIZE: Final = 1000
+# ? is the previous result, ?N the Nth result of the session and ?-N the Nth most recent
+# one, so ?-1 is ?. A subtraction from the previous result needs a space: ? - 3.
+REFERENCE_PATTERN: Final = re.compile(r"\?(-?\d+)?")
+
+
+class History:
+    """
+    Bounded ring of the results of a session, as exact values
+
+    Expressions refer to results through ?, ?N and ?-N, which are evaluated as names
+    bound to the values themselves: results are neither formatted nor parsed again, and a
+    plan using them is cached once whatever the values are.
+    """
+
+    def __init__(
+        self, results: Iterable[Decimal | timedelta] = (), size: int = HISTORY_SIZE
+    ) -> None:
+        self._results: deque[Decimal | timedelta] = deque(maxlen=size)
+        # Results ever added, so the number of the latest one
+        self.count = 0
+        for result in results:
+            self.append(result)
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def append(self, result: Decimal | timedelta) -> None:
+        self._results.append(result)
+        self.count += 1
+
+    @property
+    def last(self) -> Decimal | timedelta:
+        """The previous result, or 0 before the first one"""
+        return self._results[-1] if self._results else Decimal(0)
+
+    def can_resolve(self, expression: str) -> bool:
+        """Check that every reference in expression is to one of the latest results held"""
+        for match in REFERENCE_PATTERN.finditer(expression):
+            number = match[1]
+            if number is not None and not (number.startswith("-") and -int(number) <= len(self)):
+                return False
+        return True
+
+    def substitute(self, expression: str) -> tuple[str, dict[str, Decimal | timedelta]]:
+        """
+        Replace every reference in expression with a name for the result it refers to
+
+        Returns: (expression with the names, value of each name)
+        """
+        names: dict[str, Decimal | timedelta] = {}
+
+        def replace(match: re.Match[str]) -> str:
+            number = int(match[1] or -1)
+            name = f"_previous{-number}" if number < 0 else f"_result{number}"
+            if name not in names:
+                names[name] = self._lookup(match[0], number)
+            return name
+
+        return (REFERENCE_PATTERN.sub(replace, expression), names)
+
+    def _lookup(self, reference: str, number: int) -> Decimal | timedelta:
+        if number == 0:
+            raise ValueError(f"No result {reference}: results are numbered from 1")
+        if number == -1:
+            return self.last
+        # Position from the oldest result held
+        index = len(self) + number if number < 0 else number - (self.count - len(self)) - 1
+        if number > self.count or -number > self.count:
+            raise ValueError(f"No result {reference}: only {self.count:,} so far")
+        if index < 0:
+            raise ValueError(
+                f"Result {reference} is no longer kept: history holds the last "
+                f"{self._results.maxlen:,} results"
+            )
+        return self._results[index]
@@ -0,0 +1,67 @@
+import re
+
+from .evaluator import RESERVED_WORDS
+from .time_utils import duration_constructor, duration_pattern
+
+# Characters that may surround an "x" used as a multiplication sign (the full-width plus and
+# minus count as their ASCII forms).
+_OPERATOR_CONTEXT = r"[\d\s\-+*/(),.^%＋－]"
+# A digit run whose commas are thousands separators: a comma is only part of the number when
+# exactly three digits follow it, so "max(1,20)" keeps its argument comma.
+_DIGITS = r"\d(?:\d|,(?=\d{3}(?!\d)))*"
+_NUMBER = _DIGITS + r"(?:\." + _DIGITS + ")?"
+# The suffix group excludes every character with a meaning in the expression grammar
+# (digits, whitespace, operators + - * / % ^ and their aliases, parentheses, comma, decimal
+# point), so a unit match stops at expression syntax and only the unit word itself is
+# captured: in "100円+200" the unit is 円, and "+200" stays part of the expression.
+_UNIT = r"(?![xX]" + _OPERATOR_CONTEXT + r")[^\d\s\-+*/(),.^%＋－×÷]+\b"
+_TIME = _DIGITS + r":\d+:\d+(?:\.\d{1,6})?"
+# A number starts where no word character precedes it, except an "x" that is itself a
+# multiplication sign ("2x3円" is "2*3").
+_NUMBER_START = r"(?:(?<!\w)|(?<=" + _OPERATOR_CONTEXT + r"[xX]))"
+
+_TOKEN_PATTERN = re.compile(
+    "|".join(
+        [
+            r"(?P<duration>" + duration_pattern(_NUMBER, _DIGITS) + ")",
+            # A clock time has no fractional hours, so in "0.501:30:45" it starts after the point
+            r"(?P<integer_part>" + _DIGITS + r"\.(?=" + _TIME + "))",
+            rf"(?P<quantity>{_NUMBER_START}(?P<number>{_NUMBER})(?P<unit>\s*{_UNIT})?)",
+            r"(?P<digits>" + _NUMBER + ")",
+            r"(?P<times>(?<=" + _OPERATOR_CONTEXT + r")[xX](?=" + _OPERATOR_CONTEXT + "))",
+            r"(?P<alias>[＋－×÷^])",
+        ]
+    )
+)
+
+_ALIASES = {"＋": "+", "－": "-", "×": "*", "÷": "/", "^": "**"}
+
+
+def _replace_token(match: re.Match[str]) -> str:
+    """Rewrite one lexical token into Python expression syntax"""
+    kind = match.lastgroup
+    text = match.group(0)
+    if kind == "duration":
+        return duration_constructor(match)
+    elif kind == "quantity":
+        number = match.group("number").replace(",", "")
+        unit = match.group("unit")
+        if unit is not None and unit.lstrip() in RESERVED_WORDS:
+            return number + unit
+        return number
+    elif kind in ("integer_part", "digits"):
+        return text.replace(",", "")
+    elif kind == "times":
+        return "*"
+    else:
+        return _ALIASES[text]
+
+
+def normalize_expression(expression: str) -> str:
+    """
+    Rewrite calculator input into Python expression syntax in a single scan
+
+    Operator aliases, thousands separators, duration literals and non-time unit
+    suffixes are all handled by one left-to-right pass over the input.
+    """
+    return _TOKEN_PATTERN.sub(_replace_token, expression)
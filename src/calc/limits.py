@@ -0,0 +1,337 @@
+import ast
+import math
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import Final, NamedTuple
+
+from .duration import TIMEDELTA_UNITS
+
+_INFINITY: Final = math.inf
+_LOG10_2: Final = math.log10(2)
+_LOG10_E: Final = math.log10(math.e)
+_SECONDS_PER_DAY: Final = 86_400
+# log10 of the seconds in one unit of each timedelta() argument
+_UNIT_LOG10_SECONDS: Final = {
+    name: math.log10(microseconds) - 6 for name, microseconds in TIMEDELTA_UNITS.items()
+}
+_CONSTANT_LOG10: Final = {"pi": math.log10(math.pi), "e": _LOG10_E}
+# Bounds are computed with floats, so only values beyond a limit by more than their
+# rounding error are rejected
+_SLACK: Final = 1e-6
+
+
+@dataclass(frozen=True, slots=True)
+class Limits:
+    """Budgets that every value of an expression, including intermediate ones, must meet"""
+
+    # Nonzero numbers must lie between 10**-max_digits and 10**(max_digits + 1) in absolute
+    # value, which bounds the digits a result is written with
+    max_digits: int = 4_000
+    # Time values must not be longer than this many days
+    max_days: int = timedelta.max.days
+
+
+_limits = Limits()
+
+
+def get_limits() -> Limits:
+    return _limits
+
+
+def set_limits(limits: Limits) -> None:
+    """Apply limits to expressions whose evaluation is planned from now on"""
+    global _limits
+    _limits = limits
+
+
+class _Estimate(NamedTuple):
+    """
+    What is known about a value before evaluating it
+
+    low <= log10(abs(value)) <= high, where a low of -inf allows 0 and a high of -inf
+    means the value is 0. sign is 1 or -1 when known and 0 otherwise. Time values are
+    measured in seconds.
+    """
+
+    low: float
+    high: float
+    sign: int = 0
+    time: bool = False
+
+
+_UNKNOWN: Final = _Estimate(-_INFINITY, _INFINITY)
+_ZERO: Final = _Estimate(-_INFINITY, -_INFINITY)
+
+
+def _low_sum(a: float, b: float) -> float:
+    return -_INFINITY if -_INFINITY in (a, b) else a + b
+
+
+def _high_sum(a: float, b: float) -> float:
+    # A factor of 0 makes the product 0, however large the other one may be
+    return -_INFINITY if -_INFINITY in (a, b) else a + b
+
+
+def _power_of_ten(exponent: float) -> float:
+    return _INFINITY if exponent > 308 else 10.0**exponent
+
+
+def _value_range(estimate: _Estimate) -> tuple[float, float]:
+    """Bounds of the value itself, from those of its magnitude and its sign"""
+    smallest = _power_of_ten(estimate.low)
+    largest = _power_of_ten(estimate.high)
+    if estimate.sign > 0:
+        return (smallest, largest)
+    elif estimate.sign < 0:
+        return (-largest, -smallest)
+    return (-largest, largest)
+
+
+def _add(left: _Estimate, right: _Estimate, subtract: bool = False) -> _Estimate:
+    right_sign = -right.sign if subtract else right.sign
+    high = max(left.high, right.high)
+    if high > -_INFINITY:
+        high += _LOG10_2
+    time = left.time or right.time
+    if right.high == -_INFINITY:
+        return left._replace(time=time)
+    if left.high == -_INFINITY:
+        return _Estimate(right.low, right.high, right_sign, time)
+    # Terms of the same sign cannot cancel
+    if left.sign and left.sign == right_sign:
+        return _Estimate(max(left.low, right.low), high, left.sign, time)
+    return _Estimate(-_INFINITY, high, 0, time)
+
+
+def _multiply(left: _Estimate, right: _Estimate) -> _Estimate:
+    return _Estimate(
+        _low_sum(left.low, right.low),
+        _high_sum(left.high, right.high),
+        left.sign * right.sign,
+        left.time or right.time,
+    )
+
+
+def _divide(left: _Estimate, right: _Estimate) -> _Estimate:
+    if right.high == -_INFINITY:
+        return _UNKNOWN
+    inverse = _Estimate(-right.high, -right.low, right.sign, False)
+    return _multiply(left, inverse)._replace(time=left.time and not right.time)
+
+
+def _power(base: _Estimate, exponent: _Estimate) -> _Estimate:
+    """log10(abs(base ** exponent)) is exponent * log10(abs(base)) for a nonzero base"""
+    if base.low == -_INFINITY:
+        return _UNKNOWN
+    exponent_range = _value_range(exponent)
+    products = [
+        log * value for log in (base.low, base.high) for value in exponent_range if value
+    ] or [0.0]
+    if any(math.isnan(product) for product in products):
+        return _UNKNOWN
+    if 0.0 in exponent_range or exponent_range[0] < 0 < exponent_range[1]:
+        products.append(0.0)
+    return _Estimate(min(products), max(products), 1 if base.sign > 0 else 0)
+
+
+def _exp(argument: _Estimate) -> _Estimate:
+    smallest, largest = _value_range(argument)
+    return _Estimate(smallest * _LOG10_E, largest * _LOG10_E, 1)
+
+
+def _round(argument: _Estimate) -> _Estimate:
+    """Rounding moves a value by less than 1"""
+    low = argument.low - _LOG10_2 if argument.low >= 1 else -_INFINITY
+    return _Estimate(low, max(argument.high, 0.0) + _LOG10_2, 0, argument.time)
+
+
+def _timedelta(arguments: list[_Estimate], keywords: dict[str | None, _Estimate]) -> _Estimate:
+    total = _ZERO
+    # Positional arguments are days, seconds, microseconds, ... in timedelta's order
+    components = [*zip(_UNIT_LOG10_SECONDS, arguments, strict=False), *keywords.items()]
+    for unit, component in components:
+        if unit not in _UNIT_LOG10_SECONDS:
+            return _UNKNOWN
+        scale = _UNIT_LOG10_SECONDS[unit]
+        total = _add(total, _multiply(component, _Estimate(scale, scale, 1)))
+    return total._replace(time=True)
+
+
+def _spread(arguments: list[_Estimate]) -> _Estimate:
+    """Bounds of a value no larger than the largest argument, like max or avg"""
+    if not arguments:
+        return _UNKNOWN
+    high = max(argument.high for argument in arguments)
+    return _Estimate(-_INFINITY, high, 0, any(argument.time for argument in arguments))
+
+
+def _sum(arguments: list[_Estimate]) -> _Estimate:
+    total = _ZERO
+    for argument in arguments:
+        total = _add(total, argument)
+    return total if arguments else _UNKNOWN
+
+
+_CALLS: Final[dict[str, Callable[[list[_Estimate]], _Estimate]]] = {
+    "sqrt": lambda arguments: _Estimate(arguments[0].low / 2, arguments[0].high / 2, 1),
+    "exp": lambda arguments: _exp(arguments[0]),
+    "sin": lambda arguments: _Estimate(-_INFINITY, 0.0),
+    "cos": lambda arguments: _Estimate(-_INFINITY, 0.0),
+    "abs": lambda arguments: arguments[0]._replace(sign=1),
+    "round": lambda arguments: _round(arguments[0]),
+    "roundeven": lambda arguments: _round(arguments[0]),
+    "floor": lambda arguments: _round(arguments[0]),
+    "ceil": lambda arguments: _round(arguments[0]),
+    "max": _spread,
+    "min": _spread,
+    "avg": _spread,
+    "sum": _sum,
+}
+
+
+def literal_source(node: ast.expr, source: str) -> str:
+    """Source text of a node on one line; AST offsets count UTF-8 bytes, not characters"""
+    if source.isascii():
+        return source[node.col_offset : node.end_col_offset]
+    return source.encode()[node.col_offset : node.end_col_offset].decode()
+
+
+def _constant(value: Decimal) -> _Estimate:
+    if not value:
+        return _ZERO
+    power = value.adjusted()
+    log = power + math.log10(float(abs(value).scaleb(-power)))
+    return _Estimate(log, log, 1 if value > 0 else -1)
+
+
+def _check(estimate: _Estimate, limits: Limits) -> _Estimate:
+    if estimate.time:
+        if estimate.low > math.log10(limits.max_days * _SECONDS_PER_DAY) + _SLACK:
+            raise ValueError(f"Time value too large: over the limit of {limits.max_days:,} days")
+    elif estimate.low >= limits.max_digits + 1 + _SLACK:
+        raise ValueError(
+            f"Number too large: at least 10^{math.floor(estimate.low + _SLACK):,}, "
+            f"over the limit of 10^{limits.max_digits:,}"
+        )
+    elif estimate.low > -_INFINITY and estimate.high < -limits.max_digits - _SLACK:
+        raise ValueError(
+            f"Number too small: below 10^-{-math.ceil(estimate.high):,}, "
+            f"under the limit of 10^-{limits.max_digits:,}"
+        )
+    return estimate
+
+
+def _operation(operator_type: type, left: _Estimate, right: _Estimate) -> _Estimate:
+    if operator_type in (ast.Add, ast.Sub):
+        return _add(left, right, operator_type is ast.Sub)
+    elif operator_type is ast.Mult:
+        return _multiply(left, right)
+    elif operator_type is ast.Div:
+        return _divide(left, right)
+    elif operator_type is ast.Pow:
+        return _power(left, right)
+    return _Estimate(-_INFINITY, min(left.high, right.high), 0, left.time)
+
+
+def _call(
+    name: str, arguments: list[_Estimate], keywords: dict[str | None, _Estimate]
+) -> _Estimate:
+    if name == "timedelta":
+        return _timedelta(arguments, keywords)
+    elif name in _CALLS and arguments and not keywords:
+        return _CALLS[name](arguments)
+    return _UNKNOWN
+
+
+def _estimate(node: ast.AST, source: str, limits: Limits) -> _Estimate:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        estimate = _constant(Decimal(literal_source(node, source)))
+    elif isinstance(node, ast.BinOp):
+        left = _estimate(node.left, source, limits)
+        right = _estimate(node.right, source, limits)
+        estimate = _operation(type(node.op), left, right)
+    elif isinstance(node, ast.UnaryOp):
+        operand = _estimate(node.operand, source, limits)
+        negate = isinstance(node.op, ast.USub)
+        estimate = operand._replace(sign=-operand.sign) if negate else operand
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        arguments = [_estimate(argument, source, limits) for argument in node.args]
+        keywords = {
+            keyword.arg: _estimate(keyword.value, source, limits) for keyword in node.keywords
+        }
+        estimate = _call(node.func.id, arguments, keywords)
+    elif isinstance(node, ast.Name) and node.id in _CONSTANT_LOG10:
+        log = _CONSTANT_LOG10[node.id]
+        estimate = _Estimate(log, log, 1)
+    else:
+        # Unsupported syntax is reported when the expression is planned
+        return _UNKNOWN
+    return _check(estimate, limits)
+
+
+def check_expression(node: ast.AST, source: str) -> None:
+    """
+    Reject an expression some value of which would exceed the limits, before evaluating it
+
+    Magnitudes are bounded from the constants up, so only values certain to exceed a limit
+    are rejected; names and functions whose results cannot be bounded are left to
+    check_result.
+    """
+    _estimate(node, source, _limits)
+
+
+class PostfixCheck:
+    """
+    check_expression for an expression parsed in postfix order rather than into a tree
+
+    Each step is passed in as it is parsed, before any constant operands are folded, and
+    raises ValueError like check_expression once a value would exceed the limits.
+    """
+
+    def __init__(self) -> None:
+        self._limits = _limits
+        # Estimates of the values on the stack of the postfix program
+        self._stack: list[_Estimate] = []
+
+    def push(self, value: Decimal | None) -> None:
+        """Push a number, or None for a name whose value is not known"""
+        self._stack.append(_UNKNOWN if value is None else _check(_constant(value), self._limits))
+
+    def negate(self) -> None:
+        operand = self._stack[-1]
+        self._stack[-1] = operand._replace(sign=-operand.sign)
+
+    def operation(self, operator_type: type) -> None:
+        right = self._stack.pop()
+        self._stack[-1] = _check(_operation(operator_type, self._stack[-1], right), self._limits)
+
+    def call(self, name: str, positional: int, keywords: Sequence[str]) -> None:
+        start = len(self._stack) - positional - len(keywords)
+        arguments = self._stack[start:]
+        del self._stack[start:]
+        named: dict[str | None, _Estimate] = dict(
+            zip(keywords, arguments[positional:], strict=True)
+        )
+        self._stack.append(_check(_call(name, arguments[:positional], named), self._limits))
+
+
+def check_result(result: Decimal | timedelta) -> None:
+    """Reject a result that exceeds the limits"""
+    limits = _limits
+    if isinstance(result, timedelta):
+        if abs(result) > timedelta(days=limits.max_days):
+            raise ValueError(f"Time value too large: over the limit of {limits.max_days:,} days")
+    elif result and result.is_finite():
+        power = result.adjusted()
+        if power > limits.max_digits:
+            raise ValueError(
+                f"Number too large: at least 10^{power:,}, over the limit of "
+                f"10^{limits.max_digits:,}"
+            )
+        if power < -limits.max_digits:
+            raise ValueError(
+                f"Number too small: below 10^-{-power - 1:,}, under the limit of "
+                f"10^-{limits.max_digits:,}"
+            )
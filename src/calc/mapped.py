@@ -0,0 +1,150 @@
+import mmap
+import os
+import re
+import stat
+from collections.abc import Generator
+from typing import Final, NamedTuple
+
+from .core import COMMANDS, BatchTask, _assignment, _is_valid_format, _remove_comments
+
+# Bytes of input per task; a task ends at the first line boundary past this size
+MAPPED_TASK_BYTES: Final = 1 << 16
+# What str.strip() removes around a line, in UTF-8: ASCII whitespace other than the line
+# feed, and the Unicode spaces
+_SPACE: Final = (
+    rb"(?:[\t\x0b\x0c\r\x1c-\x1f ]|\xc2[\x85\xa0]|\xe1\x9a\x80"
+    rb"|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)*"
+)
+# A line that batch mode runs as a command: one of COMMANDS, or format with an argument
+_COMMAND_LINE: Final = re.compile(
+    _SPACE + rb"(?:(?:" + "|".join(sorted(COMMANDS)).encode() + rb")" + _SPACE + rb"|format .*)"
+)
+# Every command line contains one of these, and every assignment an =; searching for them
+# is much faster than matching each line
+_COMMAND_WORDS: Final = (*(command.encode() for command in sorted(COMMANDS)), b"=")
+
+
+class MappedRange(NamedTuple):
+    """Lines of a mapped file evaluated as one batch task, with no command among them"""
+
+    path: str
+    start: int
+    end: int
+    # Number of the line at start
+    first_line: int
+    default_format: str
+
+
+def can_map(path: str) -> bool:
+    """Check that path is a regular file with something to map"""
+    try:
+        status = os.stat(path)
+    except OSError:
+        return False
+    return stat.S_ISREG(status.st_mode) and status.st_size > 0
+
+
+def _map(path: str) -> mmap.mmap:
+    # The map keeps its own descriptor, so the file can be closed right away
+    with open(path, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _line_end(data: mmap.mmap, position: int) -> int:
+    """Offset just past the line at position"""
+    end = data.find(b"\n", position)
+    return len(data) if end < 0 else end + 1
+
+
+def _is_command(data: mmap.mmap, start: int, end: int) -> bool:
+    """Check whether the line between start and end is a command or an assignment"""
+    if _COMMAND_LINE.fullmatch(data, start, end):
+        return True
+    line = data[start:end]
+    return b"=" in line and _assignment(line.decode("utf-8").strip()) is not None
+
+
+def _find_command(data: mmap.mmap, start: int, end: int) -> tuple[int, int] | None:
+    """
+    Find the first command or assignment line between the line boundaries start and end
+
+    Returns: (offset of the line, offset of its end before the line feed), or None
+    """
+    found: tuple[int, int] | None = None
+    for word in _COMMAND_WORDS:
+        position = data.find(word, start, end)
+        while position >= 0 and (found is None or position < found[0]):
+            line_start = max(data.rfind(b"\n", start, position) + 1, start)
+            line_end = data.find(b"\n", position, end)
+            if line_end < 0:
+                line_end = end
+            if _is_command(data, line_start, line_end):
+                found = (line_start, line_end)
+                break
+            position = data.find(word, line_end, end)
+    return found
+
+
+def mapped_segments(path: str) -> Generator[str | MappedRange, None, None]:
+    """
+    Split a file into commands, assignments and ranges of expression lines, like
+    _batch_segments
+
+    The file is memory-mapped and searched in place: only command lines and the bytes of
+    one range at a time are copied, to count their lines, and pages already split are
+    released, so memory use does not grow with the size of the file. A range only starts
+    at a line without ?, so ranges can be evaluated independently of each other.
+    """
+    with _map(path) as data:
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            data.madvise(mmap.MADV_SEQUENTIAL)
+        size = len(data)
+        current_format = "default"
+        position = 0
+        line_number = 1
+        released = 0
+        while position < size:
+            end = _line_end(data, min(position + MAPPED_TASK_BYTES, size - 1))
+            while end < size and data.find(b"?", end, _line_end(data, end)) >= 0:
+                end = _line_end(data, end)
+            command = _find_command(data, position, end)
+            stop = command[0] if command else end
+            if stop > position:
+                yield MappedRange(path, position, stop, line_number, current_format)
+                line_number += data[position:stop].count(b"\n")
+            if command:
+                expression = data[command[0] : command[1]].decode("utf-8").strip()
+                yield expression
+                if expression == "exit":
+                    return
+                name = expression.removeprefix("format ").strip()
+                if expression.startswith("format ") and _is_valid_format(name):
+                    current_format = name
+                stop = _line_end(data, command[1])
+                line_number += 1
+            position = stop
+            released = _release(data, released, position)
+
+
+def _release(data: mmap.mmap, released: int, position: int) -> int:
+    """Drop the pages before position from memory; return the offset released up to"""
+    aligned = position - position % mmap.PAGESIZE
+    if aligned > released and hasattr(mmap, "MADV_DONTNEED"):
+        data.madvise(mmap.MADV_DONTNEED, released, aligned - released)
+        return aligned
+    return released
+
+
+def read_range(segment: MappedRange) -> BatchTask:
+    """Decode the expression lines of a range, skipping blank and comment lines"""
+    with _map(segment.path) as data:
+        # A range is at most about MAPPED_TASK_BYTES, so it is decoded in one piece
+        text = data[segment.start : segment.end].decode("utf-8")
+    lines = text.split("\n")
+    if text.endswith("\n"):
+        lines.pop()
+    return [
+        (line_number, expression, segment.default_format)
+        for line_number, line in enumerate(lines, segment.first_line)
+        if _remove_comments(expression := line.strip())
+    ]
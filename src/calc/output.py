@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+import sys
+from datetime import timedelta
+from decimal import Decimal
+from typing import Final, NamedTuple, TextIO
+
+from .duration import Duration
+
+# Records are written out in chunks of this many
+WRITE_CHUNK_RECORDS: Final = 1024
+
+
+class Record(NamedTuple):
+    """Outcome of one input line, for machine-readable output"""
+
+    input: str
+    ok: bool
+    # Exact result without separators or rounding: a number, or seconds for a time value
+    value: str | None = None
+    # "number" or "time"
+    type: str | None = None
+    # The result as the text output shows it; left out of raw output
+    formatted: str | None = None
+    error: str | None = None
+
+
+def raw_value(result: Decimal | timedelta) -> str:
+    """Write a result exactly, as a plain number or as seconds for a time value"""
+    if isinstance(result, timedelta):
+        return f"{Duration.from_timedelta(result).seconds().normalize():f}"
+    return f"{result:f}"
+
+
+def value_type(result: Decimal | timedelta) -> str:
+    return "time" if isinstance(result, timedelta) else "number"
+
+
+def _csv_field(field: str | bool | None) -> str:
+    """Write a record field as a CSV cell, spelling booleans as JSON does"""
+    if isinstance(field, bool):
+        return "true" if field else "false"
+    return "" if field is None else field
+
+
+class RecordWriter:
+    """Write records as JSON Lines, CSV or raw values, buffered into large writes"""
+
+    def __init__(
+        self,
+        output: str,
+        stream: TextIO | None = None,
+        chunk_records: int = WRITE_CHUNK_RECORDS,
+    ) -> None:
+        self.output = output
+        self.stream = stream or sys.stdout
+        self.chunk_records = chunk_records
+        self._buffer = io.StringIO()
+        self._pending = 0
+        self._csv = csv.writer(self._buffer, lineterminator="\n")
+        if output == "csv":
+            self._csv.writerow(Record._fields)
+
+    def write(self, record: Record) -> None:
+        if self.output == "jsonl":
+            self._buffer.write(json.dumps(record._asdict(), ensure_ascii=False))
+            self._buffer.write("\n")
+        elif self.output == "csv":
+            self._csv.writerow(_csv_field(field) for field in record)
+        elif record.ok:
+            self._buffer.write(f"{record.value}\n")
+        else:
+            self._buffer.write(f"Error: {record.error}\n")
+        self._pending += 1
+        if self._pending >= self.chunk_records:
+            self.flush()
+
+    def flush(self) -> None:
+        self.stream.write(self._buffer.getvalue())
+        self.stream.flush()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._pending = 0
@@ -0,0 +1,160 @@
+import heapq
+import itertools
+import json
+import math
+import sys
+import time
+from array import array
+from types import TracebackType
+from typing import Any, Final, TextIO
+
+# Stages calc.core times at their call sites: preprocess is expression normalization,
+# parse covers compiling and planning a new expression. A line covers all of them, plus
+# comment, history and file reference handling.
+STAGES: Final = ("preprocess", "parse", "evaluate", "format")
+PERCENTILES: Final = (50, 95, 99)
+# Inputs in the report are cut to this many characters, since generated ones can be huge
+_MAX_INPUT_CHARS: Final = 80
+
+
+def _percentile(durations: list[int], percent: int) -> int:
+    """Nearest-rank percentile of sorted durations"""
+    return durations[max(math.ceil(len(durations) * percent / 100) - 1, 0)]
+
+
+def _shorten(expression: str) -> str:
+    if len(expression) <= _MAX_INPUT_CHARS:
+        return expression
+    return expression[: _MAX_INPUT_CHARS - 3] + "..."
+
+
+class _Timer:
+    """Times each block it is entered for, adding the nanoseconds to durations"""
+
+    def __init__(self, durations: "array[int]") -> None:
+        self.durations = durations
+        # Start times of the blocks entered and not yet left, innermost last
+        self._starts: list[int] = []
+
+    def __enter__(self) -> None:
+        self._starts.append(time.perf_counter_ns())
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.durations.append(time.perf_counter_ns() - self._starts.pop())
+
+
+class _LineTimer(_Timer):
+    """Times whole lines and keeps the slowest of them"""
+
+    def __init__(self, durations: "array[int]", slowest_lines: int) -> None:
+        super().__init__(durations)
+        self.slowest_lines = slowest_lines
+        # Min-heap of (nanoseconds, sequence number, input) for the slowest lines
+        self.slowest: list[tuple[int, int, str]] = []
+        self._expressions: list[str] = []
+        self._sequence = itertools.count()
+
+    def __call__(self, expression: str) -> "_LineTimer":
+        self._expressions.append(expression)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        elapsed = time.perf_counter_ns() - self._starts.pop()
+        self.durations.append(elapsed)
+        entry = (elapsed, next(self._sequence), self._expressions.pop())
+        if len(self.slowest) < self.slowest_lines:
+            heapq.heappush(self.slowest, entry)
+        elif self.slowest and elapsed > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+
+class Profiler:
+    """
+    Time every call of each stage while in use, then report the percentiles per stage
+
+    The code being profiled times its own stages with timer() and line(), and only does so
+    while a profiler is installed, so a run without one pays nothing. Lines whose results
+    come from a memo are not evaluated again and are not counted.
+    """
+
+    def __init__(
+        self, slowest_lines: int, json_path: str | None = None, stream: TextIO | None = None
+    ) -> None:
+        self.json_path = json_path
+        self.stream = stream or sys.stderr
+        self.durations: dict[str, array[int]] = {stage: array("q") for stage in STAGES}
+        self._timers = {stage: _Timer(durations) for stage, durations in self.durations.items()}
+        self.durations["line"] = array("q")
+        self.line = _LineTimer(self.durations["line"], slowest_lines)
+        self.wall_ns = 0
+        self._start = 0
+
+    def timer(self, stage: str) -> _Timer:
+        """Context manager timing a block as a call of stage, one of STAGES"""
+        return self._timers[stage]
+
+    def __enter__(self) -> "Profiler":
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.wall_ns = time.perf_counter_ns() - self._start
+        sys.stdout.flush()
+        self.stream.write(self.summary())
+        self.stream.flush()
+        if self.json_path is not None:
+            with open(self.json_path, "w", encoding="utf-8") as file:
+                json.dump(self.as_dict(), file, indent=2)
+                file.write("\n")
+
+    def stage_statistics(self) -> dict[str, dict[str, float]]:
+        """Calls, total seconds and percentile seconds of every stage"""
+        statistics: dict[str, dict[str, float]] = {}
+        for stage, recorded in self.durations.items():
+            durations = sorted(recorded)
+            entry: dict[str, float] = {"calls": len(durations), "total": sum(durations) / 1e9}
+            for percent in PERCENTILES:
+                entry[f"p{percent}"] = _percentile(durations, percent) / 1e9 if durations else 0.0
+            statistics[stage] = entry
+        return statistics
+
+    def slowest_inputs(self) -> list[tuple[float, str]]:
+        """(seconds, input) of the slowest lines, slowest first"""
+        slowest = sorted(self.line.slowest, reverse=True)
+        return [(ns / 1e9, expression) for ns, _, expression in slowest]
+
+    def as_dict(self) -> dict[str, Any]:
+        """The report as JSON data, with every time in seconds"""
+        return {
+            "wall": self.wall_ns / 1e9,
+            "stages": self.stage_statistics(),
+            "slowest_lines": [
+                {"seconds": seconds, "input": _shorten(expression)}
+                for seconds, expression in self.slowest_inputs()
+            ],
+        }
+
+    def summary(self) -> str:
+        """The report as a table for the terminal"""
+        columns = "".join(f"{f'p{percent} us':>12}" for percent in PERCENTILES)
+        rows = [
+            f"Profile: {self.wall_ns / 1e9:.3f} s wall time",
+            f"{'stage':<12}{'calls':>10}{'total ms':>12}{columns}",
+        ]
+        for stage, entry in self.stage_statistics().items():
+            percentiles = "".join(f"{entry[f'p{percent}'] * 1e6:>12.1f}" for percent in PERCENTILES)
+            rows.append(
+                f"{stage:<12}{entry['calls']:>10,.0f}{entry['total'] * 1e3:>12.3f}{percentiles}"
+            )
+        if self.line.slowest:
+            rows.append("Slowest lines:")
+            rows.extend(
+                f"{seconds * 1e3:>12.3f} ms  {_shorten(expression)}"
+                for seconds, expression in self.slowest_inputs()
+            )
+        return "\n".join(rows) + "\n"
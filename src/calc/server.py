@@ -0,0 +1,90 @@
+import contextlib
+import os
+import signal
+import socket
+import socketserver
+import sys
+
+from .client import END_OF_REPLY
+from .core import _process_command
+from .history import History
+from .variables import Variables
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    """Serve one client: every request line gets its output lines and an end-of-reply line"""
+
+    server: "CalcServer"
+
+    def handle(self) -> None:
+        history = History()
+        current_format = "default"
+        # Variables only outlive their line in a session
+        variables = Variables(self.server.numeric) if self.server.session else None
+        for raw in self.rfile:
+            expression = raw.decode("utf-8", errors="replace").strip()
+            if not self.server.session:
+                history, current_format = History(), "default"
+            output: list[str] = []
+            should_continue, current_format, success = _process_command(
+                expression,
+                history,
+                current_format,
+                self.server.numeric,
+                output.append,
+                variables,
+            )
+            output.append(f"{END_OF_REPLY}{0 if success else 1}")
+            self.wfile.write("".join(f"{text}\n" for text in output).encode("utf-8"))
+            if not should_continue:
+                break
+
+
+class CalcServer(socketserver.ThreadingUnixStreamServer):
+    """Unix-socket server keeping the evaluator and its caches warm across clients"""
+
+    daemon_threads = True
+
+    def __init__(self, path: str, session: bool, numeric: str) -> None:
+        self.session = session
+        self.numeric = numeric
+        # Only the owner may connect to the socket
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, _ConnectionHandler)
+        finally:
+            os.umask(umask)
+
+
+def serve(path: str, session: bool, numeric: str) -> int:
+    """
+    Serve calculations on a Unix socket until interrupted
+
+    Each client connection is handled in its own thread. With session, history (?) and
+    format carry over between the lines of a connection, like piped input; otherwise each
+    line is evaluated on its own, like `calc "expression"`.
+
+    Returns: exit status
+    """
+    with contextlib.suppress(OSError), socket.socket(socket.AF_UNIX) as probe:
+        probe.connect(path)
+        print(f"Error: a calc server is already listening on '{path}'", file=sys.stderr)
+        return 1
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+    try:
+        server = CalcServer(path, session, numeric)
+    except OSError as e:
+        print(f"Error: {e.strerror}: '{path}'", file=sys.stderr)
+        return 1
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"calc server listening on {path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+    return 0
@@ -0,0 +1,93 @@
+import functools
+import re
+from collections.abc import Iterator
+from datetime import timedelta
+from decimal import Decimal
+from typing import Final, TextIO
+
+from .cache import DEFAULT_CACHE_SIZE
+from .evaluator import aggregate, safe_eval
+from .lexer import normalize_expression
+
+# An aggregate whose only argument is a file reference: sum(@values.txt), or avg(@-) for stdin
+REFERENCE_PATTERN: Final = re.compile(r"\b(sum|avg|max|min)\(\s*@([^\s()]+)\s*\)")
+# Plain numbers, the common case, skip the lexer and the evaluator
+_PLAIN_NUMBER: Final = re.compile(r"-?\d+(?:,\d{3})*(?:\.\d+)?")
+# Characters read per line at most, so a file without line breaks is not read whole
+MAX_LINE_CHARS: Final = 4096
+
+
+# Values are immutable, and a stream of time values usually repeats a few of them
+@functools.lru_cache(maxsize=DEFAULT_CACHE_SIZE)
+def _parse_input(text: str) -> Decimal | timedelta:
+    return safe_eval(normalize_expression(text))
+
+
+def parse_value(text: str) -> Decimal | timedelta:
+    """Parse one streamed value like calculator input: a number or a time value"""
+    if _PLAIN_NUMBER.fullmatch(text):
+        return Decimal(text.replace(",", ""))
+    return _parse_input(text)
+
+
+def _values(stream: TextIO, source: str) -> Iterator[Decimal | timedelta]:
+    """
+    Yield the value on each line of stream, skipping blank lines and comments
+
+    Errors name the line but never quote it, so they do not disclose what the file holds.
+    """
+    line_number = 0
+    while line := stream.readline(MAX_LINE_CHARS + 1):
+        line_number += 1
+        if len(line) > MAX_LINE_CHARS and not line.endswith("\n"):
+            raise ValueError(f"Line too long in {source} line {line_number}")
+        text = line.split("#", 1)[0].strip()
+        if not text:
+            continue
+        try:
+            value = parse_value(text)
+        except Exception:
+            raise ValueError(f"Invalid value in {source} line {line_number}") from None
+        yield value
+
+
+def aggregate_reference(function_name: str, path: str, stdin: TextIO | None) -> Decimal | timedelta:
+    """Aggregate the values of the file at path, or of stdin for "-", as they are read"""
+    if path == "-":
+        if stdin is None:
+            raise ValueError("@- (standard input) is only available to a direct command")
+        return aggregate(function_name, _values(stdin, "stdin"))
+    try:
+        with open(path, encoding="utf-8") as stream:
+            return aggregate(function_name, _values(stream, f"'{path}'"))
+    except OSError as e:
+        raise ValueError(f"{e.strerror}: '{path}'") from None
+
+
+def substitute_references(
+    expression: str, stdin: TextIO | None
+) -> tuple[str, dict[str, Decimal | timedelta]]:
+    """
+    Aggregate every file reference in expression, replacing it with a name for its result
+
+    Returns: (expression with the names, value of each name)
+    """
+    names: dict[str, Decimal | timedelta] = {}
+    paths: list[str] = []
+
+    def replace(match: re.Match[str]) -> str:
+        function_name, path = match.groups()
+        if path == "-" and "-" in paths:
+            raise ValueError("@- (standard input) can only be read once")
+        paths.append(path)
+        name = f"_stream{len(names)}"
+        names[name] = aggregate_reference(function_name, path, stdin)
+        return name
+
+    expression = REFERENCE_PATTERN.sub(replace, expression)
+    if "@" in expression:
+        raise ValueError(
+            "A file reference must be the only argument of sum, avg, max or min, "
+            "like sum(@values.txt)"
+        )
+    return (expression, names)
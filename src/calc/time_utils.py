@@ -1,22 +1,36 @@
+import functools
 import re
-from collections.abc import Callable
 from datetime import timedelta
 from decimal import Decimal
 
-NUMBER = r"(\d+(?:\.\d+)?)"
-DAYS = NUMBER + r" *(?:d(?:ays?)?|日(?:間)?)"
-HOURS = NUMBER + r" *(?:h(?:ours?|rs?)?|時(?:間)?)"
-MINUTES = NUMBER + r" *(?:m(?:in(?:utes?)?)?|分(?:間)?)"
-SECONDS = NUMBER + r" *(?:s(?:ec(?:onds?)?)?|秒(?:間)?)"
-TIME = r"(\d+:\d+:\d+(?:\.\d{1,6})?)"
+NUMBER = r"\d+(?:\.\d+)?"
+CLOCK_HOURS = r"\d+"
+DAY_UNIT = r" *(?:d(?:ays?)?|日(?:間)?)"
+HOUR_UNIT = r" *(?:h(?:ours?|rs?)?|時(?:間)?)"
+MINUTE_UNIT = r" *(?:m(?:in(?:utes?)?)?|分(?:間)?)"
+SECOND_UNIT = r" *(?:s(?:ec(?:onds?)?)?|秒(?:間)?)"
 TIME_STRICT = r"(\d+):([0-5][0-9]):([0-5][0-9])(?:\.(\d{1,6}))?"
 SEPARATOR = r"(?:\s+and\s+|\s*と\s*|\s*)"
-DAYS_TIME = DAYS + SEPARATOR + TIME
+_TIME_STRICT_PATTERN = re.compile(TIME_STRICT)
+
+_UNIT_PATTERNS = {
+    "days": DAY_UNIT,
+    "hours": HOUR_UNIT,
+    "minutes": MINUTE_UNIT,
+    "seconds": SECOND_UNIT,
+}
+# Named groups of the unit combinations in duration_pattern, in pattern order: a
+# combination starting at the n-th unit names its groups "<unit><n>".
+_UNIT_GROUPS = [
+    (f"{unit}{start}", unit)
+    for start in range(len(_UNIT_PATTERNS))
+    for unit in list(_UNIT_PATTERNS)[start:]
+]
 
 
 def _parse_time(time_str: str, days_str: str | None = None) -> str:
     """Parse time string and return timedelta constructor string"""
-    time_match = re.match(TIME_STRICT, time_str)
+    time_match = _TIME_STRICT_PATTERN.match(time_str)
     if not time_match:
         raise ValueError(f"Invalid time format: {time_str} (use HH:MM:SS with MM,SS as 00-59)")
     parts = []
@@ -30,44 +44,77 @@ def _parse_time(time_str: str, days_str: str | None = None) -> str:
     return f"timedelta({', '.join(parts)})"
 
 
-def _timedelta_pattern(*units: str) -> tuple[str, Callable[[re.Match[str]], str]]:
-    """Build a conversion entry: unit patterns joined by SEPARATOR -> timedelta constructor"""
-    unit_regexes = {"days": DAYS, "hours": HOURS, "minutes": MINUTES, "seconds": SECONDS}
-    pattern = SEPARATOR.join(unit_regexes[unit] for unit in units)
-
-    def replace(m: re.Match[str]) -> str:
-        args = ", ".join(f"{unit}={m.group(i + 1)}" for i, unit in enumerate(units))
-        return f"timedelta({args})"
-
-    return pattern, replace
-
-
-_TIME_CONVERSION_PATTERNS = [
-    _timedelta_pattern("days", "hours", "minutes", "seconds"),
-    _timedelta_pattern("days", "hours", "minutes"),
-    _timedelta_pattern("days", "hours", "seconds"),
-    _timedelta_pattern("days", "minutes", "seconds"),
-    _timedelta_pattern("hours", "minutes", "seconds"),
-    _timedelta_pattern("days", "hours"),
-    _timedelta_pattern("days", "minutes"),
-    _timedelta_pattern("days", "seconds"),
-    _timedelta_pattern("hours", "minutes"),
-    _timedelta_pattern("hours", "seconds"),
-    _timedelta_pattern("minutes", "seconds"),
-    (DAYS_TIME, lambda m: _parse_time(m.group(2), m.group(1))),
-    _timedelta_pattern("days"),
-    _timedelta_pattern("hours"),
-    _timedelta_pattern("minutes"),
-    _timedelta_pattern("seconds"),
-    (TIME, lambda m: _parse_time(m.group(1))),
-]
+def duration_pattern(number: str = NUMBER, clock_hours: str = CLOCK_HOURS) -> str:
+    """
+    Build a pattern matching one duration literal in any supported form
+
+    Alternatives are ordered by precedence: days with a clock time, unit combinations,
+    then a bare clock time. Units always appear in descending order and each starts with a
+    different letter, so taking every optional unit greedily yields the longest combination.
+    """
+    unit_items = list(_UNIT_PATTERNS.items())
+    combinations = []
+    for start in range(len(unit_items)):
+        first, *rest = (
+            f"(?P<{unit}{start}>{number}){pattern}" for unit, pattern in unit_items[start:]
+        )
+        combinations.append(first + "".join(f"(?:{SEPARATOR}{unit})?" for unit in rest))
+
+    # The seconds (or the fraction) of a clock time belong to a unit form of higher
+    # precedence when one starts there: "1:00:00.5min" is "1:00:" followed by 0.5 minutes,
+    # not a clock time. Days with a clock time only yield to combinations of 2+ units.
+    any_unit = "|".join(_UNIT_PATTERNS.values())
+    two_units = "|".join(
+        f"{first}{SEPARATOR}{number}{second}"
+        for i, first in enumerate(_UNIT_PATTERNS.values())
+        for second in list(_UNIT_PATTERNS.values())[i + 1 :]
+    )
+
+    def clock(guard: str) -> str:
+        return clock_hours + rf":\d+:(?!{guard})\d+(?:\.(?!{guard})\d{{1,6}})?"
+
+    day_clock = clock(f"{number}(?:{two_units})")
+    bare_clock = clock(f"{number}(?:{any_unit})")
+
+    alternatives = "|".join(
+        [
+            f"(?P<clock_days>{number}){DAY_UNIT}{SEPARATOR}(?P<day_clock>{day_clock})",
+            *combinations,
+            f"(?P<clock>{bare_clock})",
+        ]
+    )
+    # Every form starts with a digit run, and one that fails at the start of a run also fails
+    # inside it, so only run starts are tried; this keeps long digit runs linear. The one
+    # exception is a run continuing past the six fraction digits a clock time can take.
+    return rf"(?:(?<!\d)|(?<=\.\d{{6}}))(?=\d)(?:{alternatives})"
+
+
+def duration_constructor(match: re.Match[str]) -> str:
+    """Return the timedelta constructor for a match of duration_pattern"""
+    clock = match.group("clock")
+    if clock is not None:
+        return _parse_time(clock.replace(",", ""))
+    day_clock = match.group("day_clock")
+    if day_clock is not None:
+        return _parse_time(day_clock.replace(",", ""), match.group("clock_days").replace(",", ""))
+    args = ", ".join(
+        f"{unit}={match.group(group).replace(',', '')}"
+        for group, unit in _UNIT_GROUPS
+        if match.group(group) is not None
+    )
+    return f"timedelta({args})"
+
+
+@functools.cache
+def _duration_regex() -> re.Pattern[str]:
+    # Compiled on first use: the lexer embeds its own copy of the pattern, so the CLI
+    # never pays for this one at startup
+    return re.compile(duration_pattern())
 
 
 def convert_time_expressions(expression: str) -> str:
     """Convert natural language time expressions to timedelta constructors"""
-    for pattern, replacement in _TIME_CONVERSION_PATTERNS:
-        expression = re.sub(pattern, replacement, expression)
-    return expression
+    return _duration_regex().sub(duration_constructor, expression)
 
 
 _UNIT_MICROSECONDS = {
@@ -0,0 +1,159 @@
+import heapq
+import keyword
+import re
+from collections import ChainMap
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import Final
+
+from .core import COMMANDS
+from .evaluator import RESERVED_WORDS, CompiledExpression, compile_expression, evaluate
+from .lexer import normalize_expression
+
+# A name in a preprocessed expression; keyword arguments such as timedelta(hours=1) and
+# the exponents of numbers such as 1e5 are not names
+NAME_PATTERN: Final = re.compile(r"(?<![\w.])[^\W\d]\w*(?!\w|\s*=)")
+
+
+@dataclass(slots=True)
+class _Definition:
+    compiled: CompiledExpression
+    # Variables the expression reads
+    dependencies: frozenset[str]
+    # Results of the file references in the expression, read once when it was defined
+    references: Mapping[str, Decimal | timedelta]
+    # Position among the definitions, which orders recomputations that do not depend on
+    # each other
+    sequence: int
+
+
+def check_name(name: str) -> None:
+    """Raise ValueError unless name can be a variable name"""
+    if name in RESERVED_WORDS or name in COMMANDS or keyword.iskeyword(name):
+        raise ValueError(f"'{name}' is reserved and cannot be a variable name")
+    # Names starting with _ hold the results of file references; names the preprocessor
+    # rewrites, like the multiplication sign x, could not be read back
+    if name.startswith("_") or normalize_expression(f"({name})") != f"({name})":
+        raise ValueError(f"'{name}' cannot be a variable name")
+
+
+class Variables:
+    """
+    Named values of a session, kept as exact values and recomputed incrementally
+
+    Every variable keeps its compiled definition and the variables it reads. Redefining
+    one re-evaluates only the variables that depend on it, directly or through others,
+    each once and after everything it reads; the rest of the session is left as it is.
+    Definitions are evaluated with the numeric backend, "decimal" or "float".
+    """
+
+    def __init__(self, numeric: str = "decimal") -> None:
+        self.numeric = numeric
+        self.values: dict[str, Decimal | timedelta] = {}
+        # Why a variable has no value: its definition failed when something it reads changed
+        self.errors: dict[str, Exception] = {}
+        self._definitions: dict[str, _Definition] = {}
+        self._dependents: dict[str, set[str]] = {}
+
+    def define(
+        self,
+        name: str,
+        expression: str,
+        references: Mapping[str, Decimal | timedelta] | None = None,
+    ) -> tuple[Decimal | timedelta, list[str]]:
+        """
+        Define name as a preprocessed expression and recompute the variables that read it
+
+        references holds the results of the file references in expression. A definition
+        that fails to evaluate, or that would make a variable depend on itself, raises
+        and leaves every variable unchanged.
+
+        Returns: (value of name, variables recomputed, in the order they were)
+        """
+        check_name(name)
+        compiled = compile_expression(expression)
+        references = references or {}
+        dependencies = frozenset(
+            found
+            for found in NAME_PATTERN.findall(compiled.source)
+            if found not in RESERVED_WORDS and found not in references
+        )
+        if name in dependencies or not dependencies.isdisjoint(self._downstream(name)):
+            raise ValueError(f"Circular definition: '{name}' would depend on itself")
+        previous = self._definitions.get(name)
+        sequence = previous.sequence if previous else len(self._definitions)
+        definition = _Definition(compiled, dependencies, references, sequence)
+        value = self._evaluate(definition)
+
+        if previous is not None:
+            for dependency in previous.dependencies:
+                self._dependents[dependency].discard(name)
+        for dependency in dependencies:
+            self._dependents.setdefault(dependency, set()).add(name)
+        self._definitions[name] = definition
+        self.values[name] = value
+        self.errors.pop(name, None)
+        return (value, self._recompute(name))
+
+    def referenced(self, expression: str) -> dict[str, Decimal | timedelta]:
+        """Values of the variables that expression may read"""
+        return {
+            found: self.values[found]
+            for found in NAME_PATTERN.findall(expression)
+            if found in self.values
+        }
+
+    def _evaluate(self, definition: _Definition) -> Decimal | timedelta:
+        for dependency in sorted(definition.dependencies):
+            if dependency in self.errors:
+                raise ValueError(f"'{dependency}' has no value")
+        names: Mapping[str, Decimal | timedelta] = self.values
+        if definition.references:
+            names = ChainMap(dict(definition.references), self.values)
+        if self.numeric == "float":
+            from .float_evaluator import evaluate_float
+
+            return evaluate_float(definition.compiled, names)
+        return evaluate(definition.compiled, names)
+
+    def _downstream(self, name: str) -> set[str]:
+        """Variables that read name, directly or through other variables"""
+        found: set[str] = set()
+        pending = [name]
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), ()):
+                if dependent not in found:
+                    found.add(dependent)
+                    pending.append(dependent)
+        return found
+
+    def _recompute(self, name: str) -> list[str]:
+        """Re-evaluate what depends on name in dependency order, each variable once"""
+        downstream = self._downstream(name)
+        waiting = {
+            dependent: len(self._definitions[dependent].dependencies & downstream)
+            for dependent in downstream
+        }
+        ready = [
+            (self._definitions[dependent].sequence, dependent)
+            for dependent, count in waiting.items()
+            if count == 0
+        ]
+        heapq.heapify(ready)
+        order: list[str] = []
+        while ready:
+            _, current = heapq.heappop(ready)
+            order.append(current)
+            try:
+                self.values[current] = self._evaluate(self._definitions[current])
+                self.errors.pop(current, None)
+            except Exception as e:
+                self.values.pop(current, None)
+                self.errors[current] = e
+            for dependent in self._dependents.get(current, ()):
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    heapq.heappush(ready, (self._definitions[dependent].sequence, dependent))
+        return order
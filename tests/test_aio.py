@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from calc.aio import AsyncCalculator
+from calc.core import calculate
+
+# Digits at which SLOW takes tens of seconds, far past every deadline below
+SLOW_PRECISION = 20_000
+SLOW = "exp(1.5)"
+
+
+def _slow_calculator(timeout: float | None) -> AsyncCalculator:
+    """One worker evaluating at SLOW_PRECISION digits"""
+    return AsyncCalculator(max_workers=1, timeout=timeout, precision=SLOW_PRECISION)
+
+
+def test_results_match_calculate() -> None:
+    """Test that results and errors have the same shape as those of calculate()"""
+    expressions = [("1,000 * 3", "0"), ("? + 1h", "2:00:00"), ("1/0", "42"), ("90min", "0")]
+
+    async def run() -> list[tuple[bool, str, str]]:
+        async with AsyncCalculator(max_workers=2) as calculator:
+            return await asyncio.gather(
+                *(calculator.calculate(expression, last) for expression, last in expressions)
+            )
+
+    assert asyncio.run(run()) == [calculate(expression, last) for expression, last in expressions]
+
+
+def test_timeout_stops_evaluation() -> None:
+    """Test that an expression past its deadline is stopped and its worker replaced"""
+
+    async def run() -> None:
+        async with AsyncCalculator(
+            max_workers=1, timeout=0.2, precision=SLOW_PRECISION
+        ) as calculator:
+            assert await calculator.calculate(SLOW, "7") == (
+                False,
+                "7",
+                "Timed out after 0.2 s",
+            )
+            assert not calculator._busy
+            assert await calculator.calculate("2 ^ 10", timeout=5) == (True, "1,024", "")
+            assert await calculator.calculate(SLOW, timeout=0.1) == (
+                False,
+                "0",
+                "Timed out after 0.1 s",
+            )
+            workers = list(calculator._idle)
+        assert not calculator._idle
+        assert all(not worker.process.is_alive() for worker in workers)
+
+    asyncio.run(run())
+
+
+def test_concurrency_limit() -> None:
+    """Test that calls beyond max_workers wait for a free worker"""
+
+    async def run() -> float:
+        async with AsyncCalculator(
+            max_workers=1, timeout=0.3, precision=SLOW_PRECISION
+        ) as calculator:
+            await calculator.calculate("1")
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                calculator.calculate(SLOW),
+                calculator.calculate(SLOW),
+            )
+            assert [result[2] for result in results] == ["Timed out after 0.3 s"] * 2
+            return time.perf_counter() - start
+
+    assert asyncio.run(run()) >= 0.6
+
+
+def test_cancelled_call_stops_worker() -> None:
+    """Test that cancelling a call kills the worker evaluating it"""
+
+    async def run() -> None:
+        async with AsyncCalculator(
+            max_workers=1, timeout=None, precision=SLOW_PRECISION
+        ) as calculator:
+            task = asyncio.ensure_future(calculator.calculate(SLOW))
+            while not calculator._busy:
+                await asyncio.sleep(0.01)
+            (worker,) = calculator._busy
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert not worker.process.is_alive()
+            assert await calculator.calculate("1 + 1") == (True, "2", "")
+
+    asyncio.run(run())
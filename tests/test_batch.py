@@ -0,0 +1,139 @@
+import io
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from calc.__main__ import _evaluate_task, main
+from calc.core import Result
+
+INPUT = "1+1\n# comment\n\n1/0\n? * 3\nformat min\n1h\nexit\n5\n"
+# Variables defined between other lines, redefined, and failing to define
+VARIABLES = (
+    "".join(f"{n} / 7\n" for n in range(6))
+    + "rate = 1.08\nprice = 20 # net\ntotal = price * rate\nprice * rate\n? * 2\n"
+    + "price = 30\ntotal\nbad = nope + 1\nrate = 1/0\n税率 = rate + 0.02\n"
+    + "".join(f"{n} * 税率\n? + total\n" for n in range(6))
+)
+
+
+def _run(monkeypatch: pytest.MonkeyPatch, argv: list[str], stdin: str = "") -> int | str | None:
+    monkeypatch.setattr(sys, "argv", ["calc", *argv])
+    monkeypatch.setattr(sys, "stdin", io.StringIO(stdin))
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    return excinfo.value.code
+
+
+def test_batch_matches_piped_mode(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that batch mode prints the same output and status as piped input"""
+    assert _run(monkeypatch, [], INPUT) == 1
+    piped = capsys.readouterr().out
+    assert _run(monkeypatch, ["--batch", "-"], INPUT) == 1
+    assert capsys.readouterr().out == piped == "= 2\nError: Division by zero\n= 6\n= 60 min\n"
+
+
+def test_batch_file(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that batch mode reads a file and exits with 0 when every line succeeds"""
+    path = tmp_path / "input.txt"
+    path.write_text("1,000 x 2\n1h + 30min as min\n1,000 x 2\n", encoding="utf-8")
+    assert _run(monkeypatch, ["--batch", str(path)]) == 0
+    assert capsys.readouterr().out == "= 2,000\n= 90 min\n= 2,000\n"
+
+
+def test_batch_missing_file(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that a missing batch file is reported on stderr"""
+    assert _run(monkeypatch, ["--batch", str(tmp_path / "missing.txt")]) == 1
+    assert "No such file or directory" in capsys.readouterr().err
+
+
+def test_batch_on_error_continue(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that continue reports failed lines on stderr and keeps going"""
+    assert _run(monkeypatch, ["--batch", "-", "--on-error", "continue"], INPUT) == 1
+    captured = capsys.readouterr()
+    assert captured.out == "= 2\n= 6\n= 60 min\n"
+    assert captured.err == "Error: line 4: Division by zero\n"
+
+
+def test_batch_on_error_abort(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that abort stops at the first failed line"""
+    assert _run(monkeypatch, ["--on-error", "abort", "--batch", "-"], INPUT) == 1
+    captured = capsys.readouterr()
+    assert captured.out == "= 2\n"
+    assert captured.err == "Error: line 4: Division by zero\n"
+
+
+def test_expression_starting_with_dashes(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that expressions starting with minus signs are not taken as options"""
+    assert _run(monkeypatch, ["-5+3"]) == 0
+    assert _run(monkeypatch, ["--5"]) == 0
+    assert capsys.readouterr().out == "= -2\n= 5\n"
+
+
+def test_batch_workers_match_piped_mode(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that parallel batch mode keeps input order, history and formats"""
+    monkeypatch.setattr("calc.__main__.BATCH_TASK_LINES", 1)
+    lines = INPUT + "".join(f"{n} x 2\n? + 1\n1/0\n? as sec\nformat\n" for n in range(20))
+    stdin = lines.replace("exit\n", "")
+    assert _run(monkeypatch, [], stdin) == 1
+    piped = capsys.readouterr().out
+    assert _run(monkeypatch, ["--batch", "-", "--workers", "2"], stdin) == 1
+    assert capsys.readouterr().out == piped
+
+
+def test_parallel_history_references(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that ?N and ?-N reach results of earlier tasks in parallel batch mode"""
+    monkeypatch.setattr("calc.__main__.BATCH_TASK_LINES", 2)
+    stdin = "".join(f"{n}\n? * 2\n?-2 + ?1\n1/0\n?{n + 1}\n" for n in range(1, 12))
+    assert _run(monkeypatch, [], stdin) == 1
+    piped = capsys.readouterr().out
+    assert _run(monkeypatch, ["--batch", "-", "--workers", "2"], stdin) == 1
+    assert capsys.readouterr().out == piped
+
+
+@pytest.mark.parametrize("workers", [[], ["--workers", "2"]])
+def test_batch_variables_match_piped_mode(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], workers: list[str]
+) -> None:
+    """Test that batch mode defines and reads variables in input order, like piped input"""
+    monkeypatch.setattr("calc.__main__.BATCH_TASK_LINES", 2)
+    assert _run(monkeypatch, [], VARIABLES) == 1
+    piped = capsys.readouterr().out
+    assert "total = 32.40\n= 32.40\nError: Unsupported name: nope\n" in piped
+    assert _run(monkeypatch, ["--batch", "-", *workers], VARIABLES) == 1
+    assert capsys.readouterr().out == piped
+
+
+def test_evaluate_task_leaves_leading_history_lines() -> None:
+    """Test that lines before the first successful line without ? are left to the caller"""
+    task = [(1, "? + 1", "default"), (2, "1/0", "default"), (3, "2", "default")]
+    assert _evaluate_task([*task, (4, "? * 3", "default")]) == (
+        2,
+        [Result(True, Decimal(2), "2"), Result(True, Decimal(6), "6")],
+    )
+    assert _evaluate_task(task[:2]) == (2, [])
+
+
+def test_invalid_worker_count(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that a negative worker count is rejected"""
+    assert _run(monkeypatch, ["--batch", "-", "--workers", "-1"]) == 2
+    assert "must be non-negative" in capsys.readouterr().err
@@ -0,0 +1,81 @@
+from decimal import Decimal
+
+import pytest
+
+from calc import core
+from calc.cache import CacheEntry, ExpressionCache, canonical_key
+from calc.core import calculate, expression_cache
+from calc.evaluator import compile_expression
+
+LAST_RESULT = "0"
+
+
+def test_canonical_key() -> None:
+    """Test that spelling variants of the same expression share a key"""
+    assert canonical_key("1000 * 2") == "1000*2"
+    assert canonical_key("  1000*2 ") == "1000*2"
+    assert canonical_key("max( 1 , 2 )") == "max(1,2)"
+    assert canonical_key("timedelta(hours=1) + 2") == "timedelta(hours=1)+2"
+
+    # Whitespace that separates tokens is kept
+    assert canonical_key("2 * * 3") != canonical_key("2 ** 3")
+    assert canonical_key("1 / / 2") != canonical_key("1 // 2")
+    assert canonical_key("1e - 3") != canonical_key("1e-3")
+    assert canonical_key("1 2") == "1 2"
+
+
+def test_aliases_share_cache_entry() -> None:
+    """Test that operator aliases and thousands separators hit the same cache entry"""
+    expression_cache.clear()
+    assert calculate("1,000 x 2", LAST_RESULT) == (True, "2,000", "")
+    assert calculate("1000*2", LAST_RESULT) == (True, "2,000", "")
+    assert calculate("1000 × 2", LAST_RESULT) == (True, "2,000", "")
+    info = expression_cache.info()
+    assert info.misses == 1 and info.hits == 2 and info.currsize == 1
+
+
+def test_history_result_not_stored() -> None:
+    """Test that results of expressions using ? are not cached"""
+    expression_cache.clear()
+    assert calculate("? + 1", "1") == (True, "2", "")
+    assert calculate("2 + 1", LAST_RESULT) == (True, "3", "")
+    assert calculate("? + 1", "2") == (True, "3", "")
+
+
+def test_lru_eviction() -> None:
+    """Test that the least recently used entry is evicted once the limit is reached"""
+    cache = ExpressionCache(maxsize=2)
+    for key in ("1", "2"):
+        cache.put(key, CacheEntry(compile_expression(key)))
+    assert cache.get("1") is not None
+    cache.put("3", CacheEntry(compile_expression("3")))
+    assert cache.get("2") is None
+    assert cache.get("1") is not None and cache.get("3") is not None
+    info = cache.info()
+    assert (info.hits, info.misses, info.evictions, info.maxsize, info.currsize) == (3, 1, 1, 2, 2)
+
+
+def test_cached_result() -> None:
+    """Test that a stored result is returned on later lookups"""
+    cache = ExpressionCache()
+    cache.put("1+1", CacheEntry(compile_expression("1+1"), Decimal(2)))
+    entry = cache.get("1+1")
+    assert entry is not None and entry.result == Decimal(2)
+
+
+def test_disabled_and_invalid_size() -> None:
+    """Test that a zero-size cache stores nothing and a negative size is rejected"""
+    cache = ExpressionCache(maxsize=0)
+    cache.put("1", CacheEntry(compile_expression("1")))
+    assert cache.get("1") is None and cache.info().currsize == 0
+    with pytest.raises(ValueError, match="non-negative"):
+        ExpressionCache(maxsize=-1)
+
+
+def test_replaced_module_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that replacing the module's cache, as the benchmarks do, takes effect"""
+    monkeypatch.setattr(core, "expression_cache", ExpressionCache(maxsize=0))
+    expression_cache.clear()
+    assert calculate("6 * 7", LAST_RESULT) == (True, "42", "")
+    assert core.expression_cache.info().misses == 1
+    assert expression_cache.info().currsize == 0
@@ -0,0 +1,92 @@
+import subprocess
+import sys
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+from calc.calculator import Calculator, Result
+
+
+def test_evaluate() -> None:
+    """Test that results carry the exact value next to the displayed text"""
+    calculator = Calculator()
+    assert calculator.evaluate("1,000 * 3 / 4") == Result(True, Decimal(750), "750")
+    assert calculator.evaluate("1h + 30min as min") == Result(
+        True, timedelta(hours=1, minutes=30), "90 min"
+    )
+    assert calculator.evaluate("# comment") == Result(True)
+    assert calculator.evaluate("1/0") == Result(False, error="Division by zero")
+    assert calculator.last_result == timedelta(hours=1, minutes=30)
+
+
+def test_history_keeps_exact_value() -> None:
+    """Test that ? refers to the previous result itself, not to its display text"""
+    calculator = Calculator()
+    assert calculator.evaluate("?").value == 0
+    results = calculator.evaluate_many(["1 / 3", "? * 3", "2 - ?", "-?", "1h", "? * 2"])
+    assert [result.formatted for result in results] == [
+        "0.3333333333333333333333333333",
+        "1",
+        "1",
+        "-1",
+        "01:00:00",
+        "02:00:00",
+    ]
+    assert results[1].value == Decimal("0.9999999999999999999999999999")
+    assert Calculator().evaluate_many(["1/0", "?"])[1].value == 0
+
+
+def test_options() -> None:
+    """Test the format, backend and precision of an instance"""
+    calculator = Calculator(default_format="en", precision=5)
+    assert calculator.evaluate("90min").formatted == "1h 30m"
+    assert calculator.evaluate("1 / 7").value == Decimal("0.14286")
+    assert calculator.evaluate("1 / 7 as s").error.startswith("'s' format only applies")
+    assert Calculator(numeric="float").evaluate("0.1 + 0.2").formatted == "0.3"
+    with pytest.raises(ValueError, match="Unknown format"):
+        Calculator(default_format="bogus")
+    with pytest.raises(ValueError, match="numeric backend"):
+        Calculator(numeric="binary")
+    with pytest.raises(ValueError, match="Precision"):
+        Calculator(precision=0)
+
+
+def test_instance_cache() -> None:
+    """Test that each instance caches its own plans, one for every use of ?"""
+    calculator = Calculator()
+    calculator.evaluate_many(["1 + 2", "1+2", "? * 2", "? * 2", "? * 2"])
+    info = calculator.cache.info()
+    assert (info.hits, info.misses, info.currsize) == (3, 2, 2)
+    assert Calculator().cache.info().currsize == 0
+
+
+def test_instance_per_thread() -> None:
+    """Test that instances in different threads keep their history and precision apart"""
+    results: dict[int, list[Result]] = {}
+
+    def run(digits: int) -> None:
+        calculator = Calculator(precision=digits)
+        results[digits] = calculator.evaluate_many(["2 / 3", *["? + 1"] * 200])
+
+    threads = [threading.Thread(target=run, args=(digits,)) for digits in (5, 10, 20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results[5][-1].value == Decimal("200.67")
+    assert results[10][-1].value == Decimal("200.6666667")
+    assert results[20][-1].value == Decimal("200.66666666666666667")
+
+
+def test_import_leaves_out_interactive_modules() -> None:
+    """Test that the library API loads neither prompt_toolkit nor argparse"""
+    statement = (
+        "import sys, calc.calculator; "
+        "print(sorted({'prompt_toolkit', 'argparse'} & set(sys.modules)))"
+    )
+    result = subprocess.run(  # noqa: S603 (runs this interpreter)
+        [sys.executable, "-c", statement], capture_output=True, text=True, check=True
+    )
+    assert result.stdout == "[]\n"
@@ -0,0 +1,144 @@
+import io
+import math
+import sys
+from pathlib import Path
+
+import pytest
+
+from calc.__main__ import main
+from calc.columns import compile_columns, evaluate_float_block
+
+CSV = 'price,fee\n100,5\n"1,200",0\n2.5,0.25\n'
+
+
+def _run(monkeypatch: pytest.MonkeyPatch, argv: list[str], stdin: str = "") -> int | str | None:
+    monkeypatch.setattr(sys, "argv", ["calc", *argv])
+    monkeypatch.setattr(sys, "stdin", io.StringIO(stdin))
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    return excinfo.value.code
+
+
+def test_compile_columns() -> None:
+    """Test that only the columns an expression reads are collected, in order of use"""
+    expression = compile_columns("fee + price * 1.08 + fee", ["id", "price", "fee"])
+    assert expression.columns == ("fee", "price") and expression.indices == (2, 1)
+    assert expression.vectorizable
+    assert not compile_columns("round(price, fee)", ["price", "fee"]).vectorizable
+    assert not compile_columns("timedelta(hours=price)", ["price"]).vectorizable
+
+
+def test_compile_columns_rejects_outside_whitelist() -> None:
+    """Test that unknown columns and unsupported syntax are rejected before any row is read"""
+    with pytest.raises(ValueError, match="Unknown column: 'tax'"):
+        compile_columns("price + tax", ["price"])
+    with pytest.raises(TypeError, match="Unsupported function: open"):
+        compile_columns("open(price)", ["price"])
+    with pytest.raises(TypeError, match="Unsupported operator: FloorDiv"):
+        compile_columns("price // 2", ["price"])
+    for terms in (1_500, 5_000):
+        with pytest.raises(ValueError, match="nested too deeply"):
+            compile_columns(" + ".join(["price"] * terms), ["price"])
+
+
+def test_columns_decimal(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that the result is appended as a new column, computed exactly by default"""
+    assert _run(monkeypatch, ["--columns", "-", "price x 1.08 + fee"], CSV) == 0
+    assert capsys.readouterr().out == (
+        'price,fee,result\n100,5,113.00\n"1,200",0,1296.00\n2.5,0.25,2.950\n'
+    )
+
+
+def test_columns_float(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+    """Test that the float backend evaluates whole columns with NumPy"""
+    pytest.importorskip("numpy")
+    argv = ["--columns", "-", "--numeric", "float", "--output-column", "total"]
+    assert _run(monkeypatch, [*argv, "price * 1.08 + fee"], CSV) == 0
+    assert capsys.readouterr().out == (
+        'price,fee,total\n100,5,113.0\n"1,200",0,1296.0\n2.5,0.25,2.95\n'
+    )
+
+
+def test_evaluate_float_block() -> None:
+    """Test NumPy evaluation of functions, and that odd cells fall back to Decimal"""
+    pytest.importorskip("numpy")
+    expression = compile_columns("round(a, 1) + max(a, b) - a % b + sqrt(4)", ["a", "b"])
+    values = evaluate_float_block(expression, [["-7.25", "2"], ["1", "0"]])
+    assert values is not None
+    assert values[0] == -2.05 and math.isnan(values[1])
+    assert evaluate_float_block(expression, [["1", "x"]]) is None
+    assert evaluate_float_block(expression, [["1"]]) is None
+
+
+def test_columns_row_errors(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that a failed row gets an error cell and the exit status is 1"""
+    stdin = "a,b\n1,2\n3,0\n4,x\n5\n"
+    assert _run(monkeypatch, ["--columns", "-", "--numeric", "float", "a / b"], stdin) == 1
+    assert capsys.readouterr().out == (
+        "a,b,result\n1,2,0.5\n3,0,Error: Division by zero\n"
+        "4,x,Error: Invalid number in column 'b': 'x'\n5,Error: Missing value in column 'b'\n"
+    )
+
+
+@pytest.mark.parametrize("numeric", ["decimal", "float"])
+def test_columns_reject_non_finite_cells(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], numeric: str
+) -> None:
+    """Test that NaN and Infinity cells are invalid numbers rather than results"""
+    if numeric == "float":
+        pytest.importorskip("numpy")
+    stdin = "a,b\n1,2\nnan,1\n1,-Infinity\nsNaN,1\ninf,1\n"
+    assert _run(monkeypatch, ["--columns", "-", "--numeric", numeric, "a + b"], stdin) == 1
+    assert capsys.readouterr().out == (
+        "a,b,result\n1,2,3\nnan,1,Error: Invalid number in column 'a': 'nan'\n"
+        "1,-Infinity,Error: Invalid number in column 'b': '-Infinity'\n"
+        "sNaN,1,Error: Invalid number in column 'a': 'sNaN'\n"
+        "inf,1,Error: Invalid number in column 'a': 'inf'\n"
+    )
+
+
+def test_columns_float_errors(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that results that are not finite are errors, formatted like Decimal cells"""
+    pytest.importorskip("numpy")
+    stdin = "a,b\n1e20,1\n1,0\n1e300,1e-300\n411.5,1\n"
+    assert _run(monkeypatch, ["--columns", "-", "--numeric", "float", "a * 1.08 / b"], stdin) == 1
+    assert capsys.readouterr().out == (
+        "a,b,result\n1e20,1,108000000000000000000\n1,0,Error: Division by zero\n"
+        "1e300,1e-300,Error: Number too large\n411.5,1,444.42\n"
+    )
+
+
+def test_columns_non_ascii_header(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that literals after a column named in multi-byte characters are read whole"""
+    stdin = "a,税率\n1,2\n"
+    assert _run(monkeypatch, ["--columns", "-", "税率 + 10 + 20000"], stdin) == 0
+    assert _run(monkeypatch, ["--columns", "-", "a + 税率 + 7 + 123456"], stdin) == 0
+    assert capsys.readouterr().out == "a,税率,result\n1,2,20012\na,税率,result\n1,2,123466\n"
+
+
+def test_columns_tsv_in_blocks(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that a TSV file is streamed in blocks with tab-separated output"""
+    monkeypatch.setattr("calc.columns.COLUMN_BLOCK_ROWS", 2)
+    path = tmp_path / "data.tsv"
+    path.write_text("n\n" + "".join(f"{n}\n" for n in range(5)), encoding="utf-8")
+    assert _run(monkeypatch, ["--columns", str(path), "n * 2"]) == 0
+    assert capsys.readouterr().out == "n\tresult\n0\t0\n1\t2\n2\t4\n3\t6\n4\t8\n"
+
+
+def test_columns_invalid_expression(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that an invalid expression is reported on stderr without output"""
+    assert _run(monkeypatch, ["--columns", "-", "price +"], CSV) == 1
+    captured = capsys.readouterr()
+    assert captured.out == "" and captured.err == "Error: Invalid syntax\n"
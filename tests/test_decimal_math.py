@@ -0,0 +1,121 @@
+import math
+import sys
+from decimal import Decimal, DefaultContext, getcontext, localcontext
+
+import pytest
+
+from calc import decimal_math
+from calc.__main__ import main
+from calc.core import calculate
+from calc.evaluator import compile_expression, evaluate
+
+LAST_RESULT = "0"
+PI_60 = "3.14159265358979323846264338327950288419716939937510582097494"
+ARGUMENTS = ["0", "0.5", "-0.75", "1", "2.5", "-3", "10", "355", "1e-20", "123456.789", "1e100"]
+
+
+@pytest.fixture
+def restore_precision(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Undo precision changes made by main()"""
+    monkeypatch.setattr(DefaultContext, "prec", DefaultContext.prec)
+    monkeypatch.setattr(getcontext(), "prec", getcontext().prec)
+
+
+def _at_precision(digits: int, function: str, x: Decimal) -> Decimal:
+    with localcontext() as context:
+        context.prec = digits
+        result: Decimal = getattr(decimal_math, function)(x)
+        return result
+
+
+@pytest.mark.parametrize("function", ["sin", "cos", "tan"])
+@pytest.mark.parametrize("digits", [5, 28, 60])
+def test_trig_rounds_to_precision(function: str, digits: int) -> None:
+    """Test that trig results are the rounded results of a much higher precision"""
+    for text in ARGUMENTS:
+        x = Decimal(text)
+        with localcontext() as context:
+            context.prec = digits
+            expected = +_at_precision(digits + 40, function, x)
+        assert _at_precision(digits, function, x) == expected, text
+        if digits >= 16 and abs(x) < 1000:
+            assert float(expected) == pytest.approx(getattr(math, function)(float(x)), rel=1e-12)
+
+
+@pytest.mark.parametrize("digits", [5, 28, 60])
+def test_exp_and_log_round_to_precision(digits: int) -> None:
+    """Test that exp and log agree with the decimal module's correctly rounded results"""
+    with localcontext() as context:
+        context.prec = digits
+        for text in ARGUMENTS:
+            x = Decimal(text)
+            if x < 1000:
+                assert decimal_math.exp(x) == x.exp(), text
+            if x > 0:
+                assert decimal_math.log(x) == x.ln(), text
+        assert decimal_math.log(Decimal("0.9999999999")) == Decimal("0.9999999999").ln()
+        assert decimal_math.log(Decimal(1024), Decimal(2)) == 10
+
+
+def test_constants_follow_precision() -> None:
+    """Test that pi and e are computed to the context precision"""
+    with localcontext() as context:
+        context.prec = 60
+        assert str(decimal_math.pi()) == PI_60
+        assert decimal_math.e() == Decimal(1).exp()
+    assert str(decimal_math.pi()) == PI_60[:29]
+
+
+def test_math_errors() -> None:
+    """Test domain and range errors of the math functions"""
+    for expression in ["sqrt(-1)", "log(0)", "log(-1)", "log(2, -2)"]:
+        assert calculate(expression, LAST_RESULT) == (False, LAST_RESULT, "math domain error")
+    assert calculate("log(2, 1)", LAST_RESULT) == (False, LAST_RESULT, "Division by zero")
+    assert calculate("exp(1e9)", LAST_RESULT)[2].startswith("Number too large: at least 10^")
+    assert calculate("sin(10 ^ 2000)", LAST_RESULT) == (False, LAST_RESULT, "Number too large")
+    assert calculate("exp(-1e9)", LAST_RESULT)[2].startswith("Number too small: below 10^-")
+    # sin() is not bounded in advance, so the result itself is checked
+    assert calculate("exp(-100000 * sin(1))", LAST_RESULT)[2].startswith("Number too small")
+    assert calculate("sin(x=1)", LAST_RESULT) == (
+        False,
+        LAST_RESULT,
+        "sin() takes no keyword arguments",
+    )
+
+
+def test_math_functions_beyond_float() -> None:
+    """Test results that binary floats cannot represent"""
+    assert calculate("sqrt(2)", LAST_RESULT) == (True, "1.414213562373095048801688724", "")
+    assert calculate("exp(1000)", LAST_RESULT)[1].startswith("197,007,111,401,704,699,388,887,935")
+    assert calculate("log(10 ^ 400)", LAST_RESULT) == (True, "921.0340371976182736071965819", "")
+    assert calculate("cos(pi) + tan(pi / 4)", LAST_RESULT) == (True, "0", "")
+
+
+def test_plan_follows_precision() -> None:
+    """Test that constants folded into a plan are refolded at another precision"""
+    compiled = compile_expression("pi + sqrt(2) * 0")
+    assert str(evaluate(compiled)) == PI_60[:29]
+    with localcontext() as context:
+        context.prec = 60
+        assert str(evaluate(compiled)) == PI_60
+        assert calculate("pi", LAST_RESULT)[1] == PI_60
+    assert calculate("pi", LAST_RESULT)[1] == PI_60[:29]
+
+
+def test_precision_option(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], restore_precision: None
+) -> None:
+    """Test that --precision sets the digits of results, math functions and constants"""
+    monkeypatch.setattr(sys, "argv", ["calc", "--precision", "60", "pi"])
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    assert excinfo.value.code == 0
+    assert capsys.readouterr().out == f"= {PI_60}\n"
+    monkeypatch.setattr(sys, "argv", ["calc", "--precision", "5", "1 / 3"])
+    with pytest.raises(SystemExit):
+        main()
+    assert capsys.readouterr().out == "= 0.33333\n"
+    monkeypatch.setattr(sys, "argv", ["calc", "--precision", "0", "1"])
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    assert excinfo.value.code == 2
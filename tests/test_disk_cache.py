@@ -0,0 +1,144 @@
+import io
+import multiprocessing
+import os
+import sqlite3
+import sys
+from decimal import localcontext
+from pathlib import Path
+
+import pytest
+
+import calc.disk_cache
+from calc.__main__ import main
+from calc.core import Result
+from calc.disk_cache import DATABASE_NAME, ResultCache, calculate_cached, result_key
+
+
+def _run(monkeypatch: pytest.MonkeyPatch, argv: list[str]) -> int | str | None:
+    monkeypatch.setattr(sys, "argv", ["calc", *argv])
+    monkeypatch.setattr(sys, "stdin", io.StringIO(""))
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    return excinfo.value.code
+
+
+def _fail(*args: object, **kwargs: object) -> Result:
+    raise AssertionError("calculated instead of read from the cache")
+
+
+def test_result_is_reused(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that a later run prints the stored result without calculating it"""
+    assert _run(monkeypatch, ["--cache-dir", str(tmp_path), "1h + 30min", "as", "min"]) == 0
+    monkeypatch.setattr(calc.disk_cache, "_calculate", _fail)
+    assert _run(monkeypatch, ["--cache-dir", str(tmp_path), "1h+30min as min"]) == 0
+    assert capsys.readouterr().out == "= 90 min\n= 90 min\n"
+
+
+def test_cache_dir_from_environment(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that $CALC_CACHE_DIR enables the cache for a plain one-shot run"""
+    monkeypatch.setenv("CALC_CACHE_DIR", str(tmp_path))
+    assert _run(monkeypatch, ["2", "x", "3"]) == 0
+    assert capsys.readouterr().out == "= 6\n"
+    assert (tmp_path / DATABASE_NAME).exists()
+
+
+def test_key_covers_settings() -> None:
+    """Test that keys differ with the directive, format, backend and precision"""
+    keys = {
+        result_key("1/3"),
+        result_key("1/3 as min"),
+        result_key("1/3", default_format="hour"),
+        result_key("1/3", numeric="float"),
+    }
+    with localcontext() as context:
+        context.prec = 50
+        keys.add(result_key("1/3"))
+    assert len(keys) == 5
+    assert result_key("1 / 3 # third") == result_key("1/3")
+
+
+@pytest.mark.parametrize("expression", ["? + 1", "sum(@-)", "# only a comment"])
+def test_uncacheable_lines(expression: str) -> None:
+    """Test that lines depending on more than their text have no key"""
+    assert result_key(expression) is None
+
+
+def test_failures_are_not_stored(tmp_path: Path) -> None:
+    """Test that a failed line is calculated again every time"""
+    assert calculate_cached("1/0", str(tmp_path)) == Result(False, error="Division by zero")
+    cache = ResultCache(str(tmp_path))
+    assert cache.get(result_key("1/0") or "") is None
+    cache.close()
+
+
+def test_fingerprint_change_invalidates(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test that results of another calc version are dropped instead of returned"""
+    assert calculate_cached("2^10", str(tmp_path)).formatted == "1,024"
+    monkeypatch.setattr(calc.disk_cache, "fingerprint", lambda: "another version")
+    cache = ResultCache(str(tmp_path))
+    assert cache.get(result_key("2^10") or "") is None
+    count = cache._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    cache.close()
+    assert count == 0
+
+
+def test_size_eviction(tmp_path: Path) -> None:
+    """Test that the least recently used results are dropped over the size limit"""
+    cache = ResultCache(str(tmp_path), max_bytes=64 << 10)
+    for i in range(2000):
+        cache.put(f"{i}\0key", "x" * 100)
+    assert cache.size() <= 64 << 10
+    assert cache.get("0\0key") is None
+    assert cache.get("1999\0key") == "x" * 100
+    cache.close()
+
+
+def test_unusable_directory(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that a cache that cannot be opened is reported and skipped"""
+    blocker = tmp_path / "file"
+    blocker.write_text("", encoding="utf-8")
+    assert _run(monkeypatch, ["--cache-dir", str(blocker / "cache"), "1+1"]) == 0
+    captured = capsys.readouterr()
+    assert captured.out == "= 2\n"
+    assert captured.err.startswith("Warning: result cache disabled:")
+
+
+def test_cache_dir_needs_expression(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that --cache-dir is rejected in modes it does not apply to"""
+    assert _run(monkeypatch, ["--cache-dir", str(tmp_path), "--batch", "-"]) == 2
+    assert "--cache-dir only applies" in capsys.readouterr().err
+
+
+def _calculate_many(directory: str) -> list[str]:
+    return [calculate_cached(f"{i} * 7", directory).formatted for i in range(50)]
+
+
+def test_concurrent_processes(tmp_path: Path) -> None:
+    """Test that processes sharing the cache all get correct results"""
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        outputs = pool.map(_calculate_many, [str(tmp_path)] * 8)
+    assert outputs == [[f"{i * 7:,}" for i in range(50)]] * 8
+    connection = sqlite3.connect(tmp_path / DATABASE_NAME)
+    assert connection.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 50
+    connection.close()
+
+
+def test_fingerprint_follows_modules(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test that the fingerprint changes with any module, without reading their content"""
+    module = tmp_path / "core.py"
+    module.write_text("A = 1\n")
+    (tmp_path / "notes.txt").write_text("ignored")
+    monkeypatch.setattr(calc.disk_cache, "__file__", str(tmp_path / "disk_cache.py"))
+    first = calc.disk_cache.fingerprint.__wrapped__()
+    (tmp_path / "notes.txt").write_text("still ignored")
+    assert calc.disk_cache.fingerprint.__wrapped__() == first
+    os.utime(module, ns=(0, 0))
+    assert calc.disk_cache.fingerprint.__wrapped__() != first
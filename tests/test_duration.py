@@ -0,0 +1,82 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+from calc.core import calculate
+from calc.duration import Duration, round_ratio
+from calc.evaluator import safe_eval
+from calc.lexer import normalize_expression
+
+LAST_RESULT = "0"
+
+
+def test_round_ratio() -> None:
+    """Test that integer division rounds to the nearest value with ties to even"""
+    assert round_ratio(7, 2) == 4
+    assert round_ratio(5, 2) == 2
+    assert round_ratio(-5, 2) == -2
+    assert round_ratio(5, -3) == -2
+    assert round_ratio(10, 3) == 3
+
+
+def test_duration_arithmetic() -> None:
+    """Test that durations stay integer microseconds and round ties to even"""
+    assert Duration(3) + Duration(4) == Duration(7)
+    assert Duration(5).scale(Decimal("0.5")) == Duration(2)
+    assert Duration(7).scale(Decimal("0.5")) == Duration(4)
+    assert Duration(10).divide(Decimal(4)) == Duration(2)
+    assert Duration(3) / Duration(2) == Decimal("1.5")
+    assert -Duration(-60_000_000) % Duration(25_000_000) == Duration(10_000_000)
+    assert max(Duration(1), Duration(3), Duration(2)) == Duration(3)
+    assert Duration.from_seconds(Decimal("1.0000025")) == Duration(1_000_002)
+    assert Duration.from_timedelta(timedelta(days=-1, microseconds=1)) == Duration(
+        -86_400_000_000 + 1
+    )
+    with pytest.raises(ZeroDivisionError):
+        Duration(1).divide(Decimal(0))
+    with pytest.raises(ZeroDivisionError):
+        Duration(1) / Duration(0)
+
+
+def test_duration_results_are_exact() -> None:
+    """Test that duration arithmetic does not go through binary floats"""
+    microseconds = [123_456_789_012_345, 1, 987_654_321_987_654]
+    arguments = ", ".join(f"{m // 10**6}.{m % 10**6:06d}s" for m in microseconds)
+    total = safe_eval(normalize_expression(f"sum({arguments})"))
+    assert total == timedelta(microseconds=sum(microseconds))
+    assert safe_eval(normalize_expression("1h x 1.1")) == timedelta(hours=1, minutes=6)
+    assert safe_eval(normalize_expression("1h / 7 * 7")) == timedelta(
+        minutes=59, seconds=59, microseconds=999_998
+    )
+
+
+def test_duration_ratio() -> None:
+    """Test that dividing durations gives a plain number"""
+    assert calculate("1h / 30min", LAST_RESULT) == (True, "2", "")
+    assert calculate("90s / 1min + 1", LAST_RESULT) == (True, "2.5", "")
+    assert calculate("1h / 0s", LAST_RESULT) == (False, LAST_RESULT, "Division by zero")
+
+
+def test_duration_errors() -> None:
+    """Test error messages for unsupported duration operations"""
+    assert calculate("1h * 1h", LAST_RESULT) == (
+        False,
+        LAST_RESULT,
+        "Unsupported operation 'Mult' between timedelta and timedelta",
+    )
+    assert calculate("timedelta(days=1, foo=2)", LAST_RESULT) == (
+        False,
+        LAST_RESULT,
+        "'foo' is an invalid keyword argument for timedelta",
+    )
+    assert calculate("timedelta(1, days=2)", LAST_RESULT) == (
+        False,
+        LAST_RESULT,
+        "argument for timedelta given by name ('days') and position",
+    )
+    assert calculate("1s x 1e30", LAST_RESULT) == (
+        False,
+        LAST_RESULT,
+        "Time value too large: over the limit of 999,999,999 days",
+    )
@@ -3,7 +3,8 @@ import sys
 
 import pytest
 
-from calc.__main__ import calculate, main
+from calc.__main__ import main
+from calc.core import calculate
 
 LAST_RESULT = "999"
 
@@ -0,0 +1,176 @@
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+from calc.duration import Duration
+from calc.evaluator import (
+    _BinOp,
+    _compile_plan,
+    _Constant,
+    _postfix_plan,
+    compile_expression,
+    evaluate,
+)
+
+
+def test_constant_expressions_are_folded() -> None:
+    """Test that an expression without names is evaluated once into a constant"""
+    compiled = compile_expression("pi * 2 + sqrt(4)")
+    result = evaluate(compiled)
+    assert isinstance(compiled._plan, _Constant)
+    assert compiled._plan.value == result
+    assert evaluate(compiled) == result
+
+
+def test_constant_subexpressions_are_folded() -> None:
+    """Test that only the parts depending on names are left to evaluate"""
+    compiled = compile_expression("price * (1 + 8 / 100)")
+    assert evaluate(compiled, {"price": Decimal(100)}) == Decimal("108.00")
+    assert isinstance(compiled._plan, _BinOp)
+    assert isinstance(compiled._plan.right, _Constant)
+    assert evaluate(compiled, {"price": Decimal(50)}) == Decimal("54.00")
+    assert evaluate(compiled, {"price": timedelta(hours=1)}) == timedelta(hours=1, minutes=4.8)
+
+
+def test_literals_after_non_ascii_names() -> None:
+    """Test that literals are read by character even after multi-byte names"""
+    compiled = compile_expression("税率 + 10 + 20000")
+    assert evaluate(compiled, {"税率": Decimal(2)}) == Decimal(20012)
+    with pytest.raises(TypeError, match="Unsupported name: 分"):
+        evaluate(compile_expression("分-3"))
+
+
+def test_failing_constants_raise_when_evaluated() -> None:
+    """Test that a failing subexpression is not folded and raises on every evaluation"""
+    compiled = compile_expression("x + 1 / 0")
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            evaluate(compiled, {"x": Decimal(1)})
+
+
+def test_type_errors_before_name_lookup() -> None:
+    """Test that mixing a time and a number is rejected before any name is looked up"""
+    with pytest.raises(TypeError, match="Unsupported operation"):
+        evaluate(compile_expression("timedelta(hours=1) + 1 + x"), {})
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "1 + 2 * 3 - 4 / 8 % 3",
+        "-2 ** 2 + 2 ** -1 - - 3",
+        "2 ** 3 ** 2",
+        "(1 + 2) * (3 - +4)",
+        "max(1, -2, 3,) + sum() + min(4, 5 * 2)",
+        "round(pi * 100, 1) + roundeven(2.5) - e",
+        "timedelta(0, 30, hours=1, minutes=-1.5) * 2 / 3",
+        "price * (1 + rate / 100) + avg(price, 2)",
+        "timedelta(seconds=price) / timedelta(hours=1)",
+    ],
+)
+def test_postfix_plans_match_tree_plans(expression: str) -> None:
+    """Test that the linear parser evaluates like the tree-based one"""
+    names = {"price": Decimal("12.5"), "rate": Decimal(8)}
+    expected = evaluate(compile_expression(expression), names)
+    plan = _postfix_plan(expression)
+    result = _compile_plan(plan)(names)
+    assert (result.to_timedelta() if isinstance(result, Duration) else result) == expected
+
+
+@pytest.mark.parametrize(
+    ("expression", "expected"),
+    [
+        ("round(x, 2) + roundeven(x, 1)", Decimal("4.64")),
+        ("round(t, 3)", timedelta(seconds=1, milliseconds=235)),
+        ("timedelta(hours=x) + timedelta(0, x, minutes=1)", timedelta(seconds=8468.335)),
+        ("sqrt(x * x) + max(x, 1) * 2", Decimal("7.005")),
+        ("t * x + t", timedelta(seconds=4.117058)),
+    ],
+)
+def test_compiled_calls(expression: str, expected: Decimal | timedelta) -> None:
+    """Test calls and operations compiled with their handlers and units resolved"""
+    names: dict[str, Decimal | timedelta] = {"x": Decimal("2.335"), "t": timedelta(seconds=1.2345)}
+    assert evaluate(compile_expression(expression), names) == expected
+
+
+@pytest.mark.parametrize(
+    ("expression", "message"),
+    [
+        ("sqrt(t)", "Math functions only accept Decimal values, got timedelta"),
+        ("timedelta(days=t)", "Math functions only accept Decimal values, got timedelta"),
+        ("timedelta(years=x)", "'years' is an invalid keyword argument for timedelta"),
+        ("max(x, t)", "Cannot mix timedelta and Decimal in max"),
+        ("x % t", "Unsupported operation 'Mod' between Decimal and timedelta"),
+        ("y + 1", "Unsupported name: y"),
+    ],
+)
+def test_compiled_errors(expression: str, message: str) -> None:
+    """Test that compiled plans raise the errors of the handlers they replace"""
+    names: dict[str, Decimal | timedelta] = {"x": Decimal(2), "t": timedelta(seconds=1)}
+    with pytest.raises(TypeError, match=re.escape(message)):
+        evaluate(compile_expression(expression), names)
+
+
+@pytest.mark.parametrize(
+    ("expression", "error"),
+    [
+        ("1 +", SyntaxError),
+        ("(1 + 2", SyntaxError),
+        ("1 + 2)", SyntaxError),
+        ("max(,)", SyntaxError),
+        ("max(a=1, 2)", SyntaxError),
+        ("timedelta(hours=1, hours=2)", SyntaxError),
+        ("1 'x'", SyntaxError),
+        ("1,20", ValueError),
+        ("open(1)", TypeError),
+    ],
+)
+def test_postfix_plan_errors(expression: str, error: type[Exception]) -> None:
+    """Test that the linear parser rejects invalid and unsupported expressions"""
+    with pytest.raises(error):
+        _compile_plan(_postfix_plan(expression))(None)
+
+
+@pytest.mark.parametrize("terms", [1_500, 20_000])
+def test_long_chains(terms: int) -> None:
+    """Test expressions nested too deeply for Python's parser or a recursive evaluator"""
+    compiled = compile_expression(" + ".join(str(n) for n in range(terms)))
+    assert evaluate(compiled) == terms * (terms - 1) // 2
+    assert isinstance(compiled._plan, _Constant)
+
+    compiled = compile_expression(" - ".join(["x"] * terms))
+    assert evaluate(compiled, {"x": Decimal(2)}) == 2 * (2 - terms)
+    assert evaluate(compiled, {"x": timedelta(seconds=1)}) == timedelta(seconds=2 - terms)
+
+
+@pytest.mark.parametrize(
+    ("expression", "expected"),
+    [
+        ("2 ** " * 3_000 + "1", None),
+        ("1 ** " * 3_000 + "y", Decimal(1)),
+        ("-" * 100_000 + "y", Decimal(2)),
+        ("-" * 3_001 + "y", Decimal(-2)),
+        ("(" * 300 + "y + 1" + ")" * 300, Decimal(3)),
+        ("sum(" * 300 + "y" + ")" * 300, Decimal(2)),
+    ],
+    ids=["power tower", "power of name", "even negations", "odd negations", "parentheses", "calls"],
+)
+def test_nested_beyond_the_parser(expression: str, expected: Decimal | None) -> None:
+    """Test right-nested and deeply parenthesised expressions Python's parser rejects"""
+    compiled = compile_expression(expression)
+    assert compiled.node is None
+    if expected is None:
+        with pytest.raises(ValueError, match="Number too large"):
+            evaluate(compiled)
+    else:
+        assert evaluate(compiled, {"y": Decimal(2)}) == expected
+
+
+def test_long_sources_skip_the_tree(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a source too long for an AST is evaluated from a postfix program"""
+    monkeypatch.setattr("calc.evaluator._TREE_SOURCE_LIMIT", 1_000)
+    compiled = compile_expression("sum(" + ", ".join(["1.5"] * 1_000) + ")")
+    assert compiled.node is None
+    assert evaluate(compiled) == Decimal("1500.0")
@@ -1,4 +1,4 @@
-from calc.__main__ import calculate
+from calc.core import calculate
 
 LAST_RESULT = "0"
 
@@ -6,7 +6,7 @@ LAST_RESULT = "0"
 def test_numeric_functions() -> None:
     """Test functions with numeric values"""
     success, value, error = calculate("exp(1)", LAST_RESULT)
-    assert success and value == "2.718281828459045"
+    assert success and value == "2.718281828459045235360287471"
     success, value, error = calculate("ceil(3.2)", LAST_RESULT)
     assert success and value == "4"
     success, value, error = calculate("floor(3.8)", LAST_RESULT)
@@ -62,6 +62,6 @@ def test_roundeven() -> None:
 def test_mathematical_constants() -> None:
     """Test mathematical constants pi and e"""
     success, value, error = calculate("pi", LAST_RESULT)
-    assert success and value == "3.141592653589793"
+    assert success and value == "3.141592653589793238462643383"
     success, value, error = calculate("e", LAST_RESULT)
-    assert success and value == "2.718281828459045"
+    assert success and value == "2.718281828459045235360287471"
@@ -0,0 +1,83 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+from calc.core import _process_command, calculate
+from calc.history import History
+
+
+def _run(lines: list[str], history: History | None = None) -> list[str]:
+    """Process lines like the interactive shell and return the output lines"""
+    output: list[str] = []
+    history = history if history is not None else History()
+    current_format = "default"
+    for line in lines:
+        _, current_format, _ = _process_command(line, history, current_format, write=output.append)
+    return output
+
+
+def test_references() -> None:
+    """Test that ?, ?N and ?-N refer to the previous, Nth and Nth most recent results"""
+    output = _run(["10", "20", "1/0", "30", "?", "?-1 + ?-2", "?1 * ?4", "? - 3", "-?"])
+    assert output == [
+        "= 10",
+        "= 20",
+        "Error: Division by zero",
+        "= 30",
+        "= 30",
+        "= 60",
+        "= 300",
+        "= 297",
+        "= -297",
+    ]
+
+
+def test_exact_values() -> None:
+    """Test that history keeps the result itself, not the text it is displayed as"""
+    assert _run(["1 + 1e-20", "? - 1"]) == ["= 1", "= 0.00000000000000000001"]
+    assert _run(["format japanese", "90min + 0.5s", "? * 2", "?1 as sec"]) == [
+        "= 1時間30分0.5秒",
+        "= 3時間1秒",
+        "= 5,400.5 sec",
+    ]
+    history = History()
+    _run(["1h as en", "? + 1"], history)
+    assert history.last == timedelta(hours=1)
+
+
+@pytest.mark.parametrize(
+    ("expression", "error"),
+    [
+        ("?0", "No result ?0: results are numbered from 1"),
+        ("?-0", "No result ?-0: results are numbered from 1"),
+        ("?4", "No result ?4: only 3 so far"),
+        ("?-4", "No result ?-4: only 3 so far"),
+        ("?1", "Result ?1 is no longer kept: history holds the last 2 results"),
+        ("?-3", "Result ?-3 is no longer kept: history holds the last 2 results"),
+    ],
+)
+def test_missing_results(expression: str, error: str) -> None:
+    """Test that references to results not held are errors"""
+    history = History([Decimal(1), Decimal(2), Decimal(3)], size=2)
+    assert _run([expression], history) == [f"Error: {error}"]
+
+
+def test_ring_is_bounded() -> None:
+    """Test that the oldest results are dropped first while numbering continues"""
+    history = History(size=3)
+    for value in range(1, 11):
+        history.append(Decimal(value))
+    assert len(history) == 3 and history.count == 10
+    assert history.substitute("?8 + ?-1 + ?") == (
+        "_result8 + _previous1 + _previous1",
+        {"_result8": Decimal(8), "_previous1": Decimal(10)},
+    )
+    assert History().last == Decimal(0)
+
+
+def test_calculate_reads_displayed_result() -> None:
+    """Test that calculate() still takes the previous result as displayed"""
+    assert calculate("? * 2", "1 day and 01:00:00") == (True, "2 days and 02:00:00", "")
+    assert calculate("? + 1", "1,234.5") == (True, "1,235.5", "")
+    assert calculate("?-2", "5") == (False, "5", "No result ?-2: only 1 so far")
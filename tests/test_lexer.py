@@ -0,0 +1,46 @@
+from calc.lexer import normalize_expression
+
+
+def test_operator_aliases() -> None:
+    """Test that operator aliases are rewritten in the same pass"""
+    assert normalize_expression("10 ＋ 5 － 3") == "10 + 5 - 3"
+    assert normalize_expression("6 × 7 ÷ 2") == "6 * 7 / 2"
+    assert normalize_expression("2 ^ 3") == "2 ** 3"
+    assert normalize_expression("3 x 4") == "3 * 4"
+    assert normalize_expression("2x3x4") == "2*3*4"
+    # "x" inside a word is not an operator
+    assert normalize_expression("max(1, 2)") == "max(1, 2)"
+
+
+def test_thousands_separators() -> None:
+    """Test that only commas followed by exactly three digits are removed"""
+    assert normalize_expression("1,000 x 2") == "1000 * 2"
+    assert normalize_expression("1,234,567.5") == "1234567.5"
+    assert normalize_expression("max(1,200)") == "max(1200)"
+    assert normalize_expression("max(1,20)") == "max(1,20)"
+    assert normalize_expression("max(1, 200)") == "max(1, 200)"
+
+
+def test_units() -> None:
+    """Test that non-time unit suffixes are dropped and reserved words kept"""
+    assert normalize_expression("10個 + 20個") == "10 + 20"
+    assert normalize_expression("100 円 - 50 円") == "100 - 50"
+    assert normalize_expression("1,024 GB / 4") == "1024 / 4"
+    assert normalize_expression("45X3円") == "45*3"
+    assert normalize_expression("2pi") == "2pi"
+    assert normalize_expression("1e-3") == "1e-3"
+
+
+def test_durations() -> None:
+    """Test that duration literals are converted to timedelta constructors"""
+    assert normalize_expression("1h 30m + 45s") == (
+        "timedelta(hours=1, minutes=30) + timedelta(seconds=45)"
+    )
+    assert normalize_expression("1,234s") == "timedelta(seconds=1234)"
+    assert normalize_expression("1日と2時間") == "timedelta(days=1, hours=2)"
+    assert normalize_expression("2d 01:30:00") == (
+        "timedelta(days=2, hours=1, minutes=30, seconds=0)"
+    )
+    assert normalize_expression("3 x 1h") == "3 * timedelta(hours=1)"
+    # A clock time never has a fractional hour
+    assert normalize_expression("0.501:30:45") == ("0.timedelta(hours=501, minutes=30, seconds=45)")
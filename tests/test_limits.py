@@ -0,0 +1,101 @@
+import io
+import re
+import sys
+import time
+from decimal import Decimal
+
+import pytest
+
+from calc.__main__ import main
+from calc.calculator import Calculator
+from calc.core import calculate
+from calc.evaluator import compile_expression, evaluate
+from calc.lexer import normalize_expression
+from calc.limits import Limits, get_limits, set_limits
+
+
+@pytest.mark.parametrize(
+    ("expression", "error"),
+    [
+        ("10^10^8", "Number too large: at least 10^100,000,000, over the limit of 10^4,000"),
+        ("9^9^9", "Number too large: at least 10^369,693,099, over the limit of 10^4,000"),
+        ("exp(10^6)", "Number too large: at least 10^434,294, over the limit of 10^4,000"),
+        ("0.5^(10^9)", "Number too small: below 10^-301,029,995, under the limit of 10^-4,000"),
+        ("(2^15000 + 1) / 3", "Number too large: at least 10^4,515, over the limit of 10^4,000"),
+        ("timedelta(days=1) * 1e30", "Time value too large: over the limit of 999,999,999 days"),
+        ("円 + 10^5000", "Number too large: at least 10^5,000, over the limit of 10^4,000"),
+    ],
+)
+def test_rejected_before_evaluation(expression: str, error: str) -> None:
+    """Test that values certain to exceed the limits are rejected without computing them"""
+    start = time.perf_counter()
+    assert calculate(expression, "0") == (False, "0", error)
+    assert time.perf_counter() - start < 0.5
+
+
+@pytest.mark.parametrize(
+    ("expression", "error"),
+    [
+        ("1 + " * 2_000 + "10^10^8", "Number too large: at least 10^100,000,000"),
+        ("2^" * 3_000 + "3", "Number too large: at least 10^34,856,892,121,026,974,688,103"),
+        ("(" * 300 + "0.5^(10^9)" + ")" * 300, "Number too small: below 10^-301,029,995"),
+        ("sum(" * 300 + "timedelta(days=1e30)" + ")" * 300, "Time value too large"),
+    ],
+    ids=["long sum", "power tower", "parentheses", "nested calls"],
+)
+def test_postfix_plans_rejected_before_evaluation(expression: str, error: str) -> None:
+    """Test that expressions too deep for a tree are held to the same limits"""
+    compiled = compile_expression(normalize_expression(expression))
+    start = time.perf_counter()
+    with pytest.raises(ValueError, match=re.escape(error)):
+        evaluate(compiled)
+    assert time.perf_counter() - start < 0.5
+
+
+@pytest.mark.parametrize(
+    "expression", ["2^13290", "10^4000", "10^-4000", "(1 + 1e-27)^(10^30)", "10^30", "exp(9000)"]
+)
+def test_values_within_limits(expression: str) -> None:
+    """Test that values at the limits, or only large on the way, are still evaluated"""
+    assert calculate(expression, "0")[0]
+
+
+def test_values_known_once_evaluated() -> None:
+    """Test that results of previous lines and names are checked as they are computed"""
+    calculator = Calculator()
+    calculator.evaluate("10^2001")
+    assert calculator.evaluate("? * ?").error == (
+        "Number too large: at least 10^4,002, over the limit of 10^4,000"
+    )
+    assert calculator.evaluate("? * ? * ?").error == (
+        "Number too large: at least 10^6,003, over the limit of 10^4,000"
+    )
+    with pytest.raises(ValueError, match="Number too small"):
+        evaluate(compile_expression("x * x"), {"x": Decimal("1e-3000")})
+
+
+def test_set_limits(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that changed limits apply to expressions planned afterwards"""
+    monkeypatch.setattr("calc.limits._limits", get_limits())
+    set_limits(Limits(max_digits=10))
+    assert calculate("10^10", "0")[0]
+    assert calculate("10^11", "0")[2] == (
+        "Number too large: at least 10^11, over the limit of 10^10"
+    )
+    set_limits(Limits(max_days=1))
+    assert calculate("2 days", "0")[2] == "Time value too large: over the limit of 1 days"
+
+
+def test_max_digits_option(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that --max-digits sets the limit for the run"""
+    monkeypatch.setattr("calc.limits._limits", get_limits())
+    monkeypatch.setattr(sys, "argv", ["calc", "--max-digits", "5", "--batch", "-"])
+    monkeypatch.setattr(sys, "stdin", io.StringIO("10^5\n10^6\n"))
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    assert excinfo.value.code == 1
+    assert capsys.readouterr().out == (
+        "= 100,000\nError: Number too large: at least 10^6, over the limit of 10^5\n"
+    )
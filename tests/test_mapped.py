@@ -0,0 +1,126 @@
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+from calc.__main__ import main
+from calc.mapped import MappedRange, can_map, mapped_segments, read_range
+
+INPUT = (
+    "1+1\n# comment\n\n1/0\n? * 3\r\n　format min　\n1h\n?2 + ?-1\n"
+    "  help  \nformat hhmm\n2h\nexit\n5\n"
+)
+
+
+def _run(monkeypatch: pytest.MonkeyPatch, argv: list[str], stdin: str = "") -> int | str | None:
+    monkeypatch.setattr(sys, "argv", ["calc", *argv])
+    monkeypatch.setattr(sys, "stdin", io.StringIO(stdin))
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    return excinfo.value.code
+
+
+def _write(tmp_path: Path, text: str) -> Path:
+    path = tmp_path / "input.txt"
+    path.write_bytes(text.encode("utf-8"))
+    return path
+
+
+@pytest.mark.parametrize("text", [INPUT, INPUT.removesuffix("exit\n5\n") + "3 * 4"])
+def test_mapped_batch_matches_piped_mode(
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+    tmp_path: Path,
+    text: str,
+) -> None:
+    """Test that a mapped file gives the output and status of the same lines piped"""
+    assert _run(monkeypatch, [], text) == 1
+    piped = capsys.readouterr().out
+    assert _run(monkeypatch, ["--batch", str(_write(tmp_path, text))]) == 1
+    assert capsys.readouterr().out == piped
+
+
+def test_mapped_ranges_split_at_line_boundaries(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test that ranges end at line ends, never before a line with ?, and skip commands"""
+    monkeypatch.setattr("calc.mapped.MAPPED_TASK_BYTES", 1)
+    path = _write(tmp_path, "1\n2\n? + 1\n?\nformat min\n3\n")
+    segments = list(mapped_segments(str(path)))
+    assert segments[2] == "format min"
+    ranges = [segment for segment in segments if isinstance(segment, MappedRange)]
+    assert [read_range(segment) for segment in ranges] == [
+        [(1, "1", "default")],
+        [(2, "2", "default"), (3, "? + 1", "default"), (4, "?", "default")],
+        [(6, "3", "min")],
+    ]
+
+
+def test_mapped_workers_match_piped_mode(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that ranges evaluated in worker processes keep the output in input order"""
+    monkeypatch.setattr("calc.mapped.MAPPED_TASK_BYTES", 8)
+    text = "".join(f"{i} * 3\n? + 1\n" if i % 5 == 0 else f"{i} / 7\n" for i in range(60))
+    text += "1/0\nformat min\n2h\n"
+    assert _run(monkeypatch, [], text) == 1
+    piped = capsys.readouterr().out
+    path = _write(tmp_path, text)
+    assert _run(monkeypatch, ["--batch", str(path), "--workers", "2"]) == 1
+    assert capsys.readouterr().out == piped
+
+
+@pytest.mark.parametrize("workers", [[], ["--workers", "2"]])
+def test_mapped_variables_match_piped_mode(
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+    tmp_path: Path,
+    workers: list[str],
+) -> None:
+    """Test that assignments split ranges, so later ranges see the variables they define"""
+    monkeypatch.setattr("calc.mapped.MAPPED_TASK_BYTES", 8)
+    text = "".join(f"{i} / 7\n" for i in range(20))
+    text += "a == 1\nrate = 2 # =\n　税率 = rate * 3　\n"
+    text += "".join(f"{i} * 税率\n? + rate\n" for i in range(20))
+    text += "rate = 5\n税率 + 1\n"
+    assert _run(monkeypatch, [], text) == 1
+    piped = capsys.readouterr().out
+    assert piped.endswith("= 114\n= 116\n= 5\n税率 = 15\n= 16\n")
+    path = _write(tmp_path, text)
+    segments = [s for s in mapped_segments(str(path)) if isinstance(s, str)]
+    assert segments == ["rate = 2 # =", "税率 = rate * 3", "rate = 5"]
+    assert _run(monkeypatch, ["--batch", str(path), *workers]) == 1
+    assert capsys.readouterr().out == piped
+
+
+def test_mapped_error_line_numbers(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that errors report the line numbers of the file across ranges and commands"""
+    monkeypatch.setattr("calc.mapped.MAPPED_TASK_BYTES", 1)
+    assert _run(monkeypatch, ["--batch", "-", "--on-error", "continue"], INPUT) == 1
+    streamed = capsys.readouterr()
+    path = _write(tmp_path, INPUT)
+    assert _run(monkeypatch, ["--batch", str(path), "--on-error", "continue"]) == 1
+    assert capsys.readouterr() == streamed
+    assert streamed.err == (
+        "Error: line 4: Division by zero\n"
+        "Error: line 8: Unsupported operation 'Add' between Decimal and timedelta\n"
+    )
+
+
+def test_can_map(tmp_path: Path) -> None:
+    """Test that only non-empty regular files are mapped"""
+    assert can_map(str(_write(tmp_path, "1\n")))
+    assert not can_map(str(_write(tmp_path, "")))
+    assert not can_map(str(tmp_path))
+    assert not can_map(str(tmp_path / "missing.txt"))
+
+
+def test_empty_file(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that an empty file, which cannot be mapped, is read as a stream"""
+    assert _run(monkeypatch, ["--batch", str(_write(tmp_path, ""))]) == 0
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,81 @@
+import sys
+
+import pytest
+
+from calc.__main__ import main
+from calc.core import calculate, expression_cache
+
+LAST_RESULT = "0"
+
+
+def _float(expression: str, last_result: str = LAST_RESULT) -> tuple[bool, str, str]:
+    return calculate(expression, last_result, numeric="float")
+
+
+def test_float_backend_matches_decimal() -> None:
+    """Test that the float backend agrees with Decimal on everyday expressions"""
+    for expression in [
+        "1,000 x 2 + 3",
+        "0.1 + 0.2",
+        "1 / 3 * 3",
+        "-7 % 3",
+        "sqrt(2) ^ 2",
+        "roundeven(2.5) + ceil(1.2) + floor(-1.5)",
+        "max(1, 2) + min(3, 4) + sum(1, 2) + avg(1, 2) + abs(-1)",
+        "1h 30m * 1.5 + 45s",
+        "avg(1h, 2h) as min",
+        "round(1h 30m 0.5s)",
+        "? + 1h",
+    ]:
+        assert _float(expression, "01:00:00") == calculate(expression, "01:00:00"), expression
+
+
+def test_float_backend_differences() -> None:
+    """Test the documented places where binary floats differ from Decimal"""
+    assert _float("2 ^ 0.5") == (True, "1.4142135623730951", "")
+    assert calculate("round(1.005, 2)", LAST_RESULT) == (True, "1.01", "")
+    assert _float("round(1.005, 2)") == (True, "1", "")
+    assert _float("10 ^ 400") == (False, LAST_RESULT, "Number too large")
+    assert _float("(-8) ^ (1/3)") == (False, LAST_RESULT, "math domain error")
+
+
+def test_float_backend_errors() -> None:
+    """Test that the float backend keeps the Decimal mixing rules and error messages"""
+    assert _float("1 / 0") == (False, LAST_RESULT, "Division by zero")
+    assert _float("1h + 1") == (
+        False,
+        LAST_RESULT,
+        "Unsupported operation 'Add' between timedelta and Decimal",
+    )
+    assert _float("sum(1, 2h)") == (False, LAST_RESULT, "Cannot mix timedelta and Decimal in sum")
+    assert _float("sqrt(1h)") == (
+        False,
+        LAST_RESULT,
+        "Math functions only accept Decimal values, got timedelta",
+    )
+
+
+def test_float_backend_long_expressions() -> None:
+    """Test that expressions nested too deeply for a tree are evaluated exactly"""
+    for terms in (1_500, 5_000):
+        expression = " + ".join(["0.1"] * terms)
+        assert _float(expression) == (True, f"{terms / 10:,g}", "")
+
+
+def test_float_backend_ignores_cached_decimal_result() -> None:
+    """Test that a stored Decimal result is not returned by the float backend"""
+    expression_cache.clear()
+    assert calculate("2 ^ 0.5", LAST_RESULT) == (True, "1.414213562373095048801688724", "")
+    assert _float("2 ^ 0.5") == (True, "1.4142135623730951", "")
+    assert calculate("2 ^ 0.5", LAST_RESULT) == (True, "1.414213562373095048801688724", "")
+
+
+def test_numeric_option(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that --numeric float selects the float backend on the command line"""
+    monkeypatch.setattr(sys, "argv", ["calc", "--numeric", "float", "2^0.5"])
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    assert excinfo.value.code == 0
+    assert capsys.readouterr().out == "= 1.4142135623730951\n"
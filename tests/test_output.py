@@ -0,0 +1,174 @@
+import io
+import json
+import sys
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from calc.__main__ import main
+from calc.output import Record, RecordWriter, raw_value
+
+INPUT = "1,000 * 2\n# comment\n\n1/0\n? + 0.5\nformat min\n1h + 30min\nformat bogus\nexit\n5\n"
+
+
+def _run(monkeypatch: pytest.MonkeyPatch, argv: list[str], stdin: str = "") -> int | str | None:
+    monkeypatch.setattr(sys, "argv", ["calc", *argv])
+    monkeypatch.setattr(sys, "stdin", io.StringIO(stdin))
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    return excinfo.value.code
+
+
+def test_jsonl_records(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+    """Test that every evaluated line becomes a JSON record with exact and formatted values"""
+    assert _run(monkeypatch, ["--output", "jsonl", "--batch", "-"], INPUT) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert records == [
+        {
+            "input": "1,000 * 2",
+            "ok": True,
+            "value": "2000",
+            "type": "number",
+            "formatted": "2,000",
+            "error": None,
+        },
+        {
+            "input": "1/0",
+            "ok": False,
+            "value": None,
+            "type": None,
+            "formatted": None,
+            "error": "Division by zero",
+        },
+        {
+            "input": "? + 0.5",
+            "ok": True,
+            "value": "2000.5",
+            "type": "number",
+            "formatted": "2,000.5",
+            "error": None,
+        },
+        {
+            "input": "1h + 30min",
+            "ok": True,
+            "value": "5400",
+            "type": "time",
+            "formatted": "90 min",
+            "error": None,
+        },
+        {
+            "input": "format bogus",
+            "ok": False,
+            "value": None,
+            "type": None,
+            "formatted": None,
+            "error": "Unknown format: 'bogus'",
+        },
+    ]
+
+
+def test_csv_records(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+    """Test that piped input with CSV output writes a header and quoted cells"""
+    assert _run(monkeypatch, ["--output", "csv"], INPUT) == 1
+    assert capsys.readouterr().out.splitlines() == [
+        "input,ok,value,type,formatted,error",
+        '"1,000 * 2",true,2000,number,"2,000",',
+        "1/0,false,,,,Division by zero",
+        '? + 0.5,true,2000.5,number,"2,000.5",',
+        "1h + 30min,true,5400,time,90 min,",
+        "format bogus,false,,,,Unknown format: 'bogus'",
+    ]
+
+
+def test_raw_values(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that raw output writes exact values, and history still sees formatted results"""
+    path = tmp_path / "input.txt"
+    path.write_text(INPUT, encoding="utf-8")
+    assert _run(monkeypatch, ["--output", "raw", "--batch", str(path)]) == 1
+    assert capsys.readouterr().out == (
+        "2000\nError: Division by zero\n2000.5\n5400\nError: Unknown format: 'bogus'\n"
+    )
+    assert _run(monkeypatch, ["--output", "raw", "1 / 4 + 1e6"]) == 0
+    assert capsys.readouterr().out == "1000000.25\n"
+    assert _run(monkeypatch, ["--output", "raw", "1h as min"]) == 0
+    assert capsys.readouterr().out == "3600\n"
+
+
+def test_variables(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+    """Test that assignments define variables, each with a record holding the value"""
+    lines = "1 + 1\nrate = 1.08\n税率 = rate * 2\nrate * 100\n? + 税率\nrate = 1/0\nrate\n"
+    assert _run(monkeypatch, ["--output", "jsonl", "--batch", "-"], lines) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(record["input"], record["value"], record["formatted"]) for record in records] == [
+        ("1 + 1", "2", "2"),
+        ("rate = 1.08", "1.08", "1.08"),
+        ("税率 = rate * 2", "2.16", "2.16"),
+        ("rate * 100", "108.00", "108"),
+        ("? + 税率", "110.16", "110.16"),
+        ("rate = 1/0", None, None),
+        ("rate", "1.08", "1.08"),
+    ]
+    assert _run(monkeypatch, ["--output", "raw", "--numeric", "float"], "a = 0.1\na + 0.2\n") == 0
+    assert capsys.readouterr().out == "0.1\n0.30000000000000004\n"
+
+
+def test_on_error_policies(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that continue and abort report failed lines on stderr, leaving them out of raw"""
+    assert _run(monkeypatch, ["--output", "raw", "--on-error", "continue", "--batch", "-"], INPUT)
+    captured = capsys.readouterr()
+    assert captured.out == "2000\n2000.5\n5400\n"
+    assert (
+        captured.err == "Error: line 4: Division by zero\nError: line 8: Unknown format: 'bogus'\n"
+    )
+    assert _run(monkeypatch, ["--output", "jsonl", "--on-error", "abort", "--batch", "-"], INPUT)
+    captured = capsys.readouterr()
+    assert [json.loads(line)["input"] for line in captured.out.splitlines()] == ["1,000 * 2", "1/0"]
+    assert captured.err == "Error: line 4: Division by zero\n"
+
+
+def test_direct_command(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that a direct command writes one record and reads file references from stdin"""
+    assert _run(monkeypatch, ["--output", "jsonl", "sum(@-)"], "1\n2.5\n") == 0
+    assert json.loads(capsys.readouterr().out)["value"] == "3.5"
+    assert _run(monkeypatch, ["--output", "csv", "1 +"]) == 1
+    assert (
+        capsys.readouterr().out
+        == "input,ok,value,type,formatted,error\n1 +,false,,,,Invalid syntax\n"
+    )
+
+
+@pytest.mark.parametrize("option", [["--workers", "2"], ["--columns", "-"], ["--serve"]])
+def test_rejected_combinations(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], option: list[str]
+) -> None:
+    """Test that modes with their own output format reject --output"""
+    assert _run(monkeypatch, ["--output", "jsonl", *option, "1"]) == 2
+    assert "cannot be combined" in capsys.readouterr().err
+
+
+def test_writer_chunks() -> None:
+    """Test that records are held back until a chunk is full or the writer is flushed"""
+    stream = io.StringIO()
+    writer = RecordWriter("raw", stream, chunk_records=2)
+    writer.write(Record("1", True, "1", "number"))
+    assert stream.getvalue() == ""
+    writer.write(Record("2", True, "2", "number"))
+    assert stream.getvalue() == "1\n2\n"
+    writer.write(Record("3", True, "3", "number"))
+    writer.flush()
+    assert stream.getvalue() == "1\n2\n3\n"
+
+
+def test_raw_value() -> None:
+    """Test that exact values keep every digit in plain notation"""
+    assert raw_value(Decimal("1E+30")) == "1000000000000000000000000000000"
+    assert raw_value(Decimal("1.5E-7")) == "0.00000015"
+    assert raw_value(timedelta(seconds=1, microseconds=500)) == "1.0005"
@@ -0,0 +1,124 @@
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from calc import __main__ as calc_main
+from calc import core
+from calc.__main__ import main
+from calc.profiling import STAGES, Profiler
+
+INPUT = "1 + 1\n# comment\n2 ^ 0.5\n? * 2\n1/0\n"
+
+
+def _run(monkeypatch: pytest.MonkeyPatch, argv: list[str], stdin: str = "") -> int | str | None:
+    monkeypatch.setattr(sys, "argv", ["calc", *argv])
+    monkeypatch.setattr(sys, "stdin", io.StringIO(stdin))
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    return excinfo.value.code
+
+
+def test_profile_summary(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that --profile reports every stage on stderr and leaves stdout unchanged"""
+    path = tmp_path / "input.txt"
+    path.write_text(INPUT, encoding="utf-8")
+    assert _run(monkeypatch, ["--profile", "--profile-top", "2", "--batch", str(path)]) == 1
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "= 2\n= 1.414213562373095048801688724\n= 2.828427124746190097603377448\n"
+        "Error: Division by zero\n"
+    )
+    report = captured.err.splitlines()
+    assert report[0].startswith("Profile: ")
+    assert report[1].split() == [
+        "stage",
+        "calls",
+        "total",
+        "ms",
+        "p50",
+        "us",
+        "p95",
+        "us",
+        "p99",
+        "us",
+    ]
+    assert [row.split()[0] for row in report[2:7]] == [*STAGES, "line"]
+    assert report[7] == "Slowest lines:"
+    assert len(report) == 10
+
+
+def test_profile_json(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that --profile-json writes calls, percentiles and the slowest lines"""
+    path = tmp_path / "profile.json"
+    # Lines memoized by earlier tests would not be evaluated, and so not profiled
+    calc_main._record_line.cache_clear()
+    assert _run(monkeypatch, ["--profile-json", str(path), "--output", "raw"], INPUT) == 1
+    assert capsys.readouterr().err.startswith("Profile: ")
+    profile = json.loads(path.read_text(encoding="utf-8"))
+    stages = profile["stages"]
+    assert stages["line"]["calls"] == 4
+    # Raw output formats no result, not even the one a later line reads with ?
+    assert stages["format"]["calls"] == 0
+    for entry in stages.values():
+        assert entry["p50"] <= entry["p95"] <= entry["p99"] <= entry["total"]
+    inputs = {line["input"] for line in profile["slowest_lines"]}
+    assert inputs == {"1 + 1", "2 ^ 0.5", "? * 2", "1/0"}
+    assert profile["wall"] >= stages["line"]["total"]
+
+
+def test_profile_float_stages(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that the float backend counts one call of each stage per evaluated line"""
+    source = tmp_path / "input.txt"
+    source.write_text("1 + 1\n2 * 3\n2 ^ 0.5\n1/0\n", encoding="utf-8")
+    path = tmp_path / "profile.json"
+    calc_main._memoized_line.cache_clear()
+    core.expression_cache.clear()
+    argv = ["--profile-json", str(path), "--numeric", "float", "--batch", str(source)]
+    assert _run(monkeypatch, argv) == 1
+    assert capsys.readouterr().out.splitlines() == [
+        "= 2",
+        "= 6",
+        "= 1.4142135623730951",
+        "Error: Division by zero",
+    ]
+    stages = json.loads(path.read_text(encoding="utf-8"))["stages"]
+    calls = {stage: entry["calls"] for stage, entry in stages.items()}
+    assert calls == {"preprocess": 4, "parse": 4, "evaluate": 4, "format": 3, "line": 4}
+
+
+def test_profiler_times_call_sites(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that lines and stages are timed only while a profiler is installed"""
+    core.expression_cache.clear()
+    stream = io.StringIO()
+    with Profiler(2, stream=stream) as profiler:
+        monkeypatch.setattr(core, "_profiler", profiler)
+        core.calculate("1 + 2", "0")
+        core.calculate("1 + " * 50 + "1", "0")
+        core.calculate("1 + 2", "0")
+        monkeypatch.undo()
+        core.calculate("1 + 4", "0")
+    assert len(profiler.durations["line"]) == 3
+    # The repeated line reuses the parsed expression and its result
+    assert len(profiler.durations["parse"]) == 2
+    assert len(profiler.durations["evaluate"]) == 2
+    assert len(profiler.durations["format"]) == 3
+    assert len(profiler.slowest_inputs()) == 2
+    assert max(len(line) for line in stream.getvalue().splitlines()) < 100
+
+
+@pytest.mark.parametrize("option", [["--workers", "2"], ["--columns", "-"], ["--serve"]])
+def test_profile_rejected_combinations(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], option: list[str]
+) -> None:
+    """Test that modes evaluating elsewhere than this process reject --profile"""
+    assert _run(monkeypatch, ["--profile", *option, "1"]) == 2
+    assert "cannot be combined" in capsys.readouterr().err
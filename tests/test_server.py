@@ -0,0 +1,91 @@
+import io
+import socket
+import sys
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from calc.client import main as client_main
+from calc.server import CalcServer
+
+
+def _start(path: Path, session: bool) -> CalcServer:
+    server = CalcServer(str(path), session, "decimal")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def socket_path(tmp_path: Path) -> Iterator[Path]:
+    path = tmp_path / "calc.sock"
+    server = _start(path, session=False)
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def _client(
+    monkeypatch: pytest.MonkeyPatch, path: Path, args: list[str], stdin: str = ""
+) -> int | str | None:
+    monkeypatch.setattr(sys, "argv", ["calc-client", "--socket", str(path), *args])
+    monkeypatch.setattr(sys, "stdin", io.StringIO(stdin))
+    with pytest.raises(SystemExit) as excinfo:
+        client_main()
+    return excinfo.value.code
+
+
+def test_client_expression(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], socket_path: Path
+) -> None:
+    """Test that an expression argument gets the same output and exit status as calc"""
+    assert _client(monkeypatch, socket_path, ["1,000", "x", "2"]) == 0
+    assert _client(monkeypatch, socket_path, ["1/0"]) == 1
+    assert capsys.readouterr().out == "= 2,000\nError: Division by zero\n"
+
+
+def test_client_piped_lines_without_session(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], socket_path: Path
+) -> None:
+    """Test that without a session every line is evaluated on its own"""
+    stdin = "1+1\n? + 1\nformat min\n1h\n# comment\n"
+    assert _client(monkeypatch, socket_path, [], stdin) == 0
+    assert capsys.readouterr().out == "= 2\n= 1\n= 01:00:00\n"
+
+
+def test_client_piped_lines_with_session(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that a session keeps history, variables and format like piped input"""
+    path = tmp_path / "session.sock"
+    server = _start(path, session=True)
+    try:
+        stdin = "1+1\n1/0\n? + 1\nformat min\nt = 1h\nt * 3\nexit\n2+2\n"
+        assert _client(monkeypatch, path, [], stdin) == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert capsys.readouterr().out == "= 2\nError: Division by zero\n= 3\n= 60 min\n= 180 min\n"
+
+
+def test_concurrent_clients(socket_path: Path) -> None:
+    """Test that the server answers several open connections at the same time"""
+    connections = []
+    for _ in range(4):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(str(socket_path))
+        connections.append(connection)
+    for n, connection in enumerate(reversed(connections)):
+        connection.sendall(f"{n} * 10\n".encode())
+        assert connection.recv(1024).decode() == f"= {n * 10}\n\x000\n"
+    for connection in connections:
+        connection.close()
+
+
+def test_client_without_server(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that a missing server is reported on stderr with exit status 1"""
+    assert _client(monkeypatch, tmp_path / "missing.sock", ["1+1"]) == 1
+    assert "cannot connect to calc server" in capsys.readouterr().err
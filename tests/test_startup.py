@@ -0,0 +1,80 @@
+import subprocess
+import sys
+import time
+
+# Modules that only some modes need; none of them may load before a mode asks for it
+LAZY_MODULES = (
+    "argparse",
+    "calc.columns",
+    "calc.disk_cache",
+    "calc.float_evaluator",
+    "calc.help_text",
+    "calc.mapped",
+    "calc.output",
+    "calc.profiling",
+    "calc.server",
+    "calc.streams",
+    "calc.variables",
+    "concurrent.futures",
+    "csv",
+    "json",
+    "numpy",
+    "prompt_toolkit",
+    "socketserver",
+    "sqlite3",
+)
+# Wall-clock time a one-shot `calc 1+1` may take on top of starting the interpreter itself
+STARTUP_BUDGET_SECONDS = 0.15
+RUNS = 5
+
+
+def _import_times(statement: str) -> dict[str, int]:
+    """Return the cumulative import time in microseconds of every module statement loads"""
+    result = subprocess.run(  # noqa: S603 (runs this interpreter)
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1])
+    return times
+
+
+def _fastest_run(args: list[str]) -> float:
+    """Return the shortest wall-clock time in seconds of RUNS runs of the interpreter"""
+    elapsed = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], capture_output=True, check=True)  # noqa: S603
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+
+def test_startup_imports() -> None:
+    """Test that importing the command line loads no mode-specific module"""
+    times = _import_times("import calc.__main__")
+    assert "calc.__main__" in times
+    loaded = [m for m in times if m.split(".")[0] in LAZY_MODULES or m in LAZY_MODULES]
+    assert loaded == []
+
+
+def test_mode_imports() -> None:
+    """Test that modes still load what they need on demand"""
+    times = _import_times(
+        "from calc.core import History, _process_command; "
+        "_process_command('help', History(), 'default', write=lambda text: None)"
+    )
+    assert "calc.help_text" in times
+    assert "prompt_toolkit" not in times
+
+
+def test_one_shot_startup_budget() -> None:
+    """Test the cold start of `calc 1+1` against STARTUP_BUDGET_SECONDS"""
+    baseline = _fastest_run(["-c", "pass"])
+    overhead = _fastest_run(["-m", "calc", "1+1"]) - baseline
+    slowest = sorted(_import_times("import calc.__main__").items(), key=lambda item: -item[1])
+    assert overhead < STARTUP_BUDGET_SECONDS, f"{overhead:.3f}s; slowest imports: {slowest[:10]}"
@@ -0,0 +1,174 @@
+import io
+import sys
+from collections.abc import Iterator
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from calc.__main__ import main
+from calc.calculator import Calculator
+from calc.core import _process_command, calculate
+from calc.evaluator import aggregate
+from calc.history import History
+from calc.streams import MAX_LINE_CHARS, parse_value
+
+LAST_RESULT = "0"
+
+
+def _write(directory: Path, name: str, text: str) -> Path:
+    path = directory / name
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_aggregate_matches_inline_arguments() -> None:
+    """Test that streamed aggregates agree with the functions called inline"""
+    numbers = [Decimal("1000"), Decimal("2.5"), Decimal("-3")]
+    durations = [timedelta(hours=1), timedelta(seconds=1.5), timedelta(microseconds=1)]
+    assert aggregate("sum", iter(numbers)) == Decimal("999.5")
+    assert aggregate("avg", iter(numbers)) == Decimal("999.5") / 3
+    assert aggregate("max", iter(numbers)) == Decimal("1000")
+    assert aggregate("min", iter(durations)) == timedelta(microseconds=1)
+    assert aggregate("avg", iter(durations)) == timedelta(seconds=1200.5, microseconds=0)
+    assert aggregate("sum", iter([])) == Decimal(0)
+    with pytest.raises(TypeError, match="avg expected at least 1 argument, got 0"):
+        aggregate("avg", iter([]))
+
+
+def test_aggregate_checks_types_as_values_stream_in() -> None:
+    """Test that a value of the wrong type stops the stream without reading further"""
+    consumed = []
+    stream: list[Decimal | timedelta] = [Decimal(1), Decimal(2), timedelta(hours=1), Decimal(3)]
+
+    def values() -> Iterator[Decimal | timedelta]:
+        for value in stream:
+            consumed.append(value)
+            yield value
+
+    with pytest.raises(TypeError, match="Cannot mix timedelta and Decimal in sum"):
+        aggregate("sum", values())
+    assert len(consumed) == 3
+
+
+def test_parse_value() -> None:
+    """Test that streamed values are parsed like calculator input"""
+    assert parse_value("1,234.5") == Decimal("1234.5")
+    assert parse_value("-3") == Decimal(-3)
+    assert parse_value("10個") == Decimal(10)
+    assert parse_value("1h 30m") == timedelta(hours=1, minutes=30)
+    assert parse_value("00:01:30.5") == timedelta(seconds=90.5)
+
+
+def test_file_references(tmp_path: Path) -> None:
+    """Test aggregates over files, with blank lines and comments skipped"""
+    numbers = _write(tmp_path, "numbers.txt", "1,000\n2.5  # refund\n\n-3\n10個\n")
+    durations = _write(tmp_path, "durations.txt", "1h 30m\n00:10:00\n45s\n")
+    assert calculate(f"sum(@{numbers})", LAST_RESULT, files=True) == (True, "1,009.5", "")
+    assert calculate(f"avg(@{numbers}) * 2", LAST_RESULT, files=True) == (True, "504.750", "")
+    assert calculate(f"max(@{durations}) + min(@{durations})", LAST_RESULT, files=True) == (
+        True,
+        "01:30:45",
+        "",
+    )
+    assert calculate(f"sum( @{durations} ) as min", LAST_RESULT, files=True) == (
+        True,
+        "100.75 min",
+        "",
+    )
+
+
+def test_file_results_are_not_cached(tmp_path: Path) -> None:
+    """Test that a file is read again on every evaluation"""
+    path = _write(tmp_path, "values.txt", "1\n2\n")
+    assert calculate(f"sum(@{path})", LAST_RESULT, files=True) == (True, "3", "")
+    path.write_text("1\n2\n3\n", encoding="utf-8")
+    assert calculate(f"sum(@{path})", LAST_RESULT, files=True) == (True, "6", "")
+
+
+def test_batch_file_results_are_not_memoized(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    """Test that a batch line reading a file is calculated again in every run"""
+    path = _write(tmp_path, "values.txt", "1\n2\n")
+    batch = _write(tmp_path, "batch.txt", f"sum(@{path})\n")
+    for values, expected in (("1\n2\n", "= 3\n"), ("1\n2\n3\n", "= 6\n")):
+        path.write_text(values, encoding="utf-8")
+        monkeypatch.setattr(sys, "argv", ["calc", "--batch", str(batch)])
+        with pytest.raises(SystemExit):
+            main()
+        assert capsys.readouterr().out == expected
+
+
+def test_stdin_references() -> None:
+    """Test that @- reads the stream given to calculate, only once"""
+    stdin = io.StringIO("1\n2\n3\n")
+    assert calculate("avg(@-) * 2", LAST_RESULT, stdin=stdin, files=True) == (True, "4", "")
+    assert calculate("sum(@-)", LAST_RESULT, files=True) == (
+        False,
+        LAST_RESULT,
+        "@- (standard input) is only available to a direct command",
+    )
+    assert calculate("sum(@-) + sum(@-)", LAST_RESULT, stdin=io.StringIO("1\n"), files=True) == (
+        False,
+        LAST_RESULT,
+        "@- (standard input) can only be read once",
+    )
+
+
+def test_file_reference_errors(tmp_path: Path) -> None:
+    """Test errors of missing files, invalid values, mixed types and misplaced references"""
+    invalid = _write(tmp_path, "invalid.txt", "1\nabc\n")
+    mixed = _write(tmp_path, "mixed.txt", "1\n2h\n")
+    assert calculate(f"sum(@{tmp_path}/missing.txt)", LAST_RESULT, files=True)[2] == (
+        f"No such file or directory: '{tmp_path}/missing.txt'"
+    )
+    assert calculate(f"sum(@{invalid})", LAST_RESULT, files=True)[2] == (
+        f"Invalid value in '{invalid}' line 2"
+    )
+    assert (
+        calculate(f"max(@{mixed})", LAST_RESULT, files=True)[2]
+        == "Cannot mix timedelta and Decimal in max"
+    )
+    assert calculate(f"sqrt(@{mixed})", LAST_RESULT, files=True)[2] == (
+        "A file reference must be the only argument of sum, avg, max or min, like sum(@values.txt)"
+    )
+
+
+def test_file_references_only_on_the_command_line(tmp_path: Path) -> None:
+    """Test that library entry points and the server refuse to read files by default"""
+    path = _write(tmp_path, "values.txt", "1\n2\n")
+    error = "File references (@) are only available on the command line"
+    assert calculate(f"sum(@{path})", LAST_RESULT) == (False, LAST_RESULT, error)
+    assert Calculator().evaluate(f"sum(@{path})").error == error
+    output: list[str] = []
+    _process_command(f"total = sum(@{path})", History(), "default", write=output.append)
+    _process_command(f"sum(@{path})", History(), "default", write=output.append)
+    assert output == [f"Error: {error}"] * 2
+
+
+def test_file_contents_stay_out_of_errors(tmp_path: Path) -> None:
+    """Test that errors do not quote the file, and a line without breaks is cut short"""
+    secret = _write(tmp_path, "secret.txt", "root:x:0:0:root:/root:/bin/sh\n")
+    assert calculate(f"sum(@{secret})", LAST_RESULT, files=True)[2] == (
+        f"Invalid value in '{secret}' line 1"
+    )
+    unbroken = _write(tmp_path, "unbroken.txt", "1" * (MAX_LINE_CHARS + 1))
+    assert calculate(f"sum(@{unbroken})", LAST_RESULT, files=True)[2] == (
+        f"Line too long in '{unbroken}' line 1"
+    )
+    longest = _write(tmp_path, "longest.txt", "1 #" + "-" * (MAX_LINE_CHARS - 4) + "\n2\n")
+    assert calculate(f"sum(@{longest})", LAST_RESULT, files=True) == (True, "3", "")
+
+
+def test_direct_command_reads_stdin(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that a direct command streams stdin into @-"""
+    monkeypatch.setattr(sys, "argv", ["calc", "sum(@-)"])
+    monkeypatch.setattr(sys, "stdin", io.StringIO("1h\n30m\n"))
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    assert excinfo.value.code == 0
+    assert capsys.readouterr().out == "= 01:30:00\n"
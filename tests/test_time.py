@@ -1,4 +1,4 @@
-from calc.__main__ import calculate
+from calc.core import calculate
 
 LAST_RESULT = "0"
 
@@ -71,6 +71,22 @@ def test_convert_time_expressions() -> None:
     )
 
 
+def test_convert_time_expressions_precedence() -> None:
+    """Test that every duration in a line is converted in one pass with the usual precedence"""
+    assert convert_time_expressions("1h 30m + 45s * 2") == (
+        "timedelta(hours=1, minutes=30) + timedelta(seconds=45) * 2"
+    )
+    # Days with a clock time take precedence over days alone
+    assert convert_time_expressions("2日 01:00:00 - 1日") == (
+        "timedelta(days=2, hours=1, minutes=0, seconds=0) - timedelta(days=1)"
+    )
+    # A bare clock time comes last: seconds followed by a unit are not a clock time
+    assert convert_time_expressions("1:00:30s") == "1:00:timedelta(seconds=30)"
+    assert convert_time_expressions("01:30:45 + 01:00:00") == (
+        "timedelta(hours=1, minutes=30, seconds=45) + timedelta(hours=1, minutes=0, seconds=0)"
+    )
+
+
 def test_format_colon() -> None:
     """Test formatting of timedelta to colon-separated display string"""
     # Basic time
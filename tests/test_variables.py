@@ -0,0 +1,139 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+from calc.core import _process_command
+from calc.history import History
+from calc.variables import Variables
+
+
+def _run(lines: list[str], numeric: str = "decimal") -> tuple[list[str], Variables]:
+    """Process lines like the interactive shell; return the output lines and variables"""
+    output: list[str] = []
+    variables = Variables(numeric)
+    history, current_format = History(), "default"
+    for line in lines:
+        _, current_format, _ = _process_command(
+            line, history, current_format, numeric, output.append, variables
+        )
+    return (output, variables)
+
+
+def test_define_and_use() -> None:
+    """Test that variables keep exact values and can be used by later lines"""
+    output, variables = _run(
+        ["rate = 1.08", "price = 1,000 # net", "price * rate", "t = 90min as min", "t * 2", "? / 2"]
+    )
+    assert output == ["= 1.08", "= 1,000", "= 1,080", "= 90 min", "= 03:00:00", "= 01:30:00"]
+    assert variables.values == {
+        "rate": Decimal("1.08"),
+        "price": Decimal(1000),
+        "t": timedelta(minutes=90),
+    }
+
+
+def test_non_ascii_names() -> None:
+    """Test that names in any script are variables, and literals after them read right"""
+    output, variables = _run(["税率 = 1.08", "税率 * 100", "円 = 税率-3", "円 + 10,000"])
+    assert output == ["= 1.08", "= 108", "= -1.92", "= 9,998.08"]
+    assert variables.values == {"税率": Decimal("1.08"), "円": Decimal("-1.92")}
+
+
+def test_float_backend() -> None:
+    """Test that definitions and lines using variables follow the numeric backend"""
+    output, variables = _run(["a = 0.1", "b = a + 0.2", "t = 90min", "t / 3"], "float")
+    assert output == ["= 0.1", "= 0.3", "= 01:30:00", "= 00:30:00"]
+    assert variables.values["b"] == Decimal("0.30000000000000004")
+    assert variables.values["t"] == timedelta(minutes=90)
+    _, variables = _run(["a = 0.1", "b = a + 0.2"])
+    assert variables.values["b"] == Decimal("0.3")
+
+
+def test_redefinition_recomputes_dependents_only() -> None:
+    """Test that redefining a variable recomputes what reads it, in dependency order"""
+    output, variables = _run(
+        [
+            "price = 20",
+            "rate = 1.08",
+            "total = price * rate",
+            "shipping = 5",
+            "grand = total + shipping",
+            "other = rate * 2",
+            "price = 30",
+        ]
+    )
+    assert output[-3:] == ["= 30", "total = 32.40", "grand = 37.40"]
+    assert variables.values["other"] == Decimal("2.16")
+    # A dependent defined before what it reads still comes after it
+    assert variables.define("shipping", "total / 10") == (Decimal("3.240"), ["grand"])
+    assert variables.define("price", "10") == (Decimal(10), ["total", "shipping", "grand"])
+    assert variables.values["grand"] == Decimal("11.88")
+    assert variables.define("other", "1") == (Decimal(1), [])
+
+
+def test_failed_dependents() -> None:
+    """Test that a dependent that no longer evaluates loses its value until it does again"""
+    output, variables = _run(["a = 1", "b = 10 / a", "c = b + 1", "a = 0", "c", "a = 2"])
+    assert output == [
+        "= 1",
+        "= 10",
+        "= 11",
+        "= 0",
+        "Error: b: Division by zero",
+        "Error: c: 'b' has no value",
+        "Error: Unsupported name: c",
+        "= 2",
+        "b = 5",
+        "c = 6",
+    ]
+    assert not variables.errors
+
+
+@pytest.mark.parametrize(
+    ("line", "error"),
+    [
+        ("pi = 3", "Error: 'pi' is reserved and cannot be a variable name"),
+        ("max = 3", "Error: 'max' is reserved and cannot be a variable name"),
+        ("exit = 3", "Error: 'exit' is reserved and cannot be a variable name"),
+        ("if = 3", "Error: 'if' is reserved and cannot be a variable name"),
+        ("x = 3", "Error: 'x' cannot be a variable name"),
+        ("_stream0 = 3", "Error: '_stream0' cannot be a variable name"),
+        ("a = a + 1", "Error: Circular definition: 'a' would depend on itself"),
+        ("b = 2 * c", "Error: Unsupported name: c"),
+        ("b = 1 +", "Error: Invalid syntax"),
+    ],
+)
+def test_rejected_definitions(line: str, error: str) -> None:
+    """Test that invalid definitions are errors that leave the variables unchanged"""
+    output, variables = _run(["a = 1", line])
+    assert output == ["= 1", error]
+    assert variables.values == {"a": Decimal(1)}
+
+
+def test_cycles_rejected() -> None:
+    """Test that a definition closing a cycle through other variables is rejected"""
+    variables = Variables()
+    variables.define("a", "1")
+    variables.define("b", "a+1")
+    variables.define("c", "b*2")
+    with pytest.raises(ValueError, match="Circular definition: 'a'"):
+        variables.define("a", "c-1")
+    assert variables.define("a", "5") == (Decimal(5), ["b", "c"])
+
+
+def test_long_chain_stays_responsive() -> None:
+    """Test that editing a session of many interdependent variables costs only what changes"""
+    variables = Variables()
+    variables.define("v0", "1")
+    for index in range(1, 1000):
+        variables.define(f"v{index}", f"v{index - 1} + v{index // 2}")
+    start = time.perf_counter()
+    assert variables.define("v999", "0") == (Decimal(0), [])
+    variables.define("v900", "1")
+    assert time.perf_counter() - start < 0.1
+    _, recomputed = variables.define("v0", "2")
+    assert len(recomputed) == 997
+    assert recomputed.index("v10") > recomputed.index("v9")
+    assert recomputed.index("v10") > recomputed.index("v5")